@@ -0,0 +1,48 @@
+"""Kalshi / Polymarket arbitrage scanner.
+
+Importing the package does no I/O and loads none of the heavy dependencies
+(polars, rapidfuzz, httpx, requests); the names below are resolved from their
+submodules on first access.
+"""
+import importlib
+
+_EXPORTS = {
+    'find_arbitrage': 'arbitrage',
+    'report_opportunities': 'arbitrage',
+    'match_outcome_pairs': 'arbitrage',
+    'find_venue_arbitrage': 'canonical',
+    'CanonicalIndex': 'canonical',
+    'Venue': 'venues',
+    'register_venue': 'venues',
+    'get_venues': 'venues',
+    'Scanner': 'scanner',
+    'stream_arbitrage': 'streaming',
+    'PairBook': 'streaming',
+    'schedule_arbitrage': 'schedule',
+    'RefreshScheduler': 'schedule',
+    'get_all_events': 'fetch',
+    'fetch_all_events': 'fetch',
+    'ResponseCache': 'cache',
+    'MatchStore': 'match_cache',
+    'match_titles': 'matching',
+    'price_opportunities': 'pricing',
+    'size_opportunities': 'sizing',
+    'ExecutionEngine': 'execution',
+    'SnapshotStore': 'history',
+    'backtest': 'history',
+    'METRICS': 'metrics',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
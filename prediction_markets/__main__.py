@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# Guarded so spawned worker processes (see sharding.py) can import this module without running the CLI
+if __name__ == '__main__':
+    sys.exit(main())
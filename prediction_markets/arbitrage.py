@@ -0,0 +1,124 @@
+from .cache import ResponseCache
+from .fetch import CLOB_URL, KALSHI_URL, get_all_events, get_order_books
+from .match_cache import MatchStore, end_dates
+from .matching import match_titles, score_pairs
+from .metrics import METRICS, log
+from .plan import match_near, prune_events
+from .pricing import (KALSHI_IDS, KALSHI_LABEL, POLYMARKET_IDS, POLYMARKET_LABEL, join_outcome_pairs,
+                      price_opportunities)
+from .sizing import size_opportunities
+import polars as pl
+
+
+def report_opportunities(opportunities: pl.DataFrame):
+    """ Print one block per arbitrage opportunity. """
+    for opp in opportunities.iter_rows(named=True):
+        if opp['direction'] == 'kalshi_yes':
+            yes_venue, no_venue = 'Kalshi', 'Polymarket'
+        else:
+            yes_venue, no_venue = 'Polymarket', 'Kalshi'
+        print(f"\n** Arbitrage Opportunity Found! **")
+        print(f"Event: {opp['kalshi_title']} / {opp['poly_title']}")
+        print(f"** Matched Outcome: {opp['kalshi_outcome']} <-> {opp['poly_outcome']} (Similarity: {opp['outcome_similarity']}%)")
+        print(f"✅ Buy YES on {yes_venue} at {opp['yes_ask']}% (Stake ${opp['yes_stake']:.2f})")
+        print(f"🚫 Buy NO on {no_venue} at {opp['no_ask']}% (Stake ${opp['no_stake']:.2f})")
+        print(f"** Expected Profit: ${opp['profit']:.2f} Arbitrage Percentage: ({opp['arbitrage_percentage']:.2f}%) **")
+        if 'contracts' in opp:
+            print(f"Size: {opp['contracts']:g} contracts per leg (order book depth)")
+            print("Profit by size: " + ', '.join(f"{point['contracts']:g} -> ${point['profit']:.2f}"
+                                                 for point in opp['profit_curve']))
+        print(f"Time Remaining: {opp['time_remaining']} days")
+        print("-" * 50)
+
+
+def match_outcome_pairs(kalshi_events: pl.DataFrame, polymarket_events: pl.DataFrame, similarity_threshold: float = 75,
+                        max_days_left: int = 5, match_cache: str = None, processes: int = 1,
+                        candidates: int = None, min_profit: float = None) -> pl.DataFrame:
+    """
+    Matched Kalshi x Polymarket outcome pairs (see pricing.join_outcome_pairs), through the match store if given.
+
+    Both frames are pruned of what can never be priced before any title is
+    scored (see plan.py); with `min_profit`, that includes outcomes without a
+    quote. Without a store, titles are only scored for event pairs whose
+    earlier close is within max_days_left; the store scores each title once
+    against the whole universe instead. `processes` and `candidates` go to
+    matching.match_titles.
+    """
+    kalshi_events = prune_events(kalshi_events, KALSHI_LABEL, min_profit, 'kalshi')
+    polymarket_events = prune_events(polymarket_events, POLYMARKET_LABEL, min_profit, 'polymarket')
+    if match_cache:
+        kalshi_titles = kalshi_events['title'].to_list()
+        poly_titles = polymarket_events['title'].to_list()
+        subtitles = (kalshi_events['subtitle'].to_list(), polymarket_events['subtitle'].to_list())
+        # Only titles and outcome labels this store has never seen get fuzzy-scored
+        store = MatchStore(match_cache)
+        k_idx, p_idx, title_scores = store.match_titles(kalshi_titles, poly_titles, similarity_threshold,
+                                                        end_dates(kalshi_events), end_dates(polymarket_events),
+                                                        processes=processes, candidates=candidates,
+                                                        subtitles=subtitles)
+        scorer = store.score_pairs
+    else:
+        k_idx, p_idx, title_scores = match_near(kalshi_events, polymarket_events, similarity_threshold,
+                                                max_days_left, processes=processes, candidates=candidates)
+        scorer = score_pairs
+    return join_outcome_pairs(kalshi_events, polymarket_events, k_idx, p_idx, title_scores, similarity_threshold,
+                              max_days_left, scorer)
+
+
+def find_arbitrage(similarity_threshold: int = 75, min_profit: float = 2.0, max_days_left: int = 5, stake: float = 100,
+                   cache_dir: str = None, delta: bool = False, match_cache: str = None, depth: bool = False,
+                   clob_url: str = CLOB_URL, processes: int = 1, candidates: int = None, history: str = None,
+                   **fetch_options):
+    """Find arbitrage opportunities by comparing Kalshi & Polymarket event lines.
+
+    With `depth`, each opportunity is re-sized against both venues' order books:
+    the largest hedge within `stake` that still clears `min_profit`, at its
+    blended fill prices. `processes` shards title matching across worker
+    processes on large universes and `candidates` limits it to each title's
+    most likely partners (see matching.match_titles). With `history`, both
+    venues' frames are appended to the history.SnapshotStore in that directory.
+    Extra keyword arguments (e.g. record / replay) go to fetch_all_events.
+    """
+
+    # Fetch events from both sources concurrently, conditionally against the on-disk cache if given
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    with METRICS.timer('stage_seconds', stage='fetch'):
+        kalshi_events, polymarket_events = get_all_events(cache=cache, delta=delta, **fetch_options)
+
+    if kalshi_events.is_empty() or polymarket_events.is_empty():
+        log.warning("No events found in one or both datasets.")
+        return
+
+    if 'title' not in kalshi_events.columns or 'title' not in polymarket_events.columns:
+        raise ValueError("Missing 'title' column in one of the datasets.")
+    if history:
+        from .history import SnapshotStore
+
+        with METRICS.timer('stage_seconds', stage='history'):
+            SnapshotStore(history).append({'kalshi': kalshi_events, 'polymarket': polymarket_events})
+
+    with METRICS.timer('stage_seconds', stage='match'):
+        pairs = match_outcome_pairs(kalshi_events, polymarket_events, similarity_threshold, max_days_left, match_cache,
+                                    processes, candidates, min_profit)
+    # Sizing against depth needs each opportunity's order book ids
+    carry = [f'k_{name}' for name in KALSHI_IDS] + [f'p_{name}' for name in POLYMARKET_IDS] if depth else []
+    with METRICS.timer('stage_seconds', stage='price'):
+        opportunities = price_opportunities(pairs, stake, min_profit, carry)
+    if depth and not opportunities.is_empty():
+        # The quoted stakes assume unlimited size at the best ask; only the legs actually bought are fetched
+        tokens = (opportunities.select(pl.when(pl.col('direction') == 'kalshi_yes')
+                                       .then('p_no_token').otherwise('p_yes_token'))
+                  .to_series().to_list())
+        with METRICS.timer('stage_seconds', stage='books'):
+            kalshi_books, polymarket_books = get_order_books(
+                opportunities['k_ticker'].to_list(), tokens,
+                kalshi_url=fetch_options.get('kalshi_url', KALSHI_URL), clob_url=clob_url,
+                record=fetch_options.get('record'), replay=fetch_options.get('replay'))
+        with METRICS.timer('stage_seconds', stage='size'):
+            opportunities = size_opportunities(opportunities, kalshi_books, polymarket_books, min_profit, stake)
+
+    if opportunities.is_empty():
+        print("No arbitrage opportunities found.")
+    else:
+        report_opportunities(opportunities)
+    return opportunities
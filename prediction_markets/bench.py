@@ -0,0 +1,451 @@
+"""Performance measurements behind `prediction-markets bench`."""
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Each entry: label, python arguments, which budget applies
+STARTUP_PROBES = [
+    ('import prediction_markets', ['-c', 'import prediction_markets'], 'cli'),
+    ('prediction-markets --help', ['-m', 'prediction_markets', '--help'], 'cli'),
+    ('scan imports', ['-c', 'import prediction_markets.arbitrage'], 'scan'),
+]
+
+
+def _best_wall_ms(args, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def import_breakdown(module: str, top: int = 8):
+    """ Import time of `module` per top-level package (summed self time from `python -X importtime`), slowest first. """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            check=True, capture_output=True, text=True)
+    totals = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)', line)
+        if match:
+            package = match.group(2).split('.')[0]
+            totals[package] = totals.get(package, 0) + int(match.group(1)) / 1000
+    return sorted(((ms, package) for package, ms in totals.items()), reverse=True)[:top]
+
+
+def measure_startup(repeat: int = 5, budget_ms: float = 150, scan_budget_ms: float = 1000) -> bool:
+    """ Print startup wall times against their budgets and return whether all of them fit. """
+    budgets = {'cli': budget_ms, 'scan': scan_budget_ms}
+    baseline = _best_wall_ms(['-c', 'pass'], repeat)
+    print(f"{'python -c pass':<30} {baseline:8.1f} ms  (interpreter baseline)")
+
+    within = True
+    for label, args, budget in STARTUP_PROBES:
+        wall = _best_wall_ms(args, repeat)
+        ok = wall <= budgets[budget]
+        within &= ok
+        print(f"{label:<30} {wall:8.1f} ms  budget {budgets[budget]:.0f} ms  {'ok' if ok else 'OVER BUDGET'}")
+
+    print("\nSlowest packages behind a scan:")
+    for ms, module in import_breakdown('prediction_markets.arbitrage'):
+        print(f"  {module:<28} {ms:8.1f} ms")
+    return within
+
+
+def _ingest_probe(path: str, venue: str, method: str):
+    """ Run in a child process: transform one payload and print wall time and peak RSS growth. """
+    with open(path, 'rb') as f:
+        body = f.read()
+    if method == 'ingest':
+        from . import ingest
+        transform = ingest.kalshi_frame if venue == 'kalshi' else ingest.polymarket_frame
+    else:
+        from . import kalshi, polymarket
+        if venue == 'kalshi':
+            def transform(body):
+                return kalshi.transform_data(json.loads(body)['feed'])
+        else:
+            def transform(body):
+                return polymarket.transform_data(json.loads(body))
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    transform(body)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    peak_mb = peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+    print(json.dumps({'ms': elapsed * 1000, 'peak_mb': peak_mb}))
+
+
+def _probe(path: str, venue: str, method: str, repeat: int):
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', 'from prediction_markets.bench import _ingest_probe; '
+                                 f'_ingest_probe({path!r}, {venue!r}, {method!r})'],
+                                check=True, capture_output=True, text=True)
+        sample = json.loads(result.stdout.splitlines()[-1])
+        best = sample if best is None else {key: min(best[key], sample[key]) for key in sample}
+    return best
+
+
+def measure_ingest(markets: int = 50_000, repeat: int = 3, budget_ms: float = 500, budget_mb: float = 256,
+                   compare: bool = True) -> bool:
+    """
+    Time and peak memory of turning a `markets`-market payload per venue into its
+    normalized frame, each run in a fresh process. Returns whether the ingest path
+    fits both budgets; the old transform_data path is shown for comparison.
+    """
+    from . import synthetic
+
+    # Five markets per event, scaled so the Kalshi payload holds `markets` markets
+    kalshi_body, polymarket_body = synthetic.payloads(markets / (5 * synthetic.KALSHI_EVENTS),
+                                                      min_markets=5, max_markets=5)
+    within = True
+    with tempfile.TemporaryDirectory() as directory:
+        for venue, body in (('kalshi', kalshi_body), ('polymarket', polymarket_body)):
+            path = os.path.join(directory, f'{venue}.json')
+            with open(path, 'wb') as f:
+                f.write(body)
+            print(f"{venue}: {body.count(b'yes_ask') or body.count(b'outcomePrices')} markets, "
+                  f"{len(body) / 2**20:.1f} MiB")
+            for method in ('ingest', 'transform_data') if compare else ('ingest',):
+                sample = _probe(path, venue, method, repeat)
+                line = f"  {method:<16} {sample['ms']:8.1f} ms  {sample['peak_mb']:7.1f} MiB peak"
+                if method == 'ingest':
+                    ok = sample['ms'] <= budget_ms and sample['peak_mb'] <= budget_mb
+                    within &= ok
+                    line += f"  budget {budget_ms:.0f} ms / {budget_mb:.0f} MiB  {'ok' if ok else 'OVER BUDGET'}"
+                print(line)
+    return within
+
+
+# Each entry: stage, what its throughput counts
+PIPELINE_STAGES = [
+    ('fetch', 'markets'),
+    ('transform', 'markets'),
+    ('matching', 'title pairs'),
+    ('pricing', 'outcome pairs'),
+]
+
+
+def _rss_bytes():
+    """ Current resident set size, or None where /proc is not available. """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+
+class PeakRSS:
+    """
+    Peak resident memory growth over a block, in MiB.
+
+    Sampled on a background thread from /proc; elsewhere this falls back to the
+    growth of the process high-water mark, which under-reports after an earlier peak.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self._peak = max(self._peak, _rss_bytes())
+
+    def __enter__(self):
+        self._start = _rss_bytes()
+        self._done = threading.Event()
+        if self._start is None:
+            self._start_max = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        else:
+            self._peak = self._start
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is None:
+            grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - self._start_max
+            self.peak_mb = grown / 2**20 if sys.platform == 'darwin' else grown / 2**10
+        else:
+            self._done.set()
+            self._thread.join()
+            self.peak_mb = (max(self._peak, _rss_bytes()) - self._start) / 2**20
+
+
+def _measure(fn, *args):
+    """ (result, wall ms, peak MiB) of fn(*args). """
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+    return result, elapsed * 1000, rss.peak_mb
+
+
+def _pipeline_probe(scale: float, seed: int = 0, similarity_threshold: float = 80, max_days_left: int = 5,
+                    processes: int = 1, candidates: int = None):
+    """
+    Run in a child process: push a synthetic universe through every scan stage and
+    print each stage's wall time, peak RSS growth and item count as JSON.
+
+    fetch downloads and parses everything from a local stand-in server (parsing
+    overlaps the downloads, as in a real scan) while recording the responses;
+    transform re-parses those recordings on their own. matching runs on
+    `processes` worker processes, whose memory is not in its peak, or through
+    the candidate index (see matching.match_titles).
+    """
+    from . import fetch, ingest, replay, synthetic
+    from .matching import match_titles
+    from .pricing import join_outcome_pairs, price_opportunities
+    from .standin import start_standin
+
+    kalshi_feed, polymarket_events = synthetic.generate(scale, seed)
+    markets = synthetic.market_count(kalshi_feed, polymarket_events)
+    server, url = start_standin(kalshi_feed, polymarket_events, kalshi_page_size=500)
+    del kalshi_feed, polymarket_events
+
+    results = {}
+    with tempfile.TemporaryDirectory() as captures:
+        try:
+            _, ms, peak_mb = _measure(lambda: fetch.get_all_events(kalshi_url=url, polymarket_url=url,
+                                                                   record=captures))
+        finally:
+            server.shutdown()
+        results['fetch'] = {'ms': ms, 'peak_mb': peak_mb, 'items': markets}
+        bodies = list(replay.read_captures(captures))
+
+    def transform():
+        frames = {venue: [] for venue in fetch.MERGE_KEYS}
+        for page_url, body in bodies:
+            if '/v1/users/feed' in page_url:
+                frames['kalshi'].append(ingest.kalshi_frame(body)[0])
+            else:
+                frames['polymarket'].append(ingest.polymarket_frame(body)[0])
+        return [fetch.merge_frames(frames[venue], keys) for venue, keys in fetch.MERGE_KEYS.items()]
+
+    (kalshi_events, polymarket_events), ms, peak_mb = _measure(transform)
+    results['transform'] = {'ms': ms, 'peak_mb': peak_mb, 'items': markets}
+    del bodies
+
+    kalshi_titles = kalshi_events['title'].to_list()
+    poly_titles = polymarket_events['title'].to_list()
+    subtitles = (kalshi_events['subtitle'].to_list(), polymarket_events['subtitle'].to_list())
+    matches, ms, peak_mb = _measure(lambda: match_titles(kalshi_titles, poly_titles, similarity_threshold,
+                                                         processes=processes, candidates=candidates,
+                                                         subtitles=subtitles))
+    results['matching'] = {'ms': ms, 'peak_mb': peak_mb, 'items': len(kalshi_titles) * len(poly_titles)}
+
+    def price():
+        pairs = join_outcome_pairs(kalshi_events, polymarket_events, *matches, similarity_threshold, max_days_left)
+        return pairs.height, price_opportunities(pairs)
+
+    (pairs, opportunities), ms, peak_mb = _measure(price)
+    results['pricing'] = {'ms': ms, 'peak_mb': peak_mb, 'items': pairs}
+    print(json.dumps({'results': results, 'kalshi_events': kalshi_events.height,
+                      'polymarket_events': polymarket_events.height, 'opportunities': opportunities.height}))
+
+
+def _regressions(scale: str, results: dict, baseline: dict, tolerance: float):
+    """ Stages of `scale` that got slower, or grew more memory, than `baseline` allows. """
+    previous = baseline.get('scales', {}).get(scale, {})
+    found = []
+    for stage, now in results.items():
+        before = previous.get(stage)
+        if not before:
+            continue
+        if now['ms'] > before['ms'] * (1 + tolerance):
+            found.append(f"{stage} wall {before['ms']:.1f} -> {now['ms']:.1f} ms")
+        # Small payloads make RSS noisy, so memory also has to grow by a few MiB to count
+        if now['peak_mb'] > before['peak_mb'] * (1 + tolerance) + 16:
+            found.append(f"{stage} peak {before['peak_mb']:.1f} -> {now['peak_mb']:.1f} MiB")
+    return found
+
+
+def measure_pipeline(scales=(1, 10, 100), repeat: int = 1, save: str = None, baseline: str = None,
+                     tolerance: float = 0.25, processes: int = 1, candidates: int = None) -> bool:
+    """
+    Print per-stage wall time, peak RSS and throughput of a scan over synthetic
+    universes `scales` times the live size, each scale in a fresh process and the
+    best of `repeat` runs kept.
+
+    With `save`, the results are written as JSON; with `baseline`, they are
+    compared against such a file and any stage over `tolerance` counts as a
+    regression. Returns whether there were none.
+    """
+    reference = None
+    if baseline:
+        with open(baseline) as f:
+            reference = json.load(f)
+
+    report = {'scales': {}}
+    within = True
+    for scale in scales:
+        best = None
+        for _ in range(repeat):
+            result = subprocess.run([sys.executable, '-c', 'from prediction_markets.bench import _pipeline_probe; '
+                                     f'_pipeline_probe({scale!r}, processes={processes!r}, candidates={candidates!r})'],
+                                    check=True, capture_output=True, text=True)
+            sample = json.loads(result.stdout.splitlines()[-1])
+            if best is None:
+                best = sample
+            else:
+                for stage, stats in sample['results'].items():
+                    kept = best['results'][stage]
+                    kept['ms'] = min(kept['ms'], stats['ms'])
+                    kept['peak_mb'] = min(kept['peak_mb'], stats['peak_mb'])
+
+        results = best['results']
+        report['scales'][str(scale)] = results
+        print(f"scale {scale:g}x: {best['kalshi_events']} Kalshi / {best['polymarket_events']} Polymarket events, "
+              f"{best['opportunities']} opportunities")
+        for stage, unit in PIPELINE_STAGES:
+            stats = results[stage]
+            rate = stats['items'] / (stats['ms'] / 1000) if stats['ms'] else 0.0
+            print(f"  {stage:<10} {stats['ms']:10.1f} ms  {stats['peak_mb']:8.1f} MiB peak  {rate:14,.0f} {unit}/s")
+
+        if reference is not None:
+            for regression in _regressions(str(scale), results, reference, tolerance):
+                within = False
+                print(f"  REGRESSION {regression}")
+
+    if save:
+        with open(save, 'w') as f:
+            json.dump(report, f, indent=2)
+    return within
+
+
+def measure_stream(scale: float = 1, messages: int = 20_000, budget_ms: float = 5) -> bool:
+    """
+    Replay a synthetic order book stream for a `scale` universe through the
+    websocket stand-in and check the p99 time from receiving a message to having
+    re-priced every pair it touches against `budget_ms`.
+    """
+    import asyncio
+
+    import numpy as np
+
+    from . import fetch, ingest, streaming, synthetic
+    from .arbitrage import match_outcome_pairs
+    from .standin import STREAM_PATHS, start_stream_standin
+
+    kalshi_feed, polymarket_events = synthetic.generate(scale)
+    kalshi_events = ingest.kalshi_frame(json.dumps({'feed': kalshi_feed}).encode())[0]
+    polymarket_frame = ingest.polymarket_frame(json.dumps(polymarket_events).encode())[0]
+    pairs = match_outcome_pairs(fetch.merge_frames([kalshi_events], fetch.MERGE_KEYS['kalshi']),
+                                fetch.merge_frames([polymarket_frame], fetch.MERGE_KEYS['polymarket']), 80, 30)
+    streamer = streaming.Streamer(streaming.PairBook(pairs))
+    standin, url = start_stream_standin(synthetic.quote_stream(kalshi_feed, polymarket_events, messages))
+    try:
+        urls = {venue: url + path for path, venue in STREAM_PATHS.items()}
+        asyncio.run(streamer.run(urls=urls, reconnect=False))
+    finally:
+        standin.shutdown()
+
+    latencies = np.fromiter(streamer.latencies, dtype=np.float64)
+    p99 = np.percentile(latencies, 99)
+    ok = p99 <= budget_ms
+    print(f"{pairs.height} matched outcome pairs, {len(streamer.book.open)} open opportunities after the replay")
+    print(f"{streamer.latency_summary()}  budget p99 {budget_ms:g} ms  {'ok' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+def measure_execution(scale: float = 1, messages: int = 2000, latency_ms: float = 1.0,
+                      budget_us: float = 10_000, interval: float = 0.005) -> bool:
+    """
+    Replay a synthetic order book stream in real time with an execution engine attached,
+    sending orders to a simulated exchange that answers after `latency_ms`, and
+    check the p99 time from detecting an opportunity to submitting its legs
+    against `budget_us`. Submit-to-ack is reported too. Both stand-ins run in
+    this process, so on a small machine they compete with the engine for the CPU.
+    """
+    import asyncio
+
+    import numpy as np
+
+    from . import fetch, ingest, streaming, synthetic
+    from .arbitrage import match_outcome_pairs
+    from .execution import ExecutionEngine, default_gateways
+    from .standin import STREAM_PATHS, start_exchange_standin, start_stream_standin
+
+    kalshi_feed, polymarket_events = synthetic.generate(scale)
+    kalshi_events = ingest.kalshi_frame(json.dumps({'feed': kalshi_feed}).encode())[0]
+    polymarket_frame = ingest.polymarket_frame(json.dumps(polymarket_events).encode())[0]
+    pairs = match_outcome_pairs(fetch.merge_frames([kalshi_events], fetch.MERGE_KEYS['kalshi']),
+                                fetch.merge_frames([polymarket_frame], fetch.MERGE_KEYS['polymarket']), 80, 30)
+    book = streaming.PairBook(pairs)
+    exchange, exchange_url = start_exchange_standin(latency=latency_ms / 1000)
+    engine = ExecutionEngine(default_gateways(exchange_url), max_contracts=10).start()
+    engine.prepare([(venue, leg) for venue in ('kalshi', 'polymarket') for leg in book.legs(venue)])
+    streamer = streaming.Streamer(book, engine.submit)
+    # Quotes arrive as recorded, a few hundred a second, rather than back to back
+    stream = synthetic.quote_stream(kalshi_feed, polymarket_events, messages, interval=interval)
+    standin, url = start_stream_standin(stream, realtime=True)
+    try:
+        urls = {venue: url + path for path, venue in STREAM_PATHS.items()}
+        asyncio.run(streamer.run(urls=urls, reconnect=False))
+    finally:
+        standin.shutdown()
+        engine.stop()
+        exchange.shutdown()
+
+    legs = [fill.submitted_ns - execution.detected_ns for execution in engine.executions for fill in execution.legs]
+    if not legs:
+        print("No opportunities were executed")
+        return False
+    p99 = np.percentile(np.array(legs) / 1e3, 99)
+    ok = p99 <= budget_us
+    print(f"{pairs.height} matched outcome pairs, {len(exchange.orders)} orders sent, simulated latency {latency_ms:g} ms")
+    print(f"{engine.latency_summary()}  budget detect->submit p99 {budget_us:g} us  {'ok' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+def measure_sizing(pairs: int = 2000, levels: int = 10, repeat: int = 3, budget_pairs_per_s: float = 500) -> bool:
+    """ Throughput of sizing `pairs` hedges against `levels`-deep ladders on both legs, against a pairs/s floor. """
+    import random
+
+    from .sizing import levels_frame, size_pairs
+
+    rng = random.Random(0)
+    ladders = []
+    for _ in range(pairs):
+        yes = rng.randint(20, 70)
+        no = rng.randint(90 - yes, 103 - yes)
+        ladders.append(([(yes + i, rng.choice([10, 25, 50, 100, 250])) for i in range(levels)],
+                        [(no + i, rng.choice([10, 25, 50, 100, 250])) for i in range(levels)]))
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        sized = size_pairs(levels_frame(ladders), min_profit=1.0, max_stake=1000)
+        best = min(best, time.perf_counter() - started)
+    rate = pairs / best
+    ok = rate >= budget_pairs_per_s
+    print(f"{pairs} pairs x {levels} levels per leg: {best * 1000:.1f} ms, {rate:,.0f} pairs/s, "
+          f"{sized.height} sized  budget {budget_pairs_per_s:,.0f} pairs/s  {'ok' if ok else 'UNDER BUDGET'}")
+    return ok
+
+
+def run(args) -> int:
+    if args.target == 'startup':
+        return 0 if measure_startup(args.repeat or 5, args.budget_ms, args.scan_budget_ms) else 1
+    if args.target == 'ingest':
+        return 0 if measure_ingest(args.markets, args.repeat or 3, args.ingest_budget_ms, args.ingest_budget_mb) else 1
+    if args.target == 'stream':
+        return 0 if measure_stream(args.scale[0], args.messages or 20_000, args.stream_budget_ms) else 1
+    if args.target == 'execution':
+        return 0 if measure_execution(args.scale[0], args.messages or 2000, args.exchange_latency_ms,
+                                      args.execution_budget_us) else 1
+    if args.target == 'sizing':
+        return 0 if measure_sizing(repeat=args.repeat or 3) else 1
+    if args.target == 'pipeline':
+        return 0 if measure_pipeline(args.scale, args.repeat or 1, args.save, args.baseline, args.tolerance,
+                                     args.processes or None, args.candidates) else 1
+    raise ValueError(f"Unknown benchmark: {args.target}")
@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+
+import polars as pl
+
+CACHE_ROOT = os.environ.get('PREDICTION_MARKETS_CACHE',
+                            os.path.join(os.path.expanduser('~'), '.cache', 'prediction-markets'))
+DEFAULT_CACHE_DIR = os.path.join(CACHE_ROOT, 'http')
+
+
+class ResponseCache:
+    """
+    On-disk cache of venue responses keyed by URL and query parameters.
+
+    Each entry keeps the gzipped body, its ETag / Last-Modified validators and,
+    once a page has been through transform_data, the resulting frame as Parquet
+    so an unchanged page never has to be transformed again.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, url: str, params: dict = None) -> str:
+        canonical = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f'{key}.{suffix}')
+
+    def lookup(self, key: str):
+        """ Metadata of a cached response, or None. """
+        try:
+            with open(self._path(key, 'json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def validators(self, meta) -> dict:
+        """ Conditional request headers for a cached response. """
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def read_body(self, key: str):
+        """ The cached body, or None if it is missing or corrupt. """
+        try:
+            with open(self._path(key, 'body.gz'), 'rb') as f:
+                return gzip.decompress(f.read())
+        except (OSError, EOFError, zlib.error):
+            return None
+
+    def drop(self, key: str):
+        """ Forget a cached response: its validators, body and frame. """
+        for suffix in ('json', 'body.gz', 'parquet'):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _write_meta(self, key: str, meta: dict):
+        tmp = self._path(key, 'json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(key, 'json'))
+
+    def write(self, key: str, url: str, body: bytes, headers) -> dict:
+        """ Store a fresh 200 response. Any frame derived from the old body is dropped. """
+        with open(self._path(key, 'body.gz.tmp'), 'wb') as f:
+            f.write(gzip.compress(body, compresslevel=1))
+        os.replace(self._path(key, 'body.gz.tmp'), self._path(key, 'body.gz'))
+        try:
+            os.remove(self._path(key, 'parquet'))
+        except FileNotFoundError:
+            pass
+
+        meta = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        self._write_meta(key, meta)
+        return meta
+
+    def annotate(self, key: str, meta: dict, **fields) -> dict:
+        """ Persist extra fields (e.g. event counts) alongside a cached response. """
+        meta = {**meta, **fields}
+        self._write_meta(key, meta)
+        return meta
+
+    def read_frame(self, key: str):
+        """ The transformed frame of a cached response, or None if it was never transformed. """
+        try:
+            return pl.read_parquet(self._path(key, 'parquet'))
+        except (OSError, pl.exceptions.ComputeError):
+            return None
+
+    def write_frame(self, key: str, frame: pl.DataFrame):
+        tmp = self._path(key, 'parquet.tmp')
+        frame.write_parquet(tmp)
+        os.replace(tmp, self._path(key, 'parquet'))
+
+
+class EventSnapshot:
+    """
+    Last full Polymarket frame plus the newest `updatedAt` seen, so later polls
+    only need the events updated since then.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, name: str = 'polymarket'):
+        self.frame_path = os.path.join(directory, f'{name}.snapshot.parquet')
+        self.meta_path = os.path.join(directory, f'{name}.snapshot.json')
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self):
+        """ (frame, meta) of the stored snapshot, or (None, None). """
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            return pl.read_parquet(self.frame_path), meta
+        except (OSError, ValueError, pl.exceptions.ComputeError):
+            return None, None
+
+    def is_fresh(self, meta, max_age: float) -> bool:
+        """ Whether the last full refresh is recent enough to keep applying deltas on top. """
+        return bool(meta) and time.time() - meta.get('full_at', 0) < max_age
+
+    def save(self, frame: pl.DataFrame, watermark: str, full_at: float, **fields):
+        frame.write_parquet(self.frame_path + '.tmp')
+        os.replace(self.frame_path + '.tmp', self.frame_path)
+        with open(self.meta_path + '.tmp', 'w') as f:
+            json.dump({'watermark': watermark, 'full_at': full_at, **fields}, f)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+
+
+def apply_delta(snapshot: pl.DataFrame, changed: pl.DataFrame) -> pl.DataFrame:
+    """ Replace the snapshot rows of every changed event and drop events that have already ended. """
+    if snapshot is None or snapshot.is_empty():
+        merged = changed
+    elif changed.is_empty():
+        merged = snapshot
+    else:
+        merged = pl.concat([
+            snapshot.filter(~pl.col('title').is_in(changed['title'].implode())),
+            changed,
+        ], how='vertical_relaxed')
+    if merged.is_empty():
+        return merged
+    return merged.filter(pl.col('endDate').is_null() | (pl.col('endDate') >= datetime.now(timezone.utc).replace(tzinfo=None)))
@@ -0,0 +1,218 @@
+"""Candidate generation for title matching.
+
+An inverted index maps the words and character trigrams of every title to the
+titles containing them. A query walks the postings of only its rarest
+features and ranks titles by the IDF weight they share with it, so titles with
+nothing distinctive in common (an NBA game and a Fed decision) are never
+compared. Only the top candidates of each title go on to the exact
+fuzz.ratio, which turns the all-pairs scan into work roughly linear in the
+number of titles.
+
+Subtitles are indexed too: a subtitle adds its first words (not its
+trigrams) to its title's features, so a long one cannot swamp the index.
+
+The index is incremental: titles can be added, removed and replaced one at a
+time as venues list and delist markets, and match_candidates keeps one
+resident index that each call only brings up to date.
+"""
+import math
+import re
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+NGRAM = 3
+# A query only walks the postings of this many of its rarest features...
+QUERY_FEATURES = 8
+# ...and skips features held by more titles than this (unless it has nothing rarer), so its cost stays flat
+MAX_POSTINGS = 32
+# Postings are dropped for features held by more titles than this; only their counts are kept
+POSTINGS_LIMIT = 8 * MAX_POSTINGS
+# A subtitle adds at most this many of its distinct words
+SUBTITLE_WORDS = 32
+
+WORD = re.compile(r'\w+')
+
+
+def title_features(title: str, subtitle: str = '') -> frozenset:
+    """
+    Words (prefixed with \\x1f so they never collide with a trigram) and character
+    trigrams of a normalized title, plus the first SUBTITLE_WORDS distinct words
+    of its normalized subtitle.
+    """
+    text = ' '.join(title.split())
+    grams = {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+    words = set(WORD.findall(text)) | set(list(dict.fromkeys(WORD.findall(subtitle)))[:SUBTITLE_WORDS])
+    return frozenset(grams | {'\x1f' + word for word in words})
+
+
+class TitleIndex:
+    """
+    Inverted index of word and trigram features over titles and their subtitles, keyed by any hashable key.
+
+    Features are interned to integer ids and each title keeps its ids as one
+    small int32 array. Postings are only kept for features held by at most
+    POSTINGS_LIMIT titles: a query never walks a commoner feature's postings
+    (see MAX_POSTINGS), so for those a count is enough to weight them.
+    """
+
+    def __init__(self, items=()):
+        self.ids = {}
+        self.df = []
+        self.postings = {}
+        self.features = {}
+        # Items are (key, title) or (key, title, subtitle)
+        for key, *item in items:
+            self.add(key, *item)
+
+    def __len__(self):
+        return len(self.features)
+
+    def __contains__(self, key):
+        return key in self.features
+
+    def _intern(self, features) -> np.ndarray:
+        ids = np.empty(len(features), dtype=np.int32)
+        for n, feature in enumerate(features):
+            i = self.ids.get(feature)
+            if i is None:
+                i = self.ids[feature] = len(self.df)
+                self.df.append(0)
+                self.postings[i] = set()
+            ids[n] = i
+        ids.sort()
+        return ids
+
+    def add(self, key, title: str, subtitle: str = ''):
+        """ Index `title` and its `subtitle` under `key`, replacing whatever the key held before. """
+        if key in self.features:
+            self.remove(key)
+        ids = self._intern(title_features(_normalize(title), _normalize(subtitle)))
+        self.features[key] = ids
+        for i in ids.tolist():
+            self.df[i] += 1
+            keys = self.postings.get(i)
+            if keys is None:
+                continue
+            if self.df[i] > POSTINGS_LIMIT:
+                del self.postings[i]
+            else:
+                keys.add(key)
+
+    update = add
+
+    def remove(self, key):
+        """ Drop `key` from the index; unknown keys are ignored. """
+        ids = self.features.pop(key, None)
+        if ids is None:
+            return
+        for i in ids.tolist():
+            self.df[i] -= 1
+            keys = self.postings.get(i)
+            if keys is not None:
+                keys.discard(key)
+            elif self.df[i] <= POSTINGS_LIMIT // 2:
+                # Rare again: rebuild its postings (halfway down, so a feature hovering at the limit is not rebuilt every time)
+                self.postings[i] = {other for other, features in self.features.items()
+                                    if features[min(np.searchsorted(features, i), len(features) - 1)] == i}
+
+    def sync(self, items: dict):
+        """ Hold exactly the keys of `items` (key -> (title, subtitle)); only keys not indexed yet are added. """
+        for key in [key for key in self.features if key not in items]:
+            self.remove(key)
+        for key, (title, subtitle) in items.items():
+            if key not in self.features:
+                self.add(key, title, subtitle)
+
+    def idf(self, feature: str) -> float:
+        """ Smoothed inverse document frequency of `feature` over the titles currently indexed. """
+        i = self.ids.get(feature)
+        return math.log((len(self.features) + 1) / ((0 if i is None else self.df[i]) + 1)) + 1
+
+    def search(self, title: str, k: int = 10, subtitle: str = ''):
+        """ Up to `k` (key, score) pairs of the indexed titles most likely to match `title`, best first. """
+        if not self.features:
+            return []
+        ids = self.ids
+        features = title_features(_normalize(title), _normalize(subtitle))
+        known = sorted((self.df[i], i) for i in (ids.get(feature) for feature in features)
+                       if i is not None and self.df[i])
+        if not known:
+            return []
+
+        # Candidates are the titles sharing one of the query's rarest features...
+        cap = max(known[0][0], MAX_POSTINGS)
+        pool = set()
+        for df, i in known[:QUERY_FEATURES]:
+            if df > cap or i not in self.postings:
+                break
+            pool.update(self.postings[i])
+        if not pool:
+            return []
+
+        # ...ranked by the IDF weight of everything they share, over the square root of their size
+        total = len(self.features) + 1
+        query = np.array([i for _, i in known])
+        weights = np.zeros(len(self.df))
+        weights[query] = np.log(total / (np.array([df for df, _ in known]) + 1.0)) + 1
+        keys = list(pool)
+        arrays = [self.features[key] for key in keys]
+        sizes = np.fromiter(map(len, arrays), dtype=np.int64, count=len(arrays))
+        starts = np.zeros(len(arrays), dtype=np.int64)
+        np.cumsum(sizes[:-1], out=starts[1:])
+        scores = np.add.reduceat(weights[np.concatenate(arrays)], starts) / np.sqrt(sizes)
+
+        if len(keys) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(keys))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(keys[n], float(scores[n])) for n in top.tolist()]
+
+
+def _normalize(title) -> str:
+    return title.strip().lower() if isinstance(title, str) else ''
+
+
+def ratio_pairs(left, right, workers: int = -1):
+    """ fuzz.ratio of already normalized left[i] against right[i], in one batched call. """
+    return process.cpdist(left, right, scorer=fuzz.ratio, processor=None, dtype=np.float32, workers=workers)
+
+
+# Resident index for match_candidates calls that bring none
+RESIDENT = TitleIndex()
+
+
+def match_candidates(kalshi, poly, similarity_threshold: float, k: int = 10, workers: int = -1,
+                     kalshi_subtitles=None, poly_subtitles=None, index: TitleIndex = None):
+    """
+    Like matching.score_blocks, but each normalized Kalshi title is only scored
+    against its top `k` Polymarket candidates. Subtitles, if given, only help
+    find candidates. `index` (default: RESIDENT) is synced to `poly` rather
+    than rebuilt, so a call only indexes the titles the previous one did not
+    have. Returns (kalshi_idx, poly_idx, scores, pairs scored), in (kalshi, poly) order.
+    """
+    index = RESIDENT if index is None else index
+    kalshi_subtitles = [''] * len(kalshi) if kalshi_subtitles is None else list(map(_normalize, kalshi_subtitles))
+    poly_subtitles = [''] * len(poly) if poly_subtitles is None else list(map(_normalize, poly_subtitles))
+    positions = defaultdict(list)
+    for i, item in enumerate(zip(poly, poly_subtitles)):
+        positions[item].append(i)
+    index.sync({item: item for item in positions})
+
+    kalshi_idx, poly_idx = [], []
+    for i, (title, subtitle) in enumerate(zip(kalshi, kalshi_subtitles)):
+        for key, _ in index.search(title, k, subtitle):
+            for j in positions[key]:
+                kalshi_idx.append(i)
+                poly_idx.append(j)
+    kalshi_idx = np.array(kalshi_idx, dtype=np.int64)
+    poly_idx = np.array(poly_idx, dtype=np.int64)
+    if not len(kalshi_idx):
+        return kalshi_idx, poly_idx, np.empty(0, dtype=np.float32), 0
+
+    scores = ratio_pairs([kalshi[i] for i in kalshi_idx], [poly[i] for i in poly_idx], workers)
+    keep = scores >= similarity_threshold
+    order = np.lexsort((poly_idx[keep], kalshi_idx[keep]))
+    return kalshi_idx[keep][order], poly_idx[keep][order], scores[keep][order], len(scores)
@@ -0,0 +1,322 @@
+"""Arbitrage across any number of venues through one canonical event index.
+
+Pairwise matching compares every venue's titles with every other venue's, so
+each venue added multiplies the fuzzy work. Here every event instead maps once
+into a shared index of canonical events: it is looked up among the canonical
+titles listed so far (through candidates.TitleIndex, then scored exactly) and
+joins the best one at or above the threshold, or starts a new one. Outcomes are
+then grouped the same way within their canonical event, so two quotes for the
+same outcome on any pair of venues share a canonical outcome id and finding
+opportunities is a join on that id.
+
+Two kinds of opportunity are reported:
+
+- two-leg hedges: YES on one venue and NO on another, for the same canonical
+  outcome, costing under 100 cents together;
+- baskets: YES on every outcome of one venue's event, each bought wherever it is
+  cheapest, for under 100 cents in total. This only locks in a profit when
+  the outcomes are mutually exclusive and exhaustive, which none of the fields
+  we read say, so baskets are opt-in.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+import polars as pl
+
+from .candidates import TitleIndex, ratio_pairs
+from .matching import normalize_titles
+from .metrics import METRICS, log
+from .pricing import price_hedge
+from .venues import OUTCOME_SCHEMA, get_venue, get_venues, venue_outcomes
+
+HEDGE_SCHEMA = {
+    'event': pl.UInt32,
+    'outcome': pl.UInt32,
+    'yes_venue': pl.Utf8,
+    'no_venue': pl.Utf8,
+    'yes_title': pl.Utf8,
+    'no_title': pl.Utf8,
+    'yes_outcome': pl.Utf8,
+    'no_outcome': pl.Utf8,
+    'yes_id': pl.Utf8,
+    'no_id': pl.Utf8,
+    'yes_ask': pl.Float64,
+    'no_ask': pl.Float64,
+    'yes_stake': pl.Float64,
+    'no_stake': pl.Float64,
+    'yes_payout': pl.Float64,
+    'no_payout': pl.Float64,
+    'profit': pl.Float64,
+    'arbitrage_percentage': pl.Float64,
+    'end_date': pl.Datetime('us'),
+    'time_remaining': pl.Int64,
+}
+
+BASKET_SCHEMA = {
+    'event': pl.UInt32,
+    'venue': pl.Utf8,
+    'title': pl.Utf8,
+    'legs': pl.List(pl.Struct({'label': pl.Utf8, 'venue': pl.Utf8, 'yes_ask': pl.Float64, 'yes_id': pl.Utf8})),
+    'cost': pl.Float64,
+    'payout': pl.Float64,
+    'profit': pl.Float64,
+    'arbitrage_percentage': pl.Float64,
+    'end_date': pl.Datetime('us'),
+    'time_remaining': pl.Int64,
+}
+
+
+class CanonicalIndex:
+    """
+    Canonical events shared by every venue.
+
+    Each venue's titles are assigned in one batch: they are looked up among the
+    canonical events other venues listed before them. The ones that match none
+    start new events, except that a title at or above the threshold against one
+    started earlier in the same batch joins it, so a venue's own near-duplicates
+    share one canonical event.
+    """
+
+    def __init__(self, similarity_threshold: float = 75, k: int = 10, workers: int = -1):
+        self.similarity_threshold = similarity_threshold
+        self.k = k
+        self.workers = workers
+        self.index = TitleIndex()
+        self.titles = []
+
+    def __len__(self):
+        return len(self.titles)
+
+    def assign(self, titles) -> np.ndarray:
+        """ Canonical event id of every title, creating events for the ones that match none. """
+        titles = normalize_titles(titles)
+        rows, candidates = [], []
+        for row, title in enumerate(titles):
+            for key, _ in self.index.search(title, self.k):
+                rows.append(row)
+                candidates.append(key)
+        ids = np.full(len(titles), -1, dtype=np.int64)
+        if rows:
+            rows, candidates = np.array(rows), np.array(candidates)
+            scores = ratio_pairs([titles[row] for row in rows], [self.titles[key] for key in candidates], self.workers)
+            METRICS.inc('title_pairs_scored_total', len(scores))
+            keep = scores >= self.similarity_threshold
+            # Best candidate per title: sort by score, then take the first hit for each row
+            order = np.lexsort((-scores[keep], rows[keep]))
+            matched_rows, first = np.unique(rows[keep][order], return_index=True)
+            ids[matched_rows] = candidates[keep][order][first]
+
+        # Unmatched titles are looked up among the events this batch started so far, then start their own
+        batch = TitleIndex()
+        for row in np.flatnonzero(ids < 0).tolist():
+            title = titles[row]
+            keys = [key for key, _ in batch.search(title, self.k)]
+            if keys:
+                scores = ratio_pairs([title] * len(keys), [self.titles[key] for key in keys], self.workers)
+                METRICS.inc('title_pairs_scored_total', len(scores))
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    ids[row] = keys[best]
+                    continue
+            ids[row] = len(self.titles)
+            self.index.add(len(self.titles), title)
+            batch.add(len(self.titles), title)
+            self.titles.append(title)
+        return ids
+
+
+def canonical_outcomes(frames: dict, similarity_threshold: float = 75, k: int = 10,
+                       index: CanonicalIndex = None) -> pl.DataFrame:
+    """
+    Every venue's outcomes (see venues.venue_outcomes) tagged with their
+    canonical `event` and `outcome` ids; each venue event's own row number moves
+    to `venue_event`.
+
+    Venues are assigned in the order of `frames`. Outcome labels are matched
+    like titles, but only against the labels already seen for their canonical
+    event, so a lookup costs a handful of comparisons.
+    """
+    index = index or CanonicalIndex(similarity_threshold, k)
+    labels = []          # canonical outcome id -> normalized label
+    by_event = {}        # canonical event id -> [canonical outcome ids]
+    parts = []
+    for name, events in frames.items():
+        if events.is_empty():
+            continue
+        event_ids = index.assign(events['title'].to_list())
+        outcomes = venue_outcomes(events, get_venue(name)).rename({'event': 'venue_event'})
+        outcomes = outcomes.with_columns(
+            pl.Series('event', event_ids[outcomes['venue_event'].to_numpy()], dtype=pl.UInt32))
+
+        # Label pairs against the canonical outcomes already listed for the same event
+        events_of, normalized = outcomes['event'].to_list(), normalize_titles(outcomes['label'].to_list())
+        rows, candidates = [], []
+        for row, event in enumerate(events_of):
+            for outcome in by_event.get(event, ()):
+                rows.append(row)
+                candidates.append(outcome)
+        outcome_ids = np.full(len(normalized), -1, dtype=np.int64)
+        if rows:
+            rows, candidates = np.array(rows), np.array(candidates)
+            scores = ratio_pairs([normalized[row] for row in rows], [labels[c] for c in candidates])
+            METRICS.inc('outcome_pairs_scored_total', len(scores))
+            keep = scores >= similarity_threshold
+            order = np.lexsort((-scores[keep], rows[keep]))
+            matched_rows, first = np.unique(rows[keep][order], return_index=True)
+            outcome_ids[matched_rows] = candidates[keep][order][first]
+
+        # The rest start new canonical outcomes, one per distinct (event, label)
+        fresh = {}
+        for row in np.flatnonzero(outcome_ids < 0).tolist():
+            key = (events_of[row], normalized[row])
+            if key not in fresh:
+                fresh[key] = len(labels)
+                labels.append(normalized[row])
+                by_event.setdefault(events_of[row], []).append(fresh[key])
+            outcome_ids[row] = fresh[key]
+        parts.append(outcomes.with_columns(pl.Series('outcome', outcome_ids, dtype=pl.UInt32)))
+
+    if not parts:
+        return pl.DataFrame(schema={name if name != 'event' else 'venue_event': dtype
+                                    for name, dtype in OUTCOME_SCHEMA.items()} | {'event': pl.UInt32, 'outcome': pl.UInt32})
+    log.debug('%d canonical events, %d canonical outcomes', len(index), len(labels))
+    return pl.concat(parts)
+
+
+def _time_remaining(end_date: pl.Expr) -> pl.Expr:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (end_date - now).dt.total_days().alias('time_remaining')
+
+
+def hedge_opportunities(outcomes: pl.DataFrame, stake: float = 100, min_profit: float = 2.0,
+                        max_days_left: int = 5) -> pl.DataFrame:
+    """
+    Two-leg hedges across every pair of venues quoting the same canonical
+    outcome: YES on one, NO on the other. Returns HEDGE_SCHEMA, best first.
+    """
+    legs = outcomes.filter(pl.col('endDate').is_not_null())
+    if legs.is_empty():
+        return pl.DataFrame(schema=HEDGE_SCHEMA)
+    yes = legs.select('event', 'outcome', *[pl.col(name).alias(f'yes_{name}') for name in
+                                            ('venue', 'title', 'label', 'yes_ask', 'yes_id', 'endDate')])
+    no = legs.select('outcome', *[pl.col(name).alias(f'no_{name}') for name in
+                                  ('venue', 'title', 'label', 'no_ask', 'no_id', 'endDate')])
+    pairs = (
+        yes
+        .join(no, on='outcome')
+        .filter(pl.col('yes_venue') != pl.col('no_venue'))
+        .with_columns(pl.min_horizontal('yes_endDate', 'no_endDate').alias('end_date'))
+        .with_columns(_time_remaining(pl.col('end_date')))
+        .filter(pl.col('time_remaining') <= max_days_left)
+        .rename({'yes_label': 'yes_outcome', 'no_label': 'no_outcome', 'yes_yes_ask': 'yes_ask',
+                 'no_no_ask': 'no_ask', 'yes_yes_id': 'yes_id', 'no_no_id': 'no_id'})
+    )
+    opportunities = (
+        price_hedge(pairs, pl.col('yes_ask'), pl.col('no_ask'), stake)
+        .filter(pl.col('profit') >= min_profit)
+        .select(list(HEDGE_SCHEMA))
+        .cast(HEDGE_SCHEMA)
+        .sort('arbitrage_percentage', descending=True)
+    )
+    METRICS.inc('opportunities_found_total', opportunities.height)
+    return opportunities
+
+
+def basket_opportunities(outcomes: pl.DataFrame, stake: float = 100, min_profit: float = 2.0,
+                         max_days_left: int = 5) -> pl.DataFrame:
+    """
+    YES on every outcome of a venue event with at least two, each leg bought on
+    whichever venue quotes its canonical outcome cheapest. One share of each
+    pays exactly 100 cents if the outcomes are mutually exclusive and
+    exhaustive (see the module docstring). Returns BASKET_SCHEMA, best first.
+    """
+    legs = outcomes.filter(pl.col('endDate').is_not_null() & (pl.col('yes_ask') > 0))
+    if legs.is_empty():
+        return pl.DataFrame(schema=BASKET_SCHEMA)
+    cheapest = (
+        legs
+        .sort('yes_ask')
+        .group_by('outcome')
+        .agg(pl.col('venue', 'yes_ask', 'yes_id', 'endDate').first())
+        .rename({'venue': 'leg_venue', 'endDate': 'leg_endDate'})
+    )
+    baskets = (
+        legs
+        .select('event', 'venue', 'venue_event', 'title', 'label', 'outcome', 'endDate')
+        .join(cheapest, on='outcome')
+        .group_by('venue', 'venue_event', maintain_order=True)
+        .agg(
+            pl.col('event', 'title').first(),
+            pl.struct('label', pl.col('leg_venue').alias('venue'), 'yes_ask', 'yes_id').alias('legs'),
+            pl.col('yes_ask').sum().alias('cost'),
+            pl.min_horizontal(pl.col('endDate').min(), pl.col('leg_endDate').min()).alias('end_date'),
+            pl.col('outcome').n_unique().alias('distinct'),
+            pl.len().alias('count'),
+        )
+        # Every leg its own outcome, so a venue listing one label twice is not bought twice over
+        .filter((pl.col('count') >= 2) & (pl.col('distinct') == pl.col('count')))
+        .with_columns(_time_remaining(pl.col('end_date')))
+        .filter(pl.col('time_remaining') <= max_days_left)
+        .with_columns((stake * 100 / pl.col('cost')).alias('payout'))
+        .with_columns((pl.col('payout') - stake).alias('profit'))
+        .with_columns((pl.col('profit') / stake * 100).alias('arbitrage_percentage'))
+        .filter(pl.col('profit') >= min_profit)
+        .select(list(BASKET_SCHEMA))
+        .cast(BASKET_SCHEMA)
+        .sort('arbitrage_percentage', descending=True)
+    )
+    METRICS.inc('opportunities_found_total', baskets.height)
+    return baskets
+
+
+def report_venue_opportunities(hedges: pl.DataFrame, baskets: pl.DataFrame = None):
+    """ Print one block per opportunity found by find_venue_arbitrage. """
+    for opp in hedges.iter_rows(named=True):
+        print(f"\n** Arbitrage Opportunity Found! **")
+        print(f"Event: {opp['yes_title']} / {opp['no_title']}")
+        print(f"** Matched Outcome: {opp['yes_outcome']} <-> {opp['no_outcome']}")
+        print(f"✅ Buy YES on {opp['yes_venue']} at {opp['yes_ask']}% (Stake ${opp['yes_stake']:.2f})")
+        print(f"🚫 Buy NO on {opp['no_venue']} at {opp['no_ask']}% (Stake ${opp['no_stake']:.2f})")
+        print(f"** Expected Profit: ${opp['profit']:.2f} Arbitrage Percentage: ({opp['arbitrage_percentage']:.2f}%) **")
+        print(f"Time Remaining: {opp['time_remaining']} days")
+        print("-" * 50)
+    for opp in ([] if baskets is None else baskets.iter_rows(named=True)):
+        print(f"\n** Basket Opportunity Found! **")
+        print(f"Event: {opp['title']} ({opp['venue']}, {len(opp['legs'])} outcomes, {opp['cost']:g}% in total)")
+        for leg in opp['legs']:
+            print(f"✅ Buy YES '{leg['label']}' on {leg['venue']} at {leg['yes_ask']}%")
+        print(f"** Expected Profit: ${opp['profit']:.2f} Arbitrage Percentage: ({opp['arbitrage_percentage']:.2f}%) **")
+        print(f"Time Remaining: {opp['time_remaining']} days")
+        print("-" * 50)
+
+
+def find_venue_arbitrage(venues=('kalshi', 'polymarket'), similarity_threshold: float = 75, min_profit: float = 2.0,
+                         max_days_left: int = 5, stake: float = 100, baskets: bool = False, k: int = 10,
+                         cache_dir: str = None, **fetch_options):
+    """
+    Fetch every named venue concurrently and report the hedges (and, with
+    `baskets`, the baskets) across any combination of them. Extra keyword
+    arguments (urls, record, replay) go to venues.fetch_venues.
+
+    Returns (hedges, baskets or None).
+    """
+    from .cache import ResponseCache
+
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    with METRICS.timer('stage_seconds', stage='fetch'):
+        frames = get_venues(venues, cache=cache, **fetch_options)
+    if sum(not frame.is_empty() for frame in frames.values()) < 2:
+        log.warning("No events found on at least two venues.")
+        return None, None
+
+    with METRICS.timer('stage_seconds', stage='match'):
+        outcomes = canonical_outcomes(frames, similarity_threshold, k)
+    with METRICS.timer('stage_seconds', stage='price'):
+        hedges = hedge_opportunities(outcomes, stake, min_profit, max_days_left)
+        found = basket_opportunities(outcomes, stake, min_profit, max_days_left) if baskets else None
+
+    if hedges.is_empty() and (found is None or found.is_empty()):
+        print("No arbitrage opportunities found.")
+    else:
+        report_venue_opportunities(hedges, found)
+    return hedges, found
@@ -0,0 +1,381 @@
+"""Command line entry point: `prediction-markets scan | watch | stream | schedule | venues | backtest | bench`.
+
+Only the standard library is imported at module level so `--help` and argument
+errors stay fast; each command imports what it needs when it runs.
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+
+def _add_common_options(parser):
+    parser.add_argument('--similarity-threshold', type=float, default=80,
+                        help='minimum fuzz.ratio for titles and outcomes to match (default: 80)')
+    parser.add_argument('--min-profit', type=float, default=1.0,
+                        help='minimum guaranteed profit in dollars (default: 1.0)')
+    parser.add_argument('--max-days-left', type=int, default=5,
+                        help='skip pairs closing more than this many days out (default: 5)')
+    parser.add_argument('--stake', type=float, default=100, help='total stake per opportunity (default: 100)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='HTTP response cache directory (default: ~/.cache/prediction-markets/http)')
+    parser.add_argument('--no-cache', action='store_true', help='always download full responses')
+
+
+def _add_capture_options(parser):
+    capture = parser.add_mutually_exclusive_group()
+    capture.add_argument('--record', metavar='DIR', default=None,
+                         help='save every venue response under DIR for --replay (implies --no-cache)')
+    capture.add_argument('--replay', metavar='DIR', default=None,
+                         help='answer every venue request from a --record directory instead of the network '
+                              '(implies --no-cache)')
+
+
+def _add_scan_options(parser):
+    _add_common_options(parser)
+    parser.add_argument('--match-cache', default=None,
+                        help='SQLite match store (default: ~/.cache/prediction-markets/matches.sqlite)')
+    parser.add_argument('--no-match-cache', action='store_true', help='fuzzy-score every title on every run')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='worker processes for title matching on large universes, 0 for one per core (default: 1)')
+    parser.add_argument('--candidates', type=int, default=None, metavar='K',
+                        help='only score each title against its K most likely partners from an n-gram index '
+                             '(default: score every pair)')
+    _add_capture_options(parser)
+
+
+def _add_run_options(parser):
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='diagnostics written to stderr (default: INFO)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='serve per-stage metrics in Prometheus text format at http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-json', metavar='FILE', default=None,
+                        help='write a JSON snapshot of the metrics to FILE periodically and on exit')
+    parser.add_argument('--metrics-interval', type=float, default=10,
+                        help='seconds between --metrics-json snapshots (default: 10)')
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                        help='run under cProfile and write the stats to FILE (for pstats / snakeviz)')
+
+
+def _add_execution_options(parser):
+    parser.add_argument('--execute', metavar='URL', default=None,
+                        help='send both legs of every new opportunity as orders to the exchange at URL, '
+                             'e.g. a simulated one from standin.start_exchange_standin')
+    parser.add_argument('--max-contracts', type=float, default=None,
+                        help='cap on the contracts bought per leg with --execute')
+
+
+def _add_history_option(parser):
+    parser.add_argument('--history', metavar='DIR', default=None,
+                        help="append both venues' normalized frames to a Parquet store under DIR on every poll, "
+                             "for backtest")
+
+
+def _timestamp(value: str) -> datetime:
+    """ An ISO-8601 date or time as naive UTC; times without an offset are taken as UTC. """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _instrumented(args):
+    """ Run the command with the logging, metrics exposition and profiling its options ask for. """
+    from .metrics import MetricsDumper, configure_logging, profiled, serve_metrics
+
+    configure_logging(args.log_level)
+    server = serve_metrics(args.metrics_port) if args.metrics_port is not None else None
+    dumper = MetricsDumper(args.metrics_json, args.metrics_interval) if args.metrics_json else None
+    try:
+        with profiled(args.profile):
+            return args.func(args)
+    finally:
+        if dumper:
+            dumper.stop()
+        if server:
+            server.shutdown()
+
+
+def _response_cache(args):
+    """ The HTTP response cache directory, or None when the command's options rule it out. """
+    # A recording needs full responses and a replay has no conditional or delta requests to answer
+    if args.no_cache or args.record or args.replay:
+        return None
+    from .cache import DEFAULT_CACHE_DIR
+    return args.cache_dir or DEFAULT_CACHE_DIR
+
+
+def _cache_options(args):
+    """ Resolve the cache locations, only importing the cache modules when they are used. """
+    cache_dir, match_cache = _response_cache(args), None
+    if not args.no_match_cache:
+        from .match_cache import DEFAULT_MATCH_CACHE
+        match_cache = args.match_cache or DEFAULT_MATCH_CACHE
+    return cache_dir, match_cache
+
+
+def run_scan(args):
+    from .arbitrage import find_arbitrage
+
+    cache_dir, match_cache = _cache_options(args)
+    find_arbitrage(similarity_threshold=args.similarity_threshold, min_profit=args.min_profit,
+                   max_days_left=args.max_days_left, stake=args.stake,
+                   cache_dir=cache_dir, delta=cache_dir is not None, match_cache=match_cache,
+                   depth=args.depth, processes=args.processes or None, candidates=args.candidates,
+                   history=args.history, record=args.record, replay=args.replay)
+    return 0
+
+
+def _executor(args):
+    """ A started execution engine when --execute is given, else None. """
+    if not args.execute:
+        return None
+    from .execution import ExecutionEngine, default_gateways
+
+    return ExecutionEngine(default_gateways(args.execute), max_contracts=args.max_contracts).start()
+
+
+def _stop_executor(executor):
+    if executor is not None:
+        executor.stop()
+        from .metrics import log
+        log.info('%s', executor.latency_summary())
+
+
+def run_watch(args):
+    from .scanner import Scanner
+
+    cache_dir, match_cache = _cache_options(args)
+    store = None
+    if match_cache:
+        from .match_cache import MatchStore
+        store = MatchStore(match_cache)
+    history = None
+    if args.history:
+        from .history import SnapshotStore
+        history = SnapshotStore(args.history)
+
+    executor = _executor(args)
+    scanner = Scanner(similarity_threshold=args.similarity_threshold, min_profit=args.min_profit,
+                      max_days_left=args.max_days_left, stake=args.stake, store=store,
+                      processes=args.processes or None, candidates=args.candidates, executor=executor,
+                      history=history)
+    try:
+        scanner.run(interval=args.interval, cycles=args.cycles, cache_dir=cache_dir,
+                    record=args.record, replay=args.replay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _stop_executor(executor)
+    return 0
+
+
+def run_stream(args):
+    from .streaming import stream_arbitrage
+
+    cache_dir, match_cache = _cache_options(args)
+    # Kalshi only streams to authenticated connections, so it needs headers (or a stand-in URL)
+    venues = ['polymarket']
+    if args.kalshi_header or args.kalshi_ws_url:
+        venues.append('kalshi')
+    headers = {'kalshi': {name.strip(): value.strip()
+                          for name, value in (header.split(':', 1) for header in args.kalshi_header)}}
+    executor = _executor(args)
+    try:
+        stream_arbitrage(similarity_threshold=args.similarity_threshold, min_profit=args.min_profit,
+                         max_days_left=args.max_days_left, stake=args.stake, cache_dir=cache_dir,
+                         match_cache=match_cache, duration=args.duration, venues=venues,
+                         urls={'kalshi': args.kalshi_ws_url, 'polymarket': args.polymarket_ws_url},
+                         headers=headers, record_stream=args.record_stream, processes=args.processes or None,
+                         candidates=args.candidates, executor=executor, record=args.record, replay=args.replay)
+    finally:
+        _stop_executor(executor)
+    return 0
+
+
+def run_schedule(args):
+    from .schedule import schedule_arbitrage
+
+    cache_dir, match_cache = _cache_options(args)
+    executor = _executor(args)
+    try:
+        schedule_arbitrage(similarity_threshold=args.similarity_threshold, min_profit=args.min_profit,
+                           max_days_left=args.max_days_left, stake=args.stake, cache_dir=cache_dir,
+                           match_cache=match_cache, duration=args.duration, min_interval=args.min_interval,
+                           max_interval=args.max_interval, discover_interval=args.discover_interval,
+                           processes=args.processes or None, candidates=args.candidates, executor=executor,
+                           record=args.record, replay=args.replay)
+    finally:
+        _stop_executor(executor)
+    return 0
+
+
+def run_venues(args):
+    from .canonical import find_venue_arbitrage
+
+    find_venue_arbitrage(args.venues, similarity_threshold=args.similarity_threshold, min_profit=args.min_profit,
+                         max_days_left=args.max_days_left, stake=args.stake, baskets=args.baskets,
+                         k=args.candidates, cache_dir=_response_cache(args), record=args.record, replay=args.replay)
+    return 0
+
+
+def run_backtest(args):
+    from .history import DEFAULT_HISTORY_DIR, backtest, report_backtest
+
+    summary, runs = backtest(args.history or DEFAULT_HISTORY_DIR, start=args.start, end=args.end,
+                             similarity_threshold=args.similarity_threshold, min_profit=args.min_profit,
+                             max_days_left=args.max_days_left, stake=args.stake, candidates=args.candidates,
+                             processes=args.processes or None, min_seconds=args.min_seconds,
+                             closing_after=args.closing_after, closing_before=args.closing_before)
+    report_backtest(summary, args.min_seconds)
+    if args.save:
+        runs.write_parquet(args.save)
+    return 0
+
+
+def run_bench(args):
+    from . import bench
+
+    return bench.run(args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='prediction-markets',
+                                     description='Find arbitrage between Kalshi and Polymarket markets.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan = commands.add_parser('scan', help='fetch both venues once and report opportunities')
+    _add_scan_options(scan)
+    _add_run_options(scan)
+    scan.add_argument('--depth', action='store_true',
+                      help="size each opportunity against both order books, using --stake as the budget")
+    _add_history_option(scan)
+    scan.set_defaults(func=run_scan)
+
+    watch = commands.add_parser('watch', help='keep polling and re-evaluate only what changed')
+    _add_scan_options(watch)
+    _add_run_options(watch)
+    watch.add_argument('--interval', type=float, default=60, help='seconds between polls (default: 60)')
+    watch.add_argument('--cycles', type=int, default=None, help='stop after this many polls')
+    _add_history_option(watch)
+    _add_execution_options(watch)
+    watch.set_defaults(func=run_watch)
+
+    stream = commands.add_parser('stream', help='match once, then price matched pairs from live order book streams')
+    _add_scan_options(stream)
+    _add_run_options(stream)
+    stream.add_argument('--duration', type=float, default=None, help='stop after this many seconds')
+    stream.add_argument('--polymarket-ws-url', default=None, help='Polymarket market channel URL')
+    stream.add_argument('--kalshi-ws-url', default=None, help='Kalshi websocket URL')
+    stream.add_argument('--kalshi-header', action='append', default=[], metavar='NAME:VALUE',
+                        help='handshake header for Kalshi (repeatable); Kalshi is only streamed with these '
+                             'or --kalshi-ws-url')
+    stream.add_argument('--record-stream', metavar='FILE', default=None,
+                        help='save every websocket message to FILE for the stream stand-in')
+    _add_execution_options(stream)
+    stream.set_defaults(func=run_stream)
+
+    schedule = commands.add_parser('schedule', help='match once, then refresh each matched order book at a rate '
+                                                    'set by its time to close and recent volatility')
+    _add_scan_options(schedule)
+    _add_run_options(schedule)
+    schedule.add_argument('--duration', type=float, default=None, help='stop after this many seconds')
+    schedule.add_argument('--min-interval', type=float, default=0.25,
+                          help='shortest seconds between refreshes of one order book (default: 0.25)')
+    schedule.add_argument('--max-interval', type=float, default=900,
+                          help='longest seconds between refreshes of one order book (default: 900)')
+    schedule.add_argument('--discover-interval', type=float, default=300,
+                          help='seconds between re-fetching and re-matching both venues (default: 300)')
+    _add_execution_options(schedule)
+    schedule.set_defaults(func=run_schedule)
+
+    venues = commands.add_parser('venues', help='match any set of venues through one canonical event index '
+                                                'and report opportunities across every combination')
+    _add_common_options(venues)
+    _add_capture_options(venues)
+    _add_run_options(venues)
+    venues.add_argument('--venues', nargs='+', default=['kalshi', 'polymarket'], metavar='VENUE',
+                        help='registered venues to fetch (default: kalshi polymarket)')
+    venues.add_argument('--candidates', type=int, default=10, metavar='K',
+                        help='canonical events each title is scored against (default: 10)')
+    venues.add_argument('--baskets', action='store_true',
+                        help="also report buying YES on every outcome of an event for under 100 cents in total; "
+                             "only sound when the outcomes are mutually exclusive and exhaustive")
+    venues.set_defaults(func=run_venues)
+
+    backtest = commands.add_parser('backtest', help='replay polls stored with --history over a grid of parameters '
+                                                    'and report how long opportunities stayed open')
+    backtest.add_argument('--history', metavar='DIR', default=None,
+                          help='snapshot store to replay (default: ~/.cache/prediction-markets/history)')
+    backtest.add_argument('--start', type=_timestamp, default=None, help='first poll to replay (ISO date or time, UTC)')
+    backtest.add_argument('--end', type=_timestamp, default=None, help='last poll to replay (ISO date or time, UTC)')
+    backtest.add_argument('--closing-after', type=_timestamp, default=None,
+                          help='only replay events closing at or after this time')
+    backtest.add_argument('--closing-before', type=_timestamp, default=None,
+                          help='only replay events closing at or before this time')
+    backtest.add_argument('--similarity-threshold', type=float, nargs='+', default=[80],
+                          help='fuzz.ratio thresholds to try (default: 80)')
+    backtest.add_argument('--min-profit', type=float, nargs='+', default=[1.0],
+                          help='minimum profits in dollars to try (default: 1.0)')
+    backtest.add_argument('--max-days-left', type=int, nargs='+', default=[5],
+                          help='close-date windows in days to try (default: 5)')
+    backtest.add_argument('--stake', type=float, nargs='+', default=[100], help='stakes to try (default: 100)')
+    backtest.add_argument('--candidates', type=int, default=None, metavar='K',
+                          help='match titles through the n-gram index, K candidates each (default: all pairs)')
+    backtest.add_argument('--processes', type=int, default=0,
+                          help='worker processes, 0 for one per core (default: 0)')
+    backtest.add_argument('--min-seconds', type=float, default=60,
+                          help='how long an opportunity must stay open to count as tradable (default: 60)')
+    backtest.add_argument('--save', metavar='FILE', default=None,
+                          help='write every opportunity run (first / last poll seen, profit) to FILE as Parquet')
+    _add_run_options(backtest)
+    backtest.set_defaults(func=run_backtest)
+
+    bench = commands.add_parser('bench', help='measure startup and pipeline performance')
+    bench.add_argument('target', nargs='?', default='startup', choices=['startup', 'ingest', 'pipeline', 'stream', 'execution', 'sizing'],
+                       help='what to measure (default: startup)')
+    bench.add_argument('--repeat', type=int, default=None,
+                       help='runs per measurement; the best is kept (default: 5 startup, 3 ingest, 1 pipeline)')
+    bench.add_argument('--budget-ms', type=float, default=150,
+                       help='startup budget for the CLI itself, e.g. --help (default: 150)')
+    bench.add_argument('--scan-budget-ms', type=float, default=1000,
+                       help='budget for importing everything a scan needs (default: 1000)')
+    bench.add_argument('--markets', type=int, default=50_000,
+                       help='markets per venue in the synthetic ingest payload (default: 50000)')
+    bench.add_argument('--ingest-budget-ms', type=float, default=500,
+                       help='time budget for ingesting one venue payload (default: 500)')
+    bench.add_argument('--ingest-budget-mb', type=float, default=256,
+                       help='peak memory budget for ingesting one venue payload, in MiB (default: 256)')
+    bench.add_argument('--scale', type=float, nargs='+', default=[1, 10, 100],
+                       help='pipeline universe sizes, as multiples of the live one; stream uses the first '
+                            '(default: 1 10 100)')
+    bench.add_argument('--save', default=None, help='write pipeline results to this JSON file')
+    bench.add_argument('--baseline', default=None,
+                       help='compare pipeline results with a file written by --save and fail on regressions')
+    bench.add_argument('--tolerance', type=float, default=0.25,
+                       help='how much slower a pipeline stage may get before it counts as a regression (default: 0.25)')
+    bench.add_argument('--processes', type=int, default=1,
+                       help='worker processes for pipeline matching, 0 for one per core (default: 1)')
+    bench.add_argument('--candidates', type=int, default=None, metavar='K',
+                       help='match pipeline titles through the n-gram index, K candidates each (default: all pairs)')
+    bench.add_argument('--messages', type=int, default=None,
+                       help='order book messages replayed by the stream benchmark (default: 20000) or, in real '
+                            'time, by the execution benchmark (default: 2000)')
+    bench.add_argument('--stream-budget-ms', type=float, default=5,
+                       help='p99 budget from receiving a quote to re-pricing its pairs (default: 5)')
+    bench.add_argument('--exchange-latency-ms', type=float, default=1.0,
+                       help='answer latency of the simulated exchange in the execution benchmark (default: 1)')
+    bench.add_argument('--execution-budget-us', type=float, default=10_000,
+                       help='p99 budget from detecting an opportunity to submitting its orders (default: 10000)')
+    bench.set_defaults(func=run_bench)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if hasattr(args, 'log_level'):
+        return _instrumented(args)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
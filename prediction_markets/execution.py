@@ -0,0 +1,410 @@
+"""Order execution for detected opportunities.
+
+An ExecutionEngine runs its own event loop on a background thread. Detectors
+(the watch Scanner, the stream Streamer) hand it opportunities through
+submit(), which only stamps the detection time and puts them on an in-process
+queue, so detection never waits on the network.
+
+Everything that does not depend on the quote is done ahead of time: one
+keep-alive client per venue, opened, given its static auth headers and
+warmed at start(), and a pre-serialized order body prefix per market, side
+and action, to which only count, price and client id are appended. Both legs
+of a hedge are sent concurrently as immediate-or-cancel orders. If they fill
+unevenly, the excess on the fuller leg is sold straight back (a leg-risk
+unwind), so the position left open is always hedged.
+
+Every step is stamped with time.perf_counter_ns(): detected -> dequeued ->
+submitted -> acknowledged, per leg. Run against standin.start_exchange_standin
+to measure detect-to-order latency offline.
+
+Live venues also authenticate each request: pass `sign(method, path, body)`
+returning the per-request headers (Kalshi's key signature, Polymarket's L2
+HMAC). Polymarket orders must additionally carry an EIP-712 order signature,
+which `sign_order` has to add; neither is implemented here.
+"""
+import asyncio
+import functools
+import itertools
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+
+import httpx
+import numpy as np
+
+from .fetch import CLOB_URL, KALSHI_URL, make_client
+from .metrics import METRICS, log
+
+
+@dataclass
+class Order:
+    venue: str
+    market: str       # Kalshi ticker or Polymarket CLOB token
+    side: str         # 'yes' / 'no'; a Polymarket token is its own side
+    action: str       # 'buy' / 'sell'
+    price: float      # limit, in cents
+    contracts: int
+    client_id: str = ''
+
+
+@dataclass
+class Fill:
+    """ What the venue acknowledged for one order; `error` is set when it was not accepted. """
+    order: Order
+    submitted_ns: int
+    acked_ns: int = 0
+    filled: float = 0
+    order_id: str = None
+    error: str = None
+
+
+@dataclass
+class Execution:
+    """ One opportunity through the engine: its legs, any unwinds and the contracts left hedged. """
+    opportunity: dict
+    contracts: int
+    detected_ns: int
+    dequeued_ns: int = 0
+    legs: list = field(default_factory=list)
+    unwinds: list = field(default_factory=list)
+    hedged: float = 0
+
+    @property
+    def status(self) -> str:
+        if self.hedged >= self.contracts:
+            return 'filled'
+        return 'partial' if self.hedged > 0 else 'missed'
+
+
+class Gateway:
+    """
+    Order entry for one venue: pre-serialized payloads, the response parser and
+    the session settings. Subclasses define `path`, `warm_path`, _prefix, _suffix
+    and parse.
+    """
+    path = ''
+    warm_path = '/'
+
+    def __init__(self, url: str, headers: dict = None, sign=None):
+        self.url = url.rstrip('/')
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.sign = sign
+        self.prefixes = {}
+
+    def prepare(self, market: str, side: str, action: str) -> bytes:
+        """ The cached body prefix for orders on `market`; build these ahead of time to keep them off the hot path. """
+        key = (market, side, action)
+        prefix = self.prefixes.get(key)
+        if prefix is None:
+            prefix = self.prefixes[key] = self._prefix(market, side, action)
+        return prefix
+
+    def payload(self, order: Order) -> bytes:
+        return self.prepare(order.market, order.side, order.action) + self._suffix(order)
+
+    async def send(self, client: httpx.AsyncClient, order: Order) -> Fill:
+        body = self.payload(order)
+        headers = self.sign('POST', self.path, body) if self.sign else None
+        fill = Fill(order, time.perf_counter_ns())
+        try:
+            response = await client.post(self.url + self.path, content=body, headers=headers)
+        except httpx.TransportError as e:
+            fill.acked_ns = time.perf_counter_ns()
+            fill.error = repr(e)
+            return fill
+        fill.acked_ns = time.perf_counter_ns()
+        if response.status_code >= 400:
+            fill.error = f"HTTP {response.status_code}: {response.text[:200]}"
+            return fill
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            fill.order_id, fill.filled = self.parse(data, order)
+        else:
+            # Nothing says what was placed, so the leg counts as rejected
+            fill.error = f"HTTP {response.status_code}, unreadable body: {response.text[:200]!r}"
+        return fill
+
+
+class KalshiGateway(Gateway):
+    """ Kalshi's create-order endpoint; prices are whole cents on the side being traded. """
+    path = '/trade-api/v2/portfolio/orders'
+    warm_path = '/trade-api/v2/exchange/status'
+
+    def __init__(self, url: str = KALSHI_URL, **options):
+        super().__init__(url, **options)
+
+    def _prefix(self, market, side, action) -> bytes:
+        fields = {'ticker': market, 'action': action, 'side': side, 'type': 'limit',
+                  'time_in_force': 'immediate_or_cancel'}
+        return json.dumps(fields)[:-1].encode() + b','
+
+    def _suffix(self, order: Order) -> bytes:
+        # Round against ourselves: a buy never bids below the quote, a sell never asks above it
+        price = math.ceil(order.price - 1e-9) if order.action == 'buy' else math.floor(order.price + 1e-9)
+        price = min(99, max(1, price))
+        return (f'"count":{order.contracts},"{order.side}_price":{price},'
+                f'"client_order_id":"{order.client_id}"}}').encode()
+
+    def parse(self, data: dict, order: Order):
+        placed = data.get('order') or {}
+        return placed.get('order_id'), float(placed.get('fill_count') or 0)
+
+
+class PolymarketGateway(Gateway):
+    """ Polymarket's CLOB order endpoint, as fill-and-kill orders on a token. """
+    path = '/order'
+    warm_path = '/time'
+
+    def __init__(self, url: str = CLOB_URL, owner: str = '', sign_order=None, **options):
+        super().__init__(url, **options)
+        self.owner = owner
+        self.sign_order = sign_order
+
+    def _prefix(self, market, side, action) -> bytes:
+        fields = {'owner': self.owner, 'orderType': 'FAK', 'order': {'tokenID': market, 'side': action.upper()}}
+        return json.dumps(fields)[:-2].encode() + b','
+
+    @staticmethod
+    def _price(order: Order) -> str:
+        # Whole-cent ticks, rounded against ourselves like KalshiGateway
+        cents = math.ceil(order.price - 1e-9) if order.action == 'buy' else math.floor(order.price + 1e-9)
+        return f'{min(99, max(1, cents)) / 100:.2f}'
+
+    def _suffix(self, order: Order) -> bytes:
+        return f'"price":"{self._price(order)}","size":"{order.contracts}","clientId":"{order.client_id}"}}}}'.encode()
+
+    def payload(self, order: Order) -> bytes:
+        if not self.sign_order:
+            return super().payload(order)
+        fields = {'tokenID': order.market, 'side': order.action.upper(), 'price': self._price(order),
+                  'size': str(order.contracts), 'clientId': order.client_id}
+        return json.dumps({'owner': self.owner, 'orderType': 'FAK', 'order': self.sign_order(fields)}).encode()
+
+    def parse(self, data: dict, order: Order):
+        if not data.get('success', True):
+            return data.get('orderID'), 0.0
+        # A buy takes shares for the USDC it makes, a sell makes shares for the USDC it takes
+        shares = data.get('takingAmount') if order.action == 'buy' else data.get('makingAmount')
+        return data.get('orderID'), float(shares or 0)
+
+
+def default_gateways(url: str = None, **options) -> dict:
+    """ {venue: gateway} for both venues; with `url`, both send their orders there (e.g. a simulated exchange). """
+    if url:
+        return {'kalshi': KalshiGateway(url, **options), 'polymarket': PolymarketGateway(url, **options)}
+    return {'kalshi': KalshiGateway(**options), 'polymarket': PolymarketGateway(**options)}
+
+
+def hedge_orders(opportunity: dict, contracts: int):
+    """
+    (YES order, NO order) buying `contracts` of each leg of an opportunity at
+    its quoted asks. Takes price_opportunities rows carrying the k_ticker /
+    p_yes_token / p_no_token ids, or canonical.hedge_opportunities rows.
+    """
+    if 'yes_venue' in opportunity:
+        yes = (opportunity['yes_venue'], opportunity['yes_id'])
+        no = (opportunity['no_venue'], opportunity['no_id'])
+    elif opportunity['direction'] == 'kalshi_yes':
+        yes = ('kalshi', opportunity.get('k_ticker'))
+        no = ('polymarket', opportunity.get('p_no_token'))
+    else:
+        yes = ('polymarket', opportunity.get('p_yes_token'))
+        no = ('kalshi', opportunity.get('k_ticker'))
+    return (Order(*yes, 'yes', 'buy', opportunity['yes_ask'], contracts),
+            Order(*no, 'no', 'buy', opportunity['no_ask'], contracts))
+
+
+class ExecutionEngine:
+    """
+    Sends both legs of every submitted opportunity and unwinds what fills unevenly.
+
+    Sizes come from a `contracts` column when the opportunity was sized against
+    depth, otherwise from its payout (one contract pays a dollar), floored and
+    capped at `max_contracts`. An opportunity whose two markets already have an
+    execution in flight is skipped, as detectors re-report one while it moves.
+    At most `max_in_flight` executions run at once (each holds up to two of a
+    venue client's connections); the rest wait on the queue, which shows up as
+    detect -> submit latency rather than as pool timeouts.
+    """
+
+    def __init__(self, gateways: dict, max_contracts: float = None, unwind: bool = True, timeout: float = 5.0,
+                 max_in_flight: int = 8):
+        self.gateways = gateways
+        self.max_contracts = max_contracts
+        self.unwind = unwind
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.executions = []
+        self.clients = {}
+        self._ids = itertools.count()
+        self._active = set()
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._thread = None
+
+    def start(self):
+        """ Open and warm one session per venue on the engine's thread; returns once it is ready for orders. """
+        ready = threading.Event()
+        failure = []
+
+        def run():
+            try:
+                asyncio.run(self._main(ready))
+            except Exception as e:
+                failure.append(e)
+                ready.set()
+
+        self._thread = threading.Thread(target=run, name='execution', daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failure:
+            raise RuntimeError(f"Execution engine failed to start: {failure[0]!r}")
+        return self
+
+    def stop(self):
+        """ Finish the executions already submitted, then close the sessions. """
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, opportunities):
+        """ Queue opportunities (a frame or dicts) for execution; callable from any thread once started. """
+        if self._thread is None:
+            raise RuntimeError("engine not started")
+        detected = time.perf_counter_ns()
+        rows = opportunities.iter_rows(named=True) if hasattr(opportunities, 'iter_rows') else opportunities
+        for row in rows:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (detected, row))
+
+    async def _main(self, ready: threading.Event):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        for venue, gateway in self.gateways.items():
+            client = make_client(timeout=self.timeout)
+            client.headers.update(gateway.headers)
+            self.clients[venue] = client
+        try:
+            # Connect (and negotiate TLS) now rather than on the first order
+            await asyncio.gather(*[self.clients[venue].get(gateway.url + gateway.warm_path)
+                                   for venue, gateway in self.gateways.items()], return_exceptions=True)
+            ready.set()
+            tasks = set()
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    break
+                await self._slots.acquire()
+                task = asyncio.create_task(self.execute(item[1], item[0]))
+                task.add_done_callback(lambda _: self._slots.release())
+                tasks.add(task)
+                task.add_done_callback(functools.partial(self._finished, tasks))
+            if tasks:
+                # Failures were already logged by _finished
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for client in self.clients.values():
+                await client.aclose()
+
+    @staticmethod
+    def _finished(tasks: set, task: asyncio.Task):
+        """ Forget a finished execution task, logging and counting the exception it ended with. """
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            METRICS.inc('execution_failures_total')
+            log.error('Execution failed: %r', task.exception(), exc_info=task.exception())
+
+    def prepare(self, legs):
+        """ Build the order body prefixes for (venue, market) legs ahead of their first opportunity. """
+        for venue, market in legs:
+            gateway = self.gateways.get(venue)
+            if gateway is not None and market:
+                for side in ('yes', 'no'):
+                    for action in ('buy', 'sell'):
+                        gateway.prepare(market, side, action)
+
+    def _contracts(self, opportunity: dict) -> int:
+        size = opportunity.get('contracts')
+        if size is None:
+            size = min(opportunity['yes_payout'], opportunity['no_payout'])
+        if self.max_contracts is not None:
+            size = min(size, self.max_contracts)
+        return int(math.floor(size + 1e-9))
+
+    async def _send(self, order: Order) -> Fill:
+        order.client_id = f'pm-{next(self._ids)}'
+        gateway = self.gateways.get(order.venue)
+        if gateway is None or not order.market:
+            return Fill(order, time.perf_counter_ns(), time.perf_counter_ns(), error='no gateway or market id')
+        return await gateway.send(self.clients[order.venue], order)
+
+    async def execute(self, opportunity: dict, detected_ns: int = None) -> Execution:
+        """ Fire both legs of `opportunity` at once, then sell back whatever one leg filled beyond the other. """
+        execution = Execution(opportunity, self._contracts(opportunity), detected_ns or time.perf_counter_ns(),
+                              time.perf_counter_ns())
+        yes, no = hedge_orders(opportunity, execution.contracts)
+        key = (yes.venue, yes.market, no.venue, no.market)
+        if execution.contracts < 1 or key in self._active:
+            METRICS.inc('executions_skipped_total')
+            return execution
+        self._active.add(key)
+        try:
+            execution.legs = list(await asyncio.gather(self._send(yes), self._send(no)))
+            execution.hedged = min(fill.filled for fill in execution.legs)
+            excess = [(fill.order, fill.filled - execution.hedged) for fill in execution.legs
+                      if fill.filled > execution.hedged]
+            if excess and self.unwind:
+                # Sell at the floor: getting flat matters more than the price
+                execution.unwinds = list(await asyncio.gather(*[
+                    self._send(Order(order.venue, order.market, order.side, 'sell', 1, int(math.ceil(size))))
+                    for order, size in excess]))
+        finally:
+            self._active.discard(key)
+        self._record(execution)
+        return execution
+
+    def _record(self, execution: Execution):
+        self.executions.append(execution)
+        METRICS.inc('executions_total', status=execution.status)
+        METRICS.observe('execution_seconds', (execution.dequeued_ns - execution.detected_ns) / 1e9, stage='queue')
+        for fill in execution.legs:
+            METRICS.observe('execution_seconds', (fill.submitted_ns - execution.detected_ns) / 1e9, stage='submit')
+            METRICS.observe('execution_seconds', (fill.acked_ns - fill.submitted_ns) / 1e9, stage='ack')
+            if fill.error:
+                METRICS.inc('order_errors_total', venue=fill.order.venue)
+                log.warning('%s order on %s failed: %s', fill.order.venue, fill.order.market, fill.error)
+        if execution.unwinds:
+            METRICS.inc('unwinds_total', len(execution.unwinds))
+            log.warning('Unwound %s after legs filled %s', [fill.order.market for fill in execution.unwinds],
+                        [fill.filled for fill in execution.legs])
+        log.info('Executed %s: %s, %g of %d contracts hedged in %.3f ms', [leg.order.market for leg in execution.legs],
+                 execution.status, execution.hedged, execution.contracts,
+                 (max(fill.acked_ns for fill in execution.legs) - execution.detected_ns) / 1e6)
+
+    def latency_summary(self) -> str:
+        """ p50 / p99 of detect -> submit and submit -> ack over the legs sent, in microseconds. """
+        legs = [(execution.detected_ns, fill) for execution in self.executions for fill in execution.legs]
+        if not legs:
+            return f"{len(self.executions)} executions"
+        submit = np.array([fill.submitted_ns - detected for detected, fill in legs]) / 1e3
+        ack = np.array([fill.acked_ns - fill.submitted_ns for _, fill in legs]) / 1e3
+        statuses = {}
+        for execution in self.executions:
+            statuses[execution.status] = statuses.get(execution.status, 0) + 1
+        return (f"{len(self.executions)} executions {statuses}, {len(legs)} legs: "
+                f"detect->submit p50 {np.percentile(submit, 50):.0f} us p99 {np.percentile(submit, 99):.0f} us, "
+                f"submit->ack p50 {np.percentile(ack, 50):.0f} us p99 {np.percentile(ack, 99):.0f} us")
@@ -0,0 +1,438 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from functools import cached_property
+
+import httpx
+import polars as pl
+
+from . import ingest
+from .metrics import METRICS, log
+from .cache import EventSnapshot, ResponseCache, apply_delta
+from .replay import RecordingTransport, ReplayTransport
+
+KALSHI_URL = 'https://api.elections.kalshi.com'
+POLYMARKET_URL = 'https://gamma-api.polymarket.com'
+CLOB_URL = 'https://clob.polymarket.com'
+
+POLYMARKET_PARAMS = {
+    "closed": "false",
+    "liquidity_num_min": 5000,
+    "volume_num_min": 1000
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class Body:
+    key: str
+    content: bytes
+    changed: bool
+    meta: dict
+
+    @cached_property
+    def data(self):
+        return json.loads(self.content)
+
+    def json(self):
+        return self.data
+
+
+@dataclass
+class Page:
+    venue: str
+    offset: int
+    frame: pl.DataFrame
+    key: str = None
+    changed: bool = True
+    updated: str = ''
+
+
+def make_client(timeout: float = 10.0, max_connections: int = 16, record: str = None,
+                replay: str = None) -> httpx.AsyncClient:
+    """
+    Pooled keep-alive client, negotiating HTTP/2 when the h2 package is available.
+
+    With `record`, every successful response is also saved under that directory;
+    with `replay`, responses come from such a directory and the network is never used.
+    """
+    if replay:
+        return httpx.AsyncClient(transport=ReplayTransport(replay), follow_redirects=True)
+
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    # httpx already advertises gzip/deflate (and br/zstd when those decoders are installed)
+    transport = httpx.AsyncHTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+    if record:
+        transport = RecordingTransport(record, transport)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        follow_redirects=True,
+    )
+
+
+def _retry_delay(response, attempt: int, backoff: float, retries: int) -> float:
+    """
+    Honour Retry-After when the venue sends one, otherwise exponential backoff with full jitter.
+
+    Retry-After is capped at the longest backoff, so one reply cannot park a poll for minutes.
+    """
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), backoff * 2 ** retries)
+            except ValueError:
+                pass
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+async def get_body(client: httpx.AsyncClient, url: str, params: dict = None, cache: ResponseCache = None,
+                   retries: int = 4, backoff: float = 0.5, venue: str = 'other') -> Body:
+    """
+    GET a response body, retrying transport errors, rate limits and 5xx responses.
+
+    With a cache, the request is made conditional on the stored validators and a
+    304 is answered from disk with `changed=False`. Latency, bytes and statuses
+    are recorded in METRICS under `venue`.
+    """
+    key = cache.key(url, params) if cache else None
+    meta = cache.lookup(key) if cache else None
+    headers = cache.validators(meta) if cache else {}
+
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            with METRICS.timer('fetch_request_seconds', venue=venue):
+                response = await client.get(url, params=params, headers=headers)
+        except httpx.TransportError as e:
+            METRICS.inc('fetch_requests_total', venue=venue, status='error')
+            if attempt == retries:
+                raise
+            log.warning('%s: %r, retrying (attempt %d of %d)', url, e, attempt + 1, retries)
+        else:
+            METRICS.inc('fetch_requests_total', venue=venue, status=response.status_code)
+            if response.status_code == 304 and meta:
+                content = cache.read_body(key)
+                if content is not None:
+                    return Body(key, content, False, meta)
+                # The body these validators vouch for is gone or corrupt: forget them and ask unconditionally
+                cache.drop(key)
+                return await get_body(client, url, params, cache, retries, backoff, venue)
+            if response.status_code == 200:
+                METRICS.inc('fetch_bytes_total', len(response.content), venue=venue)
+                if cache:
+                    meta = cache.write(key, url, response.content, response.headers)
+                return Body(key, response.content, True, meta or {})
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                raise RuntimeError(f"Failed to fetch {url}. HTTP status: {response.status_code}")
+            log.warning('%s: HTTP %d, retrying (attempt %d of %d)', url, response.status_code, attempt + 1, retries)
+        await asyncio.sleep(_retry_delay(response, attempt, backoff, retries))
+
+
+async def get_json(client: httpx.AsyncClient, url: str, params: dict = None, **options):
+    """ GET and decode a JSON document. """
+    return (await get_body(client, url, params, **options)).json()
+
+
+async def _page(venue: str, offset: int, body: Body, parse, cache: ResponseCache):
+    """
+    Build a Page from a response body and return it with its event count and cursor.
+
+    `parse` turns the raw body into (frame, count, updated, cursor) off the event
+    loop. An unchanged body whose frame is already cached is not parsed at all;
+    its count, cursor and newest `updatedAt` come from the cache metadata.
+    """
+    meta = body.meta
+    if cache and not body.changed and meta.get('frame_version') == ingest.FRAME_VERSION:
+        frame = cache.read_frame(body.key)
+        if frame is not None:
+            return Page(venue, offset, frame, body.key, False, meta.get('updated', '')), meta['count'], meta.get('cursor')
+
+    frame, count, updated, cursor = await asyncio.to_thread(_transform, venue, parse, body.content)
+    if cache and body.key:
+        cache.write_frame(body.key, frame)
+        cache.annotate(body.key, meta, count=count, updated=updated, cursor=cursor,
+                       frame_version=ingest.FRAME_VERSION)
+    return Page(venue, offset, frame, body.key, body.changed, updated), count, cursor
+
+
+def _transform(venue: str, parse, *args):
+    """ Run a page parser, recording its time and event count under `venue`. """
+    with METRICS.timer('transform_seconds', venue=venue):
+        result = parse(*args)
+    METRICS.inc('transform_rows_total', result[1], venue=venue)
+    return result
+
+
+def _kalshi_page(content: bytes):
+    frame, count, cursor = ingest.kalshi_frame(content)
+    return frame, count, '', cursor
+
+
+def _polymarket_page(content: bytes):
+    frame, count, updated, _ = ingest.polymarket_frame(content)
+    return frame, count, updated, None
+
+
+async def kalshi_pages(client: httpx.AsyncClient, base_url: str = KALSHI_URL, cache: ResponseCache = None):
+    """ Yield Kalshi feed pages, following a cursor when the feed returns one. """
+    params = {}
+    offset = 0
+    while True:
+        body = await get_body(client, f'{base_url}/v1/users/feed', params, cache, venue='kalshi')
+        page, count, cursor = await _page('kalshi', offset, body, _kalshi_page, cache)
+        if count:
+            yield page
+        if not cursor or not count:
+            return
+        params = {'cursor': cursor}
+        offset += count
+
+
+async def polymarket_pages(client: httpx.AsyncClient, base_url: str = POLYMARKET_URL, cache: ResponseCache = None,
+                           page_size: int = 500, concurrency: int = 4):
+    """
+    Page through Polymarket's /events with up to `concurrency` offsets in flight,
+    yielding each page as soon as it lands. Paging stops at the first short page.
+    """
+    async def fetch(offset):
+        body = await get_body(client, f'{base_url}/events',
+                              {**POLYMARKET_PARAMS, 'limit': page_size, 'offset': offset}, cache,
+                              venue='polymarket')
+        return await _page('polymarket', offset, body, _polymarket_page, cache)
+
+    next_offset = 0
+    end = None
+    in_flight = set()
+    try:
+        while True:
+            while len(in_flight) < concurrency and (end is None or next_offset < end):
+                in_flight.add(asyncio.create_task(fetch(next_offset)))
+                next_offset += page_size
+            if not in_flight:
+                return
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page, count, _ = task.result()
+                if count < page_size:
+                    end = page.offset + page_size if end is None else min(end, page.offset + page_size)
+                if count:
+                    yield page
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+async def polymarket_delta_pages(client: httpx.AsyncClient, since: str, base_url: str = POLYMARKET_URL,
+                                 page_size: int = 500):
+    """
+    Yield only the Polymarket events updated after `since`, newest first,
+    stopping at the first page that reaches back past it.
+    """
+    offset = 0
+    while True:
+        body = await get_body(client, f'{base_url}/events', {
+            **POLYMARKET_PARAMS,
+            'order': 'updatedAt',
+            'ascending': 'false',
+            'limit': page_size,
+            'offset': offset,
+        }, None, venue='polymarket')
+        frame, count, updated, fresh = await asyncio.to_thread(_transform, 'polymarket', ingest.polymarket_frame,
+                                                               body.content, since)
+        if fresh:
+            yield Page('polymarket', offset, frame, updated=updated)
+        if fresh < count or count < page_size:
+            return
+        offset += page_size
+
+
+async def merge_streams(*streams):
+    """ Yield items from several async generators in arrival order. """
+    queue = asyncio.Queue()
+    done = object()
+
+    async def pump(pages):
+        try:
+            async for page in pages:
+                await queue.put(page)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(done)
+
+    producers = [asyncio.create_task(pump(stream)) for stream in streams]
+    remaining = len(producers)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for producer in producers:
+            producer.cancel()
+
+
+async def stream_pages(client: httpx.AsyncClient, kalshi_url: str = KALSHI_URL,
+                       polymarket_url: str = POLYMARKET_URL, cache: ResponseCache = None, **polymarket_options):
+    """ Run both venues concurrently and yield pages from either one in arrival order. """
+    async for page in merge_streams(
+        kalshi_pages(client, kalshi_url, cache),
+        polymarket_pages(client, polymarket_url, cache, **polymarket_options),
+    ):
+        yield page
+
+
+def merge_frames(frames, keys):
+    """ Concatenate per-page frames and consolidate outcomes of events split across pages. """
+    frames = [frame for frame in frames if not frame.is_empty()]
+    if not frames:
+        return pl.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return (
+        pl.concat(frames, how='vertical_relaxed')
+        .group_by(keys, maintain_order=True)
+        .agg(
+            pl.exclude('outcomes').first(),
+            pl.col('outcomes').list.explode(keep_nulls=False, empty_as_null=False),
+        )
+        .select(frames[0].columns)
+    )
+
+
+MERGE_KEYS = {
+    'kalshi': ['title', 'subtitle'],
+    'polymarket': ['title'],
+}
+
+
+async def _collect(pages):
+    """ Group page frames by venue, in offset order whatever order they arrived in. """
+    frames = {venue: [] for venue in MERGE_KEYS}
+    async for page in pages:
+        frames[page.venue].append((page.offset, page.frame))
+    return {venue: [frame for _, frame in sorted(pages, key=lambda page: page[0])] for venue, pages in frames.items()}
+
+
+async def fetch_all_events(kalshi_url: str = KALSHI_URL, polymarket_url: str = POLYMARKET_URL,
+                           client: httpx.AsyncClient = None, cache: ResponseCache = None,
+                           delta: bool = False, full_refresh_every: float = 900, record: str = None,
+                           replay: str = None, **polymarket_options):
+    """
+    Fetch and transform both venues concurrently, returning (kalshi_events, polymarket_events).
+
+    With a cache, requests are conditional and unchanged pages reuse their stored
+    frames. With `delta`, Polymarket only downloads events updated since the last
+    snapshot, falling back to a full fetch every `full_refresh_every` seconds so
+    delisted events eventually drop out.
+
+    `record` / `replay` name a capture directory to save responses to or answer
+    them from (see make_client).
+    """
+    if replay:
+        # A replay only holds the pages the recording asked for; paging one
+        # offset at a time never asks for more than that
+        polymarket_options.setdefault('concurrency', 1)
+    own_client = client is None
+    client = client or make_client(record=record, replay=replay)
+    snapshot = EventSnapshot(cache.directory) if cache and delta else None
+    previous, snapshot_meta = snapshot.load() if snapshot else (None, None)
+    use_delta = (snapshot is not None and previous is not None and snapshot.is_fresh(snapshot_meta, full_refresh_every)
+                 and snapshot_meta.get('frame_version') == ingest.FRAME_VERSION)
+
+    watermark = snapshot_meta['watermark'] if snapshot_meta else ''
+
+    async def track_updates(pages):
+        nonlocal watermark
+        async for page in pages:
+            watermark = ingest.latest_iso([watermark, page.updated])
+            yield page
+
+    if use_delta:
+        polymarket_stream = polymarket_delta_pages(client, snapshot_meta['watermark'], polymarket_url,
+                                                   polymarket_options.get('page_size', 500))
+    else:
+        polymarket_stream = polymarket_pages(client, polymarket_url, cache, **polymarket_options)
+
+    try:
+        frames = await _collect(merge_streams(
+            kalshi_pages(client, kalshi_url, cache),
+            track_updates(polymarket_stream),
+        ))
+    finally:
+        if own_client:
+            await client.aclose()
+
+    kalshi_events = merge_frames(frames['kalshi'], MERGE_KEYS['kalshi'])
+    polymarket_events = merge_frames(frames['polymarket'], MERGE_KEYS['polymarket'])
+    log.debug('Fetched %d Kalshi and %d Polymarket events%s', kalshi_events.height, polymarket_events.height,
+              ' (delta)' if use_delta else '')
+
+    if snapshot is not None:
+        if use_delta:
+            polymarket_events = apply_delta(previous, polymarket_events)
+            full_at = snapshot_meta['full_at']
+        else:
+            full_at = time.time()
+        if not polymarket_events.is_empty():
+            snapshot.save(polymarket_events, watermark, full_at, frame_version=ingest.FRAME_VERSION)
+
+    return kalshi_events, polymarket_events
+
+
+def get_all_events(**options):
+    """ Blocking wrapper around fetch_all_events. """
+    return asyncio.run(fetch_all_events(**options))
+
+
+async def fetch_order_books(tickers, tokens, kalshi_url: str = KALSHI_URL, clob_url: str = CLOB_URL,
+                            client: httpx.AsyncClient = None, record: str = None, replay: str = None):
+    """
+    Full order books of Kalshi markets and Polymarket CLOB tokens, fetched concurrently.
+
+    Returns ({ticker: Kalshi orderbook response}, {token: Polymarket book response});
+    a book that could not be fetched (e.g. the market just closed) maps to None.
+    """
+    async def book(venue, url, params=None):
+        try:
+            return await get_json(client, url, params, venue=venue)
+        except (RuntimeError, httpx.TransportError) as e:
+            # Only the opportunities on this book lose their sizing
+            log.warning('No order book: %s: %r', url, e)
+            return None
+
+    own_client = client is None
+    client = client or make_client(record=record, replay=replay)
+    tickers, tokens = sorted(set(tickers) - {None}), sorted(set(tokens) - {None})
+    try:
+        books = await asyncio.gather(
+            *[book('kalshi', f'{kalshi_url}/trade-api/v2/markets/{ticker}/orderbook') for ticker in tickers],
+            *[book('polymarket', f'{clob_url}/book', {'token_id': token}) for token in tokens],
+        )
+    finally:
+        if own_client:
+            await client.aclose()
+    return dict(zip(tickers, books[:len(tickers)])), dict(zip(tokens, books[len(tickers):]))
+
+
+def get_order_books(tickers, tokens, **options):
+    """ Blocking wrapper around fetch_order_books. """
+    return asyncio.run(fetch_order_books(tickers, tokens, **options))
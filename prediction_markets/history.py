@@ -0,0 +1,353 @@
+"""Poll history as a time-partitioned Parquet store, and backtests over it.
+
+SnapshotStore appends every poll's normalized frames under
+`venue=<name>/day=<YYYY-MM-DD>/<HHMMSSffffff>.parquet`, one file per venue and
+poll, sorted by close date. Only what matching and pricing read is kept, in
+the narrowest types that hold it: each outcome keeps its label and YES ask;
+NO is 100 - YES and the order book ids only matter to execution, and the ids
+alone are most of a Polymarket frame.
+
+backtest replays that history through the same incremental matching and
+pricing as `watch` (scanner.Scanner) and reports how long every opportunity
+stayed open, for each point of a parameter grid. History is read with lazy
+scan_parquet queries: `day` prunes whole partitions by path, while `snapshot`
+and `endDate` are checked against each file's statistics, so only a few polls
+are ever in memory. Grid points that need their own matching (similarity
+threshold, stake) and stretches of time run in parallel worker processes;
+min_profit and max_days_left only filter what is priced, so every value of
+those comes out of the same replay.
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import product
+
+import polars as pl
+
+from .cache import CACHE_ROOT
+from .metrics import METRICS, log
+from .venues import get_venue
+
+DEFAULT_HISTORY_DIR = os.path.join(CACHE_ROOT, 'history')
+
+# (stored, restored) type of each venue's YES ask; Kalshi quotes whole cents
+ASK_TYPES = {
+    'kalshi': (pl.UInt8, pl.Int64),
+    'polymarket': (pl.Float32, pl.Float64),
+}
+DEFAULT_ASK_TYPES = (pl.Float32, pl.Float64)
+
+# Events per row group, so a query on close dates skips the groups outside its window
+ROW_GROUP = 2048
+
+# What identifies one opportunity from one poll to the next
+RUN_KEYS = ['kalshi_title', 'poly_title', 'kalshi_outcome', 'poly_outcome', 'direction']
+GRID = ['similarity_threshold', 'stake', 'min_profit', 'max_days_left']
+
+RUN_SCHEMA = {
+    'similarity_threshold': pl.Float64,
+    'stake': pl.Float64,
+    'min_profit': pl.Float64,
+    'max_days_left': pl.Int64,
+    **{name: pl.Utf8 for name in RUN_KEYS},
+    'first_seen': pl.Datetime('us'),
+    'last_seen': pl.Datetime('us'),
+    'snapshots': pl.UInt32,
+    'profit': pl.Float64,
+    'best_profit': pl.Float64,
+    'closed': pl.Datetime('us'),
+}
+
+
+def compact_events(events: pl.DataFrame, venue: str, taken: datetime) -> pl.DataFrame:
+    """ A normalized venue frame as stored: tagged with its snapshot time, outcomes cut to label and YES ask. """
+    label = get_venue(venue).label
+    stored, _ = ASK_TYPES.get(venue, DEFAULT_ASK_TYPES)
+    outcome = pl.element().struct
+    return (
+        events
+        .select(
+            pl.lit(taken, dtype=pl.Datetime('us')).alias('snapshot'),
+            'title',
+            'subtitle',
+            pl.col('outcomes').list.eval(pl.struct(outcome.field(label), outcome.field('yes_ask').cast(stored))),
+            'startDate',
+            'endDate',
+        )
+        .sort('endDate', nulls_last=True)
+    )
+
+
+class SnapshotStore:
+    """ Append-only store of normalized venue frames, one Parquet file per venue and poll. """
+
+    def __init__(self, directory: str = DEFAULT_HISTORY_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, frames: dict, taken: datetime = None) -> datetime:
+        """ Store {venue: normalized events frame} as one poll taken at `taken` (naive UTC, default now). """
+        taken = taken or datetime.now(timezone.utc).replace(tzinfo=None)
+        for venue, events in frames.items():
+            if events.is_empty():
+                continue
+            directory = os.path.join(self.directory, f'venue={venue}', f'day={taken:%Y-%m-%d}')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{taken:%H%M%S%f}.parquet')
+            compact_events(events, venue, taken).write_parquet(path + '.tmp', compression='zstd',
+                                                               row_group_size=ROW_GROUP)
+            os.replace(path + '.tmp', path)
+            METRICS.inc('snapshot_events_total', events.height, venue=venue)
+        return taken
+
+    def scan(self, venue: str, **window) -> pl.LazyFrame:
+        """ scan_snapshots over this store. """
+        return scan_snapshots(self.directory, venue, **window)
+
+
+def scan_snapshots(directory: str, venue: str, start: datetime = None, end: datetime = None,
+                   closing_after: datetime = None, closing_before: datetime = None) -> pl.LazyFrame:
+    """
+    Lazy frame of the polls of `venue` taken between `start` and `end`, of events
+    closing between `closing_after` and `closing_before` (all optional, naive UTC).
+
+    Rows are normalized events plus their `snapshot` time, with the outcome
+    structs restored to the fields pricing reads (no order book ids).
+    """
+    root = os.path.join(directory, f'venue={venue}')
+    if not os.path.isdir(root):
+        raise ValueError(f"No {venue} snapshots under {directory}")
+    predicates = []
+    if start is not None:
+        predicates += [pl.col('day') >= start.date(), pl.col('snapshot') >= start]
+    if end is not None:
+        predicates += [pl.col('day') <= end.date(), pl.col('snapshot') <= end]
+    if closing_after is not None:
+        predicates.append(pl.col('endDate') >= closing_after)
+    if closing_before is not None:
+        predicates.append(pl.col('endDate') <= closing_before)
+
+    frame = pl.scan_parquet(os.path.join(root, '**', '*.parquet'), hive_partitioning=True)
+    if predicates:
+        frame = frame.filter(pl.all_horizontal(predicates))
+    label = get_venue(venue).label
+    _, restored = ASK_TYPES.get(venue, DEFAULT_ASK_TYPES)
+    outcome = pl.element().struct
+    ask = outcome.field('yes_ask').cast(restored)
+    return (
+        frame
+        .drop('venue', 'day', strict=False)
+        .with_columns(pl.col('outcomes').list.eval(pl.struct(outcome.field(label), ask, (100 - ask).alias('no_ask'))))
+    )
+
+
+def snapshot_times(directory: str, start: datetime = None, end: datetime = None) -> list:
+    """ Times of the stored polls that hold both Kalshi and Polymarket, oldest first. """
+    times = [scan_snapshots(directory, venue, start, end).select('snapshot').unique().collect()
+             for venue in ('kalshi', 'polymarket')]
+    return times[0].join(times[1], on='snapshot').sort('snapshot')['snapshot'].to_list()
+
+
+def _follow(runs: pl.DataFrame, found: pl.DataFrame, taken: datetime):
+    """
+    (runs still open, runs that closed) after a poll taken at `taken` found the
+    opportunities in `found` (RUN_KEYS and `quote`, their profit).
+    """
+    taken = pl.lit(taken, dtype=pl.Datetime('us'))
+    merged = runs.join(found, on=RUN_KEYS, how='full', coalesce=True)
+    closed = merged.filter(pl.col('quote').is_null()).with_columns(taken.alias('closed'))
+    still_open = merged.filter(pl.col('quote').is_not_null()).select(
+        *RUN_KEYS,
+        pl.col('first_seen').fill_null(taken),
+        taken.alias('last_seen'),
+        (pl.col('snapshots').fill_null(0) + 1).cast(pl.UInt32),
+        pl.col('profit').fill_null(pl.col('quote')),
+        pl.max_horizontal('best_profit', 'quote').alias('best_profit'),
+    )
+    return still_open, closed.drop('quote')
+
+
+def _replay(directory: str, snapshots: list, similarity_threshold: float, stake: float, points: list,
+            candidates: int = None, batch: int = 8, closing_after: datetime = None,
+            closing_before: datetime = None) -> pl.DataFrame:
+    """
+    Run in a worker: feed `snapshots` in order through one Scanner and follow the
+    runs of every (min_profit, max_days_left) point, i.e. for each opportunity
+    the consecutive polls it was found on. Runs still open after the last poll
+    have a null `closed`.
+    """
+    from .scanner import Scanner
+
+    scanner = Scanner(similarity_threshold, min_profit=min(point[0] for point in points),
+                      max_days_left=max(point[1] for point in points), stake=stake, candidates=candidates)
+    open_schema = {name: RUN_SCHEMA[name] for name in RUN_SCHEMA if name not in GRID and name != 'closed'}
+    open_runs = {point: pl.DataFrame(schema=open_schema) for point in points}
+    closed = {point: [] for point in points}
+    for start in range(0, len(snapshots), batch):
+        window = snapshots[start:start + batch]
+        polls = {}
+        for venue in ('kalshi', 'polymarket'):
+            # Events that closed before the poll can no longer be traded
+            after = max(closing_after, window[0]) if closing_after else window[0]
+            frame = (scan_snapshots(directory, venue, window[0], window[-1], after, closing_before)
+                     .filter(pl.col('endDate') >= pl.col('snapshot'))
+                     .collect())
+            polls[venue] = (frame.partition_by('snapshot', as_dict=True, include_key=False),
+                            frame.drop('snapshot').clear())
+
+        for taken in window:
+            scanner.update(*[parts.get((taken,), empty) for parts, empty in (polls['kalshi'], polls['polymarket'])])
+            current = (scanner.current_opportunities(as_of=taken)
+                       .select(*RUN_KEYS, pl.col('profit').alias('quote'), 'time_remaining')
+                       .with_columns(pl.col('direction').cast(pl.Utf8)))
+            for point in points:
+                min_profit, max_days_left = point
+                found = (current
+                         .filter((pl.col('quote') >= min_profit) & (pl.col('time_remaining') <= max_days_left))
+                         .drop('time_remaining')
+                         .unique(RUN_KEYS, keep='first', maintain_order=True))
+                open_runs[point], ended = _follow(open_runs[point], found, taken)
+                if not ended.is_empty():
+                    closed[point].append(ended)
+
+    still_open = {point: runs.with_columns(pl.lit(None, dtype=pl.Datetime('us')).alias('closed'))
+                  for point, runs in open_runs.items()}
+    return pl.concat([
+        frame.with_columns(pl.lit(similarity_threshold).alias('similarity_threshold'), pl.lit(stake).alias('stake'),
+                           pl.lit(point[0]).alias('min_profit'), pl.lit(point[1]).alias('max_days_left'))
+        .select(list(RUN_SCHEMA))
+        .cast(RUN_SCHEMA)
+        for point in points
+        for frame in [*closed[point], still_open[point]]
+    ])
+
+
+def _stitch(parts: list, starts: list) -> pl.DataFrame:
+    """
+    Join the runs of consecutive stretches of time: a run still open at the end
+    of one stretch continues into a run of the same opportunity found on the
+    first poll of the next, and otherwise closed on that poll.
+    """
+    runs = pl.concat([part.with_columns(pl.lit(n, dtype=pl.UInt32).alias('part')) for n, part in enumerate(parts)])
+    if len(parts) == 1 or runs.is_empty():
+        return runs.drop('part')
+    group = GRID + RUN_KEYS
+    bounds = pl.DataFrame({'part': pl.Series(range(len(starts)), dtype=pl.UInt32),
+                           'part_start': pl.Series(starts, dtype=pl.Datetime('us')),
+                           'next_start': pl.Series([*starts[1:], None], dtype=pl.Datetime('us'))})
+    continues = (
+        (pl.col('part') == pl.col('part').shift().over(group) + 1)
+        & pl.col('closed').shift().over(group).is_null()
+        & (pl.col('first_seen') == pl.col('part_start'))
+    ).fill_null(False)
+    return (
+        runs
+        .join(bounds, on='part')
+        .sort(*group, 'first_seen')
+        .with_columns((~continues).cum_sum().alias('run'))
+        .group_by(*group, 'run', maintain_order=True)
+        .agg(
+            pl.col('first_seen').first(),
+            pl.col('last_seen').last(),
+            pl.col('snapshots').sum(),
+            pl.col('profit').first(),
+            pl.col('best_profit').max(),
+            pl.coalesce(pl.col('closed').last(), pl.col('next_start').last()).alias('closed'),
+        )
+        .select(list(RUN_SCHEMA))
+        .cast(RUN_SCHEMA)
+    )
+
+
+def summarize_runs(runs: pl.DataFrame, grid: pl.DataFrame, min_seconds: float = 60) -> pl.DataFrame:
+    """
+    One row per grid point: opportunities found (as runs), how long they stayed
+    open between the first and last poll that saw them, the share open for at
+    least `min_seconds`, and their profit when first seen. A run seen on one
+    poll lasts 0 seconds, so durations are lower bounds.
+    """
+    seconds = (pl.col('last_seen') - pl.col('first_seen')).dt.total_microseconds() / 1e6
+    summary = (
+        runs
+        .group_by(GRID)
+        .agg(
+            pl.len().alias('opportunities'),
+            (seconds >= min_seconds).mean().alias('tradable'),
+            seconds.median().alias('median_seconds'),
+            seconds.quantile(0.9).alias('p90_seconds'),
+            pl.col('profit').mean().alias('mean_profit'),
+            pl.col('closed').is_null().sum().alias('still_open'),
+        )
+    )
+    return (
+        grid
+        .join(summary, on=GRID, how='left')
+        .with_columns(pl.col('opportunities', 'still_open').fill_null(0))
+        .sort(GRID)
+    )
+
+
+def backtest(directory: str = DEFAULT_HISTORY_DIR, start: datetime = None, end: datetime = None,
+             similarity_threshold=(80,), min_profit=(1.0,), max_days_left=(5,), stake=(100,),
+             candidates: int = None, processes: int = None, min_seconds: float = 60, batch: int = 8,
+             closing_after: datetime = None, closing_before: datetime = None):
+    """
+    Replay the polls stored under `directory` between `start` and `end` for every
+    combination of the parameter values given (each a value or a sequence).
+
+    Each (similarity_threshold, stake) pair is replayed on its own, split into
+    stretches of time so that `processes` workers (None for one per core) stay
+    busy; `batch` polls are read at a time. `closing_after` / `closing_before`
+    restrict the replay to events closing in that window.
+
+    Returns (summary, runs); see summarize_runs and RUN_SCHEMA.
+    """
+    def values(option):
+        return [option] if isinstance(option, (int, float)) else list(option)
+
+    grid = pl.DataFrame(list(product(values(similarity_threshold), values(stake), values(min_profit),
+                                     values(max_days_left))),
+                        schema={name: RUN_SCHEMA[name] for name in GRID}, orient='row')
+    snapshots = snapshot_times(directory, start, end)
+    if not snapshots:
+        log.warning("No polls with both venues stored under %s.", directory)
+        return summarize_runs(pl.DataFrame(schema=RUN_SCHEMA), grid, min_seconds), pl.DataFrame(schema=RUN_SCHEMA)
+
+    groups = grid.group_by('similarity_threshold', 'stake', maintain_order=True).agg('min_profit', 'max_days_left')
+    processes = processes or os.cpu_count() or 1
+    parts = min(len(snapshots), max(1, math.ceil(processes / groups.height)))
+    size = math.ceil(len(snapshots) / parts)
+    stretches = [snapshots[n:n + size] for n in range(0, len(snapshots), size)]
+    tasks = [(directory, stretch, threshold, group_stake, list(zip(profits, days)), candidates, batch,
+              closing_after, closing_before)
+             for threshold, group_stake, profits, days in groups.iter_rows() for stretch in stretches]
+    log.info("Backtest: %d polls from %s to %s, %d grid points in %d tasks on %d processes", len(snapshots),
+             snapshots[0], snapshots[-1], grid.height, len(tasks), min(processes, len(tasks)))
+
+    with METRICS.timer('stage_seconds', stage='backtest'):
+        if processes == 1 or len(tasks) == 1:
+            results = [_replay(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(min(processes, len(tasks)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = list(pool.map(_replay, *zip(*tasks)))
+
+    runs = pl.concat([_stitch(results[n:n + len(stretches)], [stretch[0] for stretch in stretches])
+                      for n in range(0, len(results), len(stretches))])
+    return summarize_runs(runs, grid, min_seconds), runs
+
+
+def report_backtest(summary: pl.DataFrame, min_seconds: float = 60):
+    """ Print one line per grid point of a backtest summary computed with `min_seconds`. """
+    for row in summary.iter_rows(named=True):
+        if not row['opportunities']:
+            print(f"threshold {row['similarity_threshold']:g}, stake ${row['stake']:g}, "
+                  f"min profit ${row['min_profit']:g}, {row['max_days_left']} days: no opportunities")
+            continue
+        print(f"threshold {row['similarity_threshold']:g}, stake ${row['stake']:g}, "
+              f"min profit ${row['min_profit']:g}, {row['max_days_left']} days: "
+              f"{row['opportunities']} opportunities, median open {row['median_seconds']:.0f}s "
+              f"(p90 {row['p90_seconds']:.0f}s), {row['tradable']:.0%} open {min_seconds:g}s or more, "
+              f"mean profit ${row['mean_profit']:.2f}, {row['still_open']} still open")
@@ -0,0 +1,205 @@
+"""Response bodies straight to the normalized event frame.
+
+Each page body is handed to Polars' native JSON reader with a schema restricted
+to the fields we use, so events never exist as Python dicts. Everything after
+that (exploding markets, decoding Polymarket's string-encoded `outcomes` /
+`outcomePrices`, date parsing, consolidation by title) runs as Polars
+expressions. The output matches kalshi.transform_data / polymarket.transform_data,
+with each outcome also carrying the ids its order book streams under (Kalshi's
+market ticker, Polymarket's YES/NO CLOB token ids).
+
+Polymarket's `description` (often kilobytes of resolution rules per event) is
+not read into the frames, which leaves their `subtitle` null. Only the
+candidate index used it, and Kalshi's short subtitles still feed that.
+"""
+import io
+
+import polars as pl
+
+# Bump whenever the normalized frame changes shape, so frames cached by older versions are rebuilt
+FRAME_VERSION = 3
+
+KALSHI_FEED_SCHEMA = {
+    'feed': pl.List(pl.Struct({
+        'event_title': pl.Utf8,
+        'event_subtitle': pl.Utf8,
+        'markets': pl.List(pl.Struct({
+            'ticker': pl.Utf8,
+            'yes_subtitle': pl.Utf8,
+            'yes_ask': pl.Int64,
+            'close_ts': pl.Utf8,
+            'open_ts': pl.Utf8,
+        })),
+    })),
+    'cursor': pl.Utf8,
+}
+
+POLYMARKET_EVENT_SCHEMA = {
+    'title': pl.Utf8,
+    'startDate': pl.Utf8,
+    'endDate': pl.Utf8,
+    'updatedAt': pl.Utf8,
+    'markets': pl.List(pl.Struct({
+        'outcomePrices': pl.Utf8,
+        'groupItemTitle': pl.Utf8,
+        'clobTokenIds': pl.Utf8,
+    })),
+}
+
+KALSHI_OUTCOME = pl.Struct({'yes_subtitle': pl.Utf8, 'yes_ask': pl.Int64, 'no_ask': pl.Int64, 'ticker': pl.Utf8})
+POLYMARKET_OUTCOME = pl.Struct({'option': pl.Utf8, 'yes_ask': pl.Float64, 'no_ask': pl.Float64,
+                                'yes_token': pl.Utf8, 'no_token': pl.Utf8})
+
+
+def parse_iso(column: str) -> pl.Expr:
+    """ ISO-8601 UTC timestamps (with or without fractional seconds) to naive UTC datetimes, null if invalid. """
+    col = pl.col(column)
+    return pl.coalesce(
+        col.str.to_datetime('%Y-%m-%dT%H:%M:%S%.fZ', time_unit='us', strict=False),
+        col.str.to_datetime('%Y-%m-%dT%H:%M:%S%.f%:z', time_unit='us', strict=False)
+        .dt.convert_time_zone('UTC').dt.replace_time_zone(None),
+        col.str.to_datetime('%Y-%m-%d', time_unit='us', strict=False),
+    ).alias(column)
+
+
+def latest_iso(values) -> str:
+    """
+    The latest of ISO-8601 timestamp strings, ordered as parse_iso reads them
+    rather than as text ('...:40Z' sorts after '...:40.5Z'); '' if none parses.
+    """
+    frame = pl.DataFrame({'at': list(values)}, schema={'at': pl.Utf8})
+    latest = frame.filter(parse_iso('at').is_not_null()).sort(parse_iso('at'))['at']
+    return latest[-1] if len(latest) else ''
+
+
+def read_kalshi_feed(body: bytes):
+    """ Kalshi feed events, one row each, plus the pagination cursor if the feed sent one. """
+    raw = pl.read_json(io.BytesIO(body), schema=KALSHI_FEED_SCHEMA)
+    cursor = raw['cursor'][0] if raw.height else None
+    events = raw.select(pl.col('feed').explode(empty_as_null=True)).drop_nulls('feed').unnest('feed')
+    return events, cursor
+
+
+def normalize_kalshi(events: pl.DataFrame) -> pl.DataFrame:
+    """ Consolidate a Kalshi feed frame to one row per (title, subtitle) with its list of outcomes. """
+    markets = (
+        events
+        .explode('markets', empty_as_null=True)
+        .drop_nulls('markets')
+        .unnest('markets')
+    )
+    if markets.is_empty():
+        return pl.DataFrame()
+    return (
+        markets
+        .group_by('event_title', 'event_subtitle', maintain_order=True)
+        .agg(
+            pl.col('close_ts').first(),
+            pl.col('open_ts').first(),
+            pl.struct(
+                'yes_subtitle',
+                'yes_ask',
+                (100 - pl.col('yes_ask')).alias('no_ask'),
+                'ticker',
+            ).alias('outcomes'),
+        )
+        .select(
+            pl.col('event_title').alias('title'),
+            pl.col('event_subtitle').alias('subtitle'),
+            pl.col('outcomes').cast(pl.List(KALSHI_OUTCOME)),
+            parse_iso('open_ts').alias('startDate'),
+            parse_iso('close_ts').alias('endDate'),
+        )
+    )
+
+
+def kalshi_frame(body: bytes):
+    """ (normalized frame, raw event count, cursor) for one Kalshi feed page. """
+    events, cursor = read_kalshi_feed(body)
+    return normalize_kalshi(events), events.height, cursor
+
+
+def read_polymarket_events(body: bytes) -> pl.DataFrame:
+    """ Polymarket /events page, one row per event. """
+    if not body.lstrip().startswith(b'['):
+        raise ValueError("Unexpected response format: expected a JSON array of events")
+    return pl.read_json(io.BytesIO(body), schema=POLYMARKET_EVENT_SCHEMA)
+
+
+def normalize_polymarket(events: pl.DataFrame) -> pl.DataFrame:
+    """
+    One row per event title with its outcomes, following polymarket.transform_data
+    except for the null `subtitle` (see the module docstring).
+
+    A market with a groupItemTitle contributes that name priced at its first
+    outcome price; unparseable prices are skipped. Markets without one are
+    dropped: transform_data only ever produced unlabeled outcomes for them,
+    which the matcher cannot pair with anything.
+    """
+    markets = (
+        events
+        .select('title', 'startDate', 'endDate', 'markets')
+        .explode('markets', empty_as_null=True)
+        .drop_nulls('markets')
+        .unnest('markets')
+        .with_columns(
+            pl.col('outcomePrices').str.json_decode(pl.List(pl.Utf8)),
+            pl.col('clobTokenIds').str.json_decode(pl.List(pl.Utf8)),
+        )
+    )
+    if markets.is_empty():
+        return pl.DataFrame()
+
+    entries = (
+        markets
+        .filter((pl.col('groupItemTitle') != '') & (pl.col('outcomePrices').list.len() > 0))
+        .select(
+            'title', 'startDate', 'endDate',
+            pl.col('groupItemTitle').alias('option'),
+            pl.col('outcomePrices').list.first().alias('price'),
+            # clobTokenIds lists the YES token first, like outcomes / outcomePrices
+            pl.col('clobTokenIds').list.get(0, null_on_oob=True).alias('yes_token'),
+            pl.col('clobTokenIds').list.get(1, null_on_oob=True).alias('no_token'),
+        )
+    )
+    entries = (
+        entries
+        .with_columns((pl.col('price').cast(pl.Float64, strict=False) * 100).alias('yes_ask'))
+        .drop_nulls('yes_ask')
+    )
+    if entries.is_empty():
+        return pl.DataFrame()
+
+    return (
+        entries
+        .group_by('title', maintain_order=True)
+        .agg(
+            pl.col('startDate').first(),
+            pl.col('endDate').first(),
+            pl.struct('option', 'yes_ask', (100 - pl.col('yes_ask')).alias('no_ask'),
+                      'yes_token', 'no_token').alias('outcomes'),
+        )
+        .select(
+            'title',
+            pl.lit(None, dtype=pl.Utf8).alias('subtitle'),
+            pl.col('outcomes').cast(pl.List(POLYMARKET_OUTCOME)),
+            parse_iso('startDate'),
+            parse_iso('endDate'),
+        )
+    )
+
+
+def polymarket_frame(body: bytes, since: str = None):
+    """
+    (normalized frame, raw event count, newest updatedAt, events kept) for one /events page.
+
+    With `since`, only events updated after it are kept (for delta polling).
+    """
+    events = read_polymarket_events(body)
+    count = events.height
+    if since:
+        since_at = pl.select(pl.lit(since, dtype=pl.Utf8).alias('since')).select(parse_iso('since')).item()
+        if since_at is not None:
+            events = events.filter(parse_iso('updatedAt') > since_at)
+    updated = latest_iso(events['updatedAt'])
+    return normalize_polymarket(events), count, updated, events.height
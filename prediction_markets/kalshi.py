@@ -16,14 +16,15 @@
 
 
 
-import requests
 import polars as pl
 import json
 import datetime
 
 def fetch_kalshi_events():
+    import requests  # only this blocking helper needs it; the scan pipeline fetches through fetch.py
+
     url = 'https://api.elections.kalshi.com/v1/users/feed'
-    response = requests.get(url)
+    response = requests.get(url, timeout=30)
     
     if response.status_code != 200:
         raise RuntimeError(f"Failed to fetch Kalshi events. HTTP status: {response.status_code}")
@@ -107,5 +108,3 @@ def get_kalshi_events():
     
     transformed_events = transform_data(events)
     return transformed_events
-    
-get_kalshi_events()
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import timezone
+
+import numpy as np
+import polars as pl
+
+from .cache import CACHE_ROOT
+from .candidates import TitleIndex
+from .matching import match_titles, normalize_titles, score_pairs
+
+DEFAULT_MATCH_CACHE = os.path.join(CACHE_ROOT, 'matches.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    venue TEXT NOT NULL,
+    hash INTEGER NOT NULL,
+    threshold REAL NOT NULL,
+    end_ts REAL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (venue, hash, threshold)
+);
+CREATE TABLE IF NOT EXISTS title_matches (
+    k_hash INTEGER NOT NULL,
+    p_hash INTEGER NOT NULL,
+    threshold REAL NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (k_hash, p_hash, threshold)
+);
+CREATE INDEX IF NOT EXISTS title_matches_p ON title_matches (p_hash, threshold);
+CREATE TABLE IF NOT EXISTS outcome_scores (
+    k_hash INTEGER NOT NULL,
+    p_hash INTEGER NOT NULL,
+    score REAL NOT NULL,
+    scored_at REAL NOT NULL,
+    PRIMARY KEY (k_hash, p_hash)
+);
+CREATE TEMP TABLE IF NOT EXISTS listed (
+    venue TEXT NOT NULL,
+    hash INTEGER NOT NULL,
+    PRIMARY KEY (venue, hash)
+);
+"""
+
+
+def text_hash(text: str) -> int:
+    """ Stable signed 64-bit hash of an already-normalized string. """
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class MatchStore:
+    """
+    Persistent record of title-pair and outcome-pair similarity decisions.
+
+    Titles are keyed by a hash of their normalized text and the threshold they
+    were matched under. The store keeps a registry of every title already scored
+    against every other registered title, so a fresh process only fuzzy-scores
+    titles it has never seen. A title missing from one call's input stays
+    registered, so a market that drops out of the input for a poll or two is
+    not re-scored when it comes back. Every `sweep_interval` seconds the
+    registry is swept: titles whose endDate has passed, or that are not listed
+    at sweep time (which includes titles whose text was edited), are dropped
+    with their matches, and outcome scores past `outcome_max_age` expire.
+    """
+
+    def __init__(self, path: str = DEFAULT_MATCH_CACHE, outcome_max_age: float = 30 * 86400,
+                 sweep_interval: float = 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.outcome_max_age = outcome_max_age
+        self.sweep_interval = sweep_interval
+        self._swept_at = 0.0
+        self._titles = {}
+        self._indexes = {'kalshi': TitleIndex(), 'polymarket': TitleIndex()}
+        self._outcomes = None
+
+    def close(self):
+        self.db.close()
+
+    def _registry(self, venue: str, threshold: float) -> dict:
+        """ Normalized text of every registered title by hash, loaded once and kept in step with the table. """
+        registry = self._titles.get((venue, threshold))
+        if registry is None:
+            rows = self.db.execute('SELECT hash, text FROM titles WHERE venue = ? AND threshold = ?', (venue, threshold))
+            registry = self._titles[(venue, threshold)] = dict(rows)
+        return registry
+
+    def _forget(self, venue: str, hashes, threshold: float):
+        """ Drop registry entries and every match that involves them. """
+        column = 'k_hash' if venue == 'kalshi' else 'p_hash'
+        rows = [(h, threshold) for h in hashes]
+        self.db.executemany('DELETE FROM titles WHERE venue = ? AND hash = ? AND threshold = ?',
+                            [(venue, h, t) for h, t in rows])
+        self.db.executemany(f'DELETE FROM title_matches WHERE {column} = ? AND threshold = ?', rows)
+        registry = self._titles.get((venue, threshold))
+        if registry is not None:
+            for h in hashes:
+                registry.pop(h, None)
+
+    def evict_expired(self, now: float = None):
+        """ Drop titles whose endDate has passed, with their matches, and outcome scores past their max age. """
+        now = time.time() if now is None else now
+        for venue in ('kalshi', 'polymarket'):
+            expired = self.db.execute('SELECT hash, threshold FROM titles WHERE venue = ? AND end_ts < ?',
+                                      (venue, now)).fetchall()
+            for h, threshold in expired:
+                self._forget(venue, [h], threshold)
+        cutoff = now - self.outcome_max_age
+        self.db.execute('DELETE FROM outcome_scores WHERE scored_at < ?', (cutoff,))
+        if self._outcomes is not None:
+            self._outcomes = self._outcomes.filter(pl.col('scored_at') >= cutoff)
+        self.db.commit()
+
+    def _sweep(self, listed: dict, threshold: float):
+        """ evict_expired, then drop the titles of `listed` venues that are not in their listed hashes. """
+        now = time.time()
+        self.evict_expired(now)
+        for venue, hashes in listed.items():
+            self._forget(venue, set(self._registry(venue, threshold)) - hashes, threshold)
+        self.db.commit()
+        self._swept_at = now
+
+    def match_titles(self, kalshi_titles, poly_titles, similarity_threshold: float = 75,
+                     kalshi_end_dates=None, poly_end_dates=None, workers: int = -1, processes: int = 1,
+                     candidates: int = None, subtitles=None):
+        """
+        Drop-in for matching.match_titles over the full current universe of both venues.
+
+        Only titles missing from the registry are scored. New Kalshi titles are
+        scored against every registered and new Polymarket title, and registered
+        Kalshi titles against the new Polymarket ones, so every registered pair
+        has been scored once. The pairs of this call's titles are then read back
+        from the store. `candidates` and `subtitles` go to matching.match_titles
+        with one resident candidates.TitleIndex per venue.
+        """
+        threshold = float(similarity_threshold)
+        k_texts = normalize_titles(kalshi_titles)
+        p_texts = normalize_titles(poly_titles)
+        k_hashes = [text_hash(text) for text in k_texts]
+        p_hashes = [text_hash(text) for text in p_texts]
+        if time.time() - self._swept_at >= self.sweep_interval:
+            self._sweep({'kalshi': set(k_hashes), 'polymarket': set(p_hashes)}, threshold)
+
+        registered_k = self._registry('kalshi', threshold)
+        registered_p = self._registry('polymarket', threshold)
+        new_k = {h: text for h, text in zip(k_hashes, k_texts) if h not in registered_k}
+        new_p = {h: text for h, text in zip(p_hashes, p_texts) if h not in registered_p}
+
+        # With candidates the larger side of each pass is a resident index; new Polymarket titles search the
+        # Kalshi one (fuzz.ratio is symmetric), so neither index is rebuilt per call
+        k_subtitles = dict(zip(k_hashes, subtitles[0])) if subtitles else {}
+        p_subtitles = dict(zip(p_hashes, subtitles[1])) if subtitles else {}
+        found = set()
+        for k_side, p_side, swap in ((new_k, {**registered_p, **new_p}, False), (registered_k, new_p, True)):
+            k_keys, p_keys = list(k_side), list(p_side)
+            k_extra = [k_subtitles.get(h) for h in k_keys]
+            p_extra = [p_subtitles.get(h) for h in p_keys]
+            if candidates and swap:
+                p_idx, k_idx, scores = match_titles(list(p_side.values()), list(k_side.values()), similarity_threshold,
+                                                    workers, candidates=candidates, subtitles=(p_extra, k_extra),
+                                                    index=self._indexes['kalshi'])
+            else:
+                k_idx, p_idx, scores = match_titles(list(k_side.values()), list(p_side.values()), similarity_threshold,
+                                                    workers, processes=processes, candidates=candidates,
+                                                    subtitles=(k_extra, p_extra), index=self._indexes['polymarket'])
+            found.update((k_keys[k], p_keys[p], threshold, float(s)) for k, p, s in zip(k_idx, p_idx, scores))
+
+        # Persist the new decisions and register the titles that were just scored
+        self.db.executemany('INSERT OR REPLACE INTO title_matches VALUES (?, ?, ?, ?)', found)
+        for venue, hashes, new, registry, end_dates in (('kalshi', k_hashes, new_k, registered_k, kalshi_end_dates),
+                                                        ('polymarket', p_hashes, new_p, registered_p, poly_end_dates)):
+            entries = {}
+            for i, h in enumerate(hashes):
+                if h not in new:
+                    continue
+                end_ts = _timestamp(end_dates[i]) if end_dates is not None else None
+                previous = entries.get(h)
+                entries[h] = end_ts if previous is None or (end_ts is not None and end_ts > previous) else previous
+            self.db.executemany('INSERT OR REPLACE INTO titles VALUES (?, ?, ?, ?, ?)',
+                                [(venue, h, threshold, end_ts, new[h]) for h, end_ts in entries.items()])
+            registry.update(new)
+        self.db.commit()
+
+        # Only the matches between titles listed in this call are read back
+        self.db.execute('DELETE FROM listed')
+        self.db.executemany('INSERT OR IGNORE INTO listed VALUES (?, ?)',
+                            [('kalshi', h) for h in k_hashes] + [('polymarket', h) for h in p_hashes])
+        stored = pl.DataFrame(
+            self.db.execute(
+                'SELECT m.k_hash, m.p_hash, m.score FROM title_matches m'
+                " JOIN listed k ON k.venue = 'kalshi' AND k.hash = m.k_hash"
+                " JOIN listed p ON p.venue = 'polymarket' AND p.hash = m.p_hash"
+                ' WHERE m.threshold = ?', (threshold,)).fetchall(),
+            schema={'k_hash': pl.Int64, 'p_hash': pl.Int64, 'score': pl.Float32},
+            orient='row',
+        )
+        k_positions = pl.DataFrame({'k_hash': pl.Series(k_hashes, dtype=pl.Int64), 'k_idx': np.arange(len(k_hashes))})
+        p_positions = pl.DataFrame({'p_hash': pl.Series(p_hashes, dtype=pl.Int64), 'p_idx': np.arange(len(p_hashes))})
+        pairs = (
+            stored
+            .join(k_positions, on='k_hash')
+            .join(p_positions, on='p_hash')
+            .select('k_idx', 'p_idx', 'score')
+            .sort('k_idx', 'p_idx')
+        )
+        return pairs['k_idx'].to_numpy(), pairs['p_idx'].to_numpy(), pairs['score'].to_numpy()
+
+    def score_pairs(self, left, right, workers: int = -1):
+        """ Drop-in for matching.score_pairs that only scores label pairs the store has never seen. """
+        if len(left) == 0:
+            return np.empty(0, dtype=np.float32)
+        if self._outcomes is None:
+            self._outcomes = pl.DataFrame(
+                self.db.execute('SELECT k_hash, p_hash, score, scored_at FROM outcome_scores').fetchall(),
+                schema={'k_hash': pl.Int64, 'p_hash': pl.Int64, 'score': pl.Float32, 'scored_at': pl.Float64},
+                orient='row',
+            )
+
+        # Outcome labels repeat heavily, so hash each distinct label once
+        hashes = {text: text_hash(text) for text in set(normalize_titles(left)) | set(normalize_titles(right))}
+        pairs = pl.DataFrame({
+            'k_hash': [hashes[text] for text in normalize_titles(left)],
+            'p_hash': [hashes[text] for text in normalize_titles(right)],
+        }, schema={'k_hash': pl.Int64, 'p_hash': pl.Int64}).with_row_index('row')
+
+        looked_up = pairs.join(self._outcomes, on=['k_hash', 'p_hash'], how='left')
+        missing = looked_up.filter(pl.col('score').is_null()).unique(['k_hash', 'p_hash'], keep='first')
+        if not missing.is_empty():
+            rows = missing['row'].to_list()
+            fresh = missing.select('k_hash', 'p_hash').with_columns(
+                pl.Series('score', score_pairs([left[i] for i in rows], [right[i] for i in rows], workers),
+                          dtype=pl.Float32)
+            )
+            now = time.time()
+            self.db.executemany('INSERT OR REPLACE INTO outcome_scores VALUES (?, ?, ?, ?)',
+                                [(k, p, float(s), now) for k, p, s in fresh.iter_rows()])
+            self.db.commit()
+            self._outcomes = pl.concat([self._outcomes, fresh.with_columns(pl.lit(now).alias('scored_at'))])
+            looked_up = pairs.join(self._outcomes, on=['k_hash', 'p_hash'], how='left')
+
+        return looked_up.sort('row')['score'].to_numpy()
+
+
+def end_dates(events: pl.DataFrame):
+    """ endDate column as a list of datetimes, for registry eviction. """
+    return events['endDate'].to_list() if 'endDate' in events.columns else None
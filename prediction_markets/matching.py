@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from .metrics import METRICS
+
+
+def normalize_titles(titles):
+    """ Lowercase and trim every title once so the scorer never re-allocates per pair. """
+    return [title.strip().lower() if isinstance(title, str) else "" for title in titles]
+
+
+def score_blocks(kalshi, poly, similarity_threshold: float, workers: int = -1, block_cells: int = 1 << 24):
+    """
+    (kalshi_idx, poly_idx, scores) of the normalized title pairs at or above the
+    threshold. Kalshi titles are scored in row blocks so the dense score matrix
+    never holds more than `block_cells` cells at once.
+    """
+    rows = max(1, block_cells // len(poly))
+    kalshi_parts, poly_parts, score_parts = [], [], []
+    for start in range(0, len(kalshi), rows):
+        # Scores under the cutoff come back as 0, so only the surviving cells are non-zero
+        scores = process.cdist(
+            kalshi[start:start + rows],
+            poly,
+            scorer=fuzz.ratio,
+            processor=None,
+            score_cutoff=similarity_threshold,
+            dtype=np.float32,
+            workers=workers,
+        )
+        kalshi_idx, poly_idx = np.nonzero(scores >= similarity_threshold)
+        kalshi_parts.append(kalshi_idx + start)
+        poly_parts.append(poly_idx)
+        score_parts.append(scores[kalshi_idx, poly_idx])
+    return np.concatenate(kalshi_parts), np.concatenate(poly_parts), np.concatenate(score_parts)
+
+
+def match_titles(kalshi_titles, poly_titles, similarity_threshold: float = 75, workers: int = -1,
+                 block_cells: int = 1 << 24, processes: int = 1, min_cells: int = 1 << 26, candidates: int = None,
+                 subtitles=None, index=None):
+    """
+    Score every Kalshi title against every Polymarket title in batched calls.
+
+    Returns three aligned arrays (kalshi_idx, poly_idx, scores) holding only the
+    pairs whose fuzz.ratio is at or above the threshold. Pairs scored and kept
+    are counted in METRICS.
+
+    With `processes` other than 1 (None for one per core), comparisons of at
+    least `min_cells` pairs are sharded across worker processes (see
+    sharding.py); smaller ones are not worth the pool's startup.
+
+    With `candidates`, each Kalshi title is only scored against that many likely
+    partners from an n-gram index of the Polymarket titles (see candidates.py)
+    instead of all of them. Look-alike titles that share no rare word or
+    trigram are then never compared. `subtitles`, a (kalshi, poly) pair of
+    lists, helps find those partners; `index` is the resident
+    candidates.TitleIndex to reuse (default: candidates.RESIDENT).
+    """
+    if len(kalshi_titles) == 0 or len(poly_titles) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+
+    kalshi = normalize_titles(kalshi_titles)
+    poly = normalize_titles(poly_titles)
+    processes = processes or os.cpu_count() or 1
+    scored = len(kalshi) * len(poly)
+    if candidates:
+        from .candidates import match_candidates
+
+        kalshi_idx, poly_idx, scores, scored = match_candidates(kalshi, poly, similarity_threshold, candidates, workers,
+                                                                *(subtitles or (None, None)), index=index)
+    elif processes > 1 and len(kalshi) > 1 and len(kalshi) * len(poly) >= min_cells:
+        from .sharding import match_sharded
+
+        kalshi_idx, poly_idx, scores = match_sharded(kalshi, poly, similarity_threshold, processes, block_cells)
+    else:
+        kalshi_idx, poly_idx, scores = score_blocks(kalshi, poly, similarity_threshold, workers, block_cells)
+    METRICS.inc('title_pairs_scored_total', scored)
+    METRICS.inc('title_pairs_kept_total', len(scores))
+    return kalshi_idx, poly_idx, scores
+
+
+def score_pairs(left, right, workers: int = -1):
+    """ fuzz.ratio of left[i] against right[i] for every i, in one batched call. """
+    if len(left) == 0:
+        return np.empty(0, dtype=np.float32)
+    METRICS.inc('outcome_pairs_scored_total', len(left))
+    # Outcome labels repeat across pairs ('Yes', '25 bps', ...), so each distinct one is normalized once
+    distinct = list(set(left) | set(right))
+    normalized = dict(zip(distinct, normalize_titles(distinct)))
+    return process.cpdist(
+        [normalized[label] for label in left],
+        [normalized[label] for label in right],
+        scorer=fuzz.ratio,
+        processor=None,
+        dtype=np.float32,
+        workers=workers,
+    )
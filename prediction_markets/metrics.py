@@ -0,0 +1,209 @@
+"""Per-stage counters and timers, with Prometheus text and JSON exposition.
+
+Every stage records into the process-wide METRICS registry: fetch latency and
+bytes per venue, transform rows and time, title pairs scored and kept, outcome
+pairs matched and opportunities found. Recording is a dict update under a lock,
+so it is cheap enough to leave on; nothing is formatted until the registry is
+rendered.
+
+Diagnostics go through the standard `logging` module under the
+'prediction_markets' logger. Messages use %-style arguments (or an
+isEnabledFor guard), so a disabled level costs no string formatting.
+
+Only the standard library is imported here, so the CLI can set all of this up
+before the heavy modules load.
+"""
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'prediction_markets_'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+log = logging.getLogger('prediction_markets')
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """
+    Counters and timing summaries keyed by name and labels.
+
+    A summary keeps the count, sum and max of what was observed, enough for
+    rates and means (e.g. transform rows/sec is transform_rows_total over
+    transform_seconds_sum) without holding every sample.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.summaries = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            count, total, peak = self.summaries.get(key, (0, 0.0, 0.0))
+            self.summaries[key] = (count + 1, total + value, max(peak, value))
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """ Observe the seconds spent in the block under `name`, even if it raises. """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+    def snapshot(self) -> dict:
+        """ Everything recorded so far as plain JSON-serializable data. """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(self.summaries.items())
+        return {
+            'time': time.time(),
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in counters],
+            'summaries': [{'name': name, 'labels': dict(labels), 'count': count, 'sum': total, 'max': peak}
+                          for (name, labels), (count, total, peak) in summaries],
+        }
+
+    def render_prometheus(self) -> str:
+        """ Prometheus text exposition format (version 0.0.4). """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(self.summaries.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f'# TYPE {PREFIX}{name} counter')
+                typed.add(name)
+            lines.append(f'{PREFIX}{name}{_labels(labels)} {value}')
+        for (name, labels), (count, total, peak) in summaries:
+            if name not in typed:
+                lines.append(f'# TYPE {PREFIX}{name} summary')
+                typed.add(name)
+            lines.append(f'{PREFIX}{name}_count{_labels(labels)} {count}')
+            lines.append(f'{PREFIX}{name}_sum{_labels(labels)} {total:.6f}')
+        # Prometheus summaries have no max, so it goes out as a gauge of its own
+        for (name, labels), (_, _, peak) in summaries:
+            if f'{name}_max' not in typed:
+                lines.append(f'# TYPE {PREFIX}{name}_max gauge')
+                typed.add(f'{name}_max')
+            lines.append(f'{PREFIX}{name}_max{_labels(labels)} {peak:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+def configure_logging(level: str = 'INFO'):
+    """ Send the package's log records to stderr at `level` (a name such as 'DEBUG' or 'WARNING'). """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log.handlers[:] = [handler]
+    log.setLevel(level.upper())
+    log.propagate = False
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1', metrics: Metrics = METRICS) -> ThreadingHTTPServer:
+    """
+    Serve `metrics` as Prometheus text at http://host:port/metrics (and as JSON at
+    /metrics.json) from a daemon thread. Call .shutdown() on the result to stop.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = metrics.render_prometheus().encode(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            log.debug('metrics ' + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    log.info('Serving metrics on http://%s:%d/metrics', host, server.server_address[1])
+    return server
+
+
+def write_metrics(path: str, metrics: Metrics = METRICS):
+    """ Atomically write a JSON snapshot of `metrics` to `path`. """
+    with open(path + '.tmp', 'w') as f:
+        json.dump(metrics.snapshot(), f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+class MetricsDumper:
+    """ Rewrite a JSON snapshot every `interval` seconds from a daemon thread, and once more on stop(). """
+
+    def __init__(self, path: str, interval: float = 10, metrics: Metrics = METRICS):
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-dump', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            write_metrics(self.path, self.metrics)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        write_metrics(self.path, self.metrics)
+
+
+@contextmanager
+def profiled(path: str = None):
+    """
+    Run the block under cProfile and dump its stats to `path` (readable with
+    pstats or snakeviz); a no-op without a path.
+
+    Sampling profilers need no hook: run the CLI under py-spy instead
+    (`py-spy record -o scan.svg -- prediction-markets scan`).
+    """
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        log.info('Wrote profile to %s', path)
@@ -0,0 +1,96 @@
+"""Cheap predicates applied to each venue's events before any similarity work.
+
+A matched pair is only ever reported if both events have a close date, the
+earlier of the two is within max_days_left, and some pair of their outcomes
+can be priced. All of that can be read off each venue's frame on its own, so
+it is checked first:
+
+- events without an endDate are dropped;
+- outcomes without a label are dropped, and with a min_profit of at least 0 so
+  are outcomes without a quote strictly inside (0, 100): buying either side at
+  100 cents never clears a non-negative profit. Events left with no outcome
+  are dropped. (Polymarket's liquidity and volume floors are already applied
+  by the venue, see fetch.POLYMARKET_PARAMS.)
+- the close-date window splits each venue into events closing within the
+  window ("near") and after it ("far"). A far x far pair closes after the
+  window whatever its titles say, so titles are only scored for
+  near x all and far x near, rather than all x all.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+import polars as pl
+
+from .matching import match_titles
+from .metrics import METRICS, log
+
+
+def prune_events(events: pl.DataFrame, label: str, min_profit: float = None, venue: str = None) -> pl.DataFrame:
+    """
+    `events` without what can never be priced (see the module docstring); the
+    quote predicate only applies when `min_profit` is given. Rows keep their order.
+    """
+    if events.is_empty():
+        return events
+    outcome = pl.element().struct
+    keep = outcome.field(label).is_not_null() & (outcome.field(label) != '')
+    if min_profit is not None and min_profit >= 0:
+        keep = keep & (outcome.field('yes_ask') > 0) & (outcome.field('yes_ask') < 100)
+    pruned = (
+        events
+        .filter(pl.col('endDate').is_not_null())
+        .with_columns(pl.col('outcomes').list.filter(keep))
+        .filter(pl.col('outcomes').list.len() > 0)
+    )
+    METRICS.inc('events_pruned_total', events.height - pruned.height, venue=venue or label)
+    return pruned
+
+
+def closing_within(events: pl.DataFrame, max_days_left: int, now: datetime = None) -> np.ndarray:
+    """ Boolean mask of the events whose endDate is within max_days_left whole days, as pricing counts them. """
+    if events.is_empty():
+        return np.zeros(0, dtype=bool)
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    near = ((pl.col('endDate') - now).dt.total_days() <= max_days_left).fill_null(False)
+    return events.select(near).to_series().to_numpy()
+
+
+def match_near(kalshi_events: pl.DataFrame, polymarket_events: pl.DataFrame, similarity_threshold: float,
+               max_days_left: int, now: datetime = None, **options):
+    """
+    matching.match_titles restricted to the pairs whose earlier close is within
+    max_days_left: Kalshi near x every Polymarket title, then Kalshi far x
+    Polymarket near. Returns (kalshi_idx, poly_idx, scores) in (kalshi, poly)
+    order, like match_titles. `options` go to match_titles.
+
+    With `candidates` every Kalshi title is looked up once in the resident
+    index over all Polymarket titles (with both venues' subtitles), and the
+    same window is applied to the pairs found, so the index is not re-synced
+    to the near subset on every call.
+    """
+    kalshi_near = closing_within(kalshi_events, max_days_left, now)
+    poly_near = closing_within(polymarket_events, max_days_left, now)
+    kalshi_titles = kalshi_events['title'].to_list() if not kalshi_events.is_empty() else []
+    poly_titles = polymarket_events['title'].to_list() if not polymarket_events.is_empty() else []
+    log.debug("Matching %d near / %d far Kalshi titles against %d Polymarket titles (%d near)",
+              kalshi_near.sum(), len(kalshi_near) - kalshi_near.sum(), len(poly_near), poly_near.sum())
+
+    if options.get('candidates') and kalshi_titles and poly_titles:
+        subtitles = (kalshi_events['subtitle'].to_list(), polymarket_events['subtitle'].to_list())
+        kalshi_idx, poly_idx, scores = match_titles(kalshi_titles, poly_titles, similarity_threshold,
+                                                    subtitles=subtitles, **options)
+        keep = kalshi_near[kalshi_idx] | poly_near[poly_idx]
+        return kalshi_idx[keep], poly_idx[keep], scores[keep]
+
+    blocks = ((np.flatnonzero(kalshi_near), np.arange(len(poly_titles))),
+              (np.flatnonzero(~kalshi_near), np.flatnonzero(poly_near)))
+    found_k, found_p, found_scores = [], [], []
+    for k_side, p_side in blocks:
+        k_idx, p_idx, scores = match_titles([kalshi_titles[i] for i in k_side], [poly_titles[i] for i in p_side],
+                                            similarity_threshold, **options)
+        found_k.append(k_side[k_idx])
+        found_p.append(p_side[p_idx])
+        found_scores.append(scores)
+    kalshi_idx, poly_idx, scores = np.concatenate(found_k), np.concatenate(found_p), np.concatenate(found_scores)
+    order = np.lexsort((poly_idx, kalshi_idx))
+    return kalshi_idx[order], poly_idx[order], scores[order]
@@ -60,12 +60,13 @@
 
 
 import polars as pl
-import requests
 import json
 import datetime
 
 
 def fetch_polymarket_events():
+    import requests  # only this blocking helper needs it; the scan pipeline fetches through fetch.py
+
     url = 'https://gamma-api.polymarket.com/events'
     params = {
         "closed": "false",
@@ -74,7 +75,7 @@ def fetch_polymarket_events():
         "volume_num_min": 1000
     }
 
-    response = requests.get(url, params=params)
+    response = requests.get(url, params=params, timeout=30)
 
     if response.status_code != 200:
         raise RuntimeError(f"Failed to fetch Polymarket events. HTTP status: {response.status_code}")
@@ -195,8 +196,9 @@ def transform_data(events):
             ])
         )
 
-        print("POLYMARKET")
-        print(selected_data)
+        ## DEBUG PRINT
+        # print("POLYMARKET")
+        # print(selected_data)
         return selected_data
 
     except Exception as e:
@@ -216,6 +218,3 @@ def get_polymarket_events():
     except Exception as e:
         raise ValueError(f"Error in Polymarket transformation: {e}")
 
-
-# Fetch and transform Polymarket events
-get_polymarket_events()
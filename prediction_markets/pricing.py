@@ -0,0 +1,170 @@
+import polars as pl
+from datetime import datetime, timezone
+
+from .matching import score_pairs
+from .metrics import METRICS
+
+# Name of the string field that labels an outcome in each venue's outcome struct
+KALSHI_LABEL = 'yes_subtitle'
+POLYMARKET_LABEL = 'option'
+
+# Order book ids carried through to the outcome pairs, for streaming quotes (see streaming.py)
+KALSHI_IDS = ('ticker',)
+POLYMARKET_IDS = ('yes_token', 'no_token')
+
+DIRECTIONS = pl.Enum(['kalshi_yes', 'polymarket_yes'])
+
+OPPORTUNITY_SCHEMA = {
+    'kalshi_title': pl.Utf8,
+    'poly_title': pl.Utf8,
+    'kalshi_outcome': pl.Utf8,
+    'poly_outcome': pl.Utf8,
+    'event_similarity': pl.Float32,
+    'outcome_similarity': pl.Float32,
+    'direction': DIRECTIONS,
+    'yes_ask': pl.Float64,
+    'no_ask': pl.Float64,
+    'yes_stake': pl.Float64,
+    'no_stake': pl.Float64,
+    'yes_payout': pl.Float64,
+    'no_payout': pl.Float64,
+    'profit': pl.Float64,
+    'arbitrage_percentage': pl.Float64,
+    'end_date': pl.Datetime('us'),
+    'time_remaining': pl.Int64,
+}
+
+
+def explode_outcomes(events: pl.DataFrame, label: str, ids=()) -> pl.DataFrame:
+    """
+    One row per outcome, tagged with the row index of the event it belongs to.
+
+    The outcome fields named in `ids` come along too, as nulls for frames built
+    before outcomes carried them.
+    """
+    fields = {field.name for field in events.schema['outcomes'].inner.fields}
+    return (
+        events
+        .select(
+            pl.int_range(pl.len(), dtype=pl.UInt32).alias('event_idx'),
+            'title',
+            'endDate',
+            'outcomes',
+        )
+        .explode('outcomes', empty_as_null=True)
+        .drop_nulls('outcomes')
+        .unnest('outcomes')
+        .select(
+            'event_idx',
+            'title',
+            'endDate',
+            pl.col(label).alias('label'),
+            pl.col('yes_ask').cast(pl.Float64),
+            *[pl.col(name) if name in fields else pl.lit(None, dtype=pl.Utf8).alias(name) for name in ids],
+        )
+        .filter(pl.col('label').is_not_null() & (pl.col('label') != ''))
+    )
+
+
+def join_outcome_pairs(kalshi_events: pl.DataFrame, polymarket_events: pl.DataFrame,
+                       kalshi_idx, poly_idx, event_scores,
+                       similarity_threshold: float = 75, max_days_left: int = 5, scorer=score_pairs) -> pl.DataFrame:
+    """
+    Expand matched event pairs into every Kalshi x Polymarket outcome combination,
+    keep the ones whose labels match and whose earliest close is within max_days_left.
+
+    `scorer` scores the label pairs and defaults to matching.score_pairs.
+    """
+    event_pairs = pl.DataFrame({
+        'k_event': pl.Series(kalshi_idx, dtype=pl.UInt32),
+        'p_event': pl.Series(poly_idx, dtype=pl.UInt32),
+        'event_similarity': pl.Series(event_scores, dtype=pl.Float32),
+    })
+    kalshi_outcomes = explode_outcomes(kalshi_events, KALSHI_LABEL, KALSHI_IDS).rename(lambda c: f'k_{c}')
+    poly_outcomes = explode_outcomes(polymarket_events, POLYMARKET_LABEL, POLYMARKET_IDS).rename(lambda c: f'p_{c}')
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    pairs = (
+        event_pairs
+        .join(kalshi_outcomes, left_on='k_event', right_on='k_event_idx')
+        .join(poly_outcomes, left_on='p_event', right_on='p_event_idx')
+        .with_columns(pl.min_horizontal('k_endDate', 'p_endDate').alias('end_date'))
+        .filter(pl.col('k_endDate').is_not_null() & pl.col('p_endDate').is_not_null())
+        .with_columns((pl.col('end_date') - now).dt.total_days().alias('time_remaining'))
+        .filter(pl.col('time_remaining') <= max_days_left)
+    )
+
+    # Every surviving label pair is scored in one batched call
+    outcome_scores = scorer(pairs['k_label'].to_list(), pairs['p_label'].to_list())
+    matched = (
+        pairs
+        .with_columns(pl.Series('outcome_similarity', outcome_scores, dtype=pl.Float32))
+        .filter(pl.col('outcome_similarity') >= similarity_threshold)
+    )
+    METRICS.inc('outcome_pairs_kept_total', matched.height)
+    return matched
+
+
+def price_hedge(pairs: pl.DataFrame, yes_ask: pl.Expr, no_ask: pl.Expr, stake: float) -> pl.DataFrame:
+    """ Stakes, payouts and guaranteed profit for buying YES at `yes_ask` and NO at `no_ask` (in cents). """
+    yes_stake = stake / (1 + no_ask / yes_ask)
+    no_stake = stake - yes_stake
+    return (
+        pairs
+        .with_columns(
+            yes_ask.alias('yes_ask'),
+            no_ask.alias('no_ask'),
+            yes_stake.alias('yes_stake'),
+            no_stake.alias('no_stake'),
+        )
+        .filter((pl.col('yes_ask') > 0) & (pl.col('no_ask') > 0))
+        .with_columns(
+            (pl.col('yes_stake') / (pl.col('yes_ask') / 100)).alias('yes_payout'),
+            (pl.col('no_stake') / (pl.col('no_ask') / 100)).alias('no_payout'),
+        )
+        .with_columns(
+            (pl.min_horizontal('yes_payout', 'no_payout') - (pl.col('yes_stake') + pl.col('no_stake'))).alias('profit'),
+        )
+        .with_columns(
+            (pl.col('profit') / (pl.col('yes_stake') + pl.col('no_stake')) * 100).alias('arbitrage_percentage'),
+        )
+    )
+
+
+def _price_direction(pairs: pl.DataFrame, direction: str, yes_ask: pl.Expr, no_ask: pl.Expr,
+                     stake: float) -> pl.DataFrame:
+    """ price_hedge for buying YES on one venue and NO on the other, tagged with the direction. """
+    return price_hedge(pairs.with_columns(pl.lit(direction, dtype=DIRECTIONS).alias('direction')),
+                       yes_ask, no_ask, stake)
+
+
+def price_opportunities(pairs: pl.DataFrame, stake: float = 100, min_profit: float = 2.0, carry=()) -> pl.DataFrame:
+    """
+    Price both hedge directions of every matched outcome pair and keep the profitable ones.
+
+    Columns named in `carry` are passed through ahead of the opportunity columns.
+    """
+    schema = {name: pairs.schema[name] for name in carry} | OPPORTUNITY_SCHEMA
+    if pairs.is_empty():
+        return pl.DataFrame(schema=schema)
+
+    priced = pl.concat([
+        _price_direction(pairs, 'kalshi_yes', pl.col('k_yes_ask'), 100 - pl.col('p_yes_ask'), stake),
+        _price_direction(pairs, 'polymarket_yes', pl.col('p_yes_ask'), 100 - pl.col('k_yes_ask'), stake),
+    ])
+    opportunities = (
+        priced
+        .filter(pl.col('profit') >= min_profit)
+        .select(
+            *carry,
+            pl.col('k_title').alias('kalshi_title'),
+            pl.col('p_title').alias('poly_title'),
+            pl.col('k_label').alias('kalshi_outcome'),
+            pl.col('p_label').alias('poly_outcome'),
+            *[name for name in OPPORTUNITY_SCHEMA if name not in ('kalshi_title', 'poly_title', 'kalshi_outcome', 'poly_outcome')],
+        )
+        .cast(schema)
+        .sort('arbitrage_percentage', descending=True)
+    )
+    METRICS.inc('opportunities_found_total', opportunities.height)
+    return opportunities
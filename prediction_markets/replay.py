@@ -0,0 +1,92 @@
+"""Record venue responses to disk and replay them without touching the network.
+
+Both are httpx transports, so the fetchers run unchanged: `make_client(record=...)`
+saves every successful response under a capture directory and
+`make_client(replay=...)` answers every request from one. Captures are keyed
+by method and full URL, query included.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+import httpx
+
+# Bodies are stored decoded, so transfer framing from the original response no longer applies
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+def capture_key(request: httpx.Request) -> str:
+    url = request.url.copy_with(query=None)
+    canonical = json.dumps([request.method, str(url), sorted(request.url.params.multi_items())])
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """ Passes requests through to `transport` and writes each 200 response to `directory`. """
+
+    def __init__(self, directory: str, transport: httpx.AsyncBaseTransport):
+        self.directory = directory
+        self.transport = transport
+        os.makedirs(directory, exist_ok=True)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # Never record a 304: a capture has to stand on its own when replayed
+        for name in CONDITIONAL_HEADERS:
+            request.headers.pop(name, None)
+
+        response = await self.transport.handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+
+        headers = [(name, value) for name, value in response.headers.multi_items()
+                   if name.lower() not in DROPPED_HEADERS]
+        if response.status_code == 200:
+            self._write(capture_key(request), request, headers, body)
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    def _write(self, key: str, request: httpx.Request, headers, body: bytes):
+        path = os.path.join(self.directory, key)
+        with open(path + '.body.gz.tmp', 'wb') as f:
+            f.write(gzip.compress(body, compresslevel=1))
+        os.replace(path + '.body.gz.tmp', path + '.body.gz')
+        with open(path + '.json.tmp', 'w') as f:
+            json.dump({'method': request.method, 'url': str(request.url), 'headers': headers}, f)
+        os.replace(path + '.json.tmp', path + '.json')
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """ Answers requests from a capture directory; anything never recorded gets a 404. """
+
+    def __init__(self, directory: str):
+        if not os.path.isdir(directory):
+            raise ValueError(f"No captures found at {directory}")
+        self.directory = directory
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        path = os.path.join(self.directory, capture_key(request))
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            with open(path + '.body.gz', 'rb') as f:
+                body = gzip.decompress(f.read())
+        except FileNotFoundError:
+            return httpx.Response(404, json={'error': f'not recorded: {request.url}'}, request=request)
+        return httpx.Response(200, headers=meta['headers'], content=body, request=request)
+
+
+def read_captures(directory: str):
+    """ Yield (url, body) for every capture in `directory`. """
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            path = os.path.join(directory, name[:-len('.json')])
+            with open(path + '.json') as f:
+                url = json.load(f)['url']
+            with open(path + '.body.gz', 'rb') as f:
+                yield url, gzip.decompress(f.read())
@@ -0,0 +1,324 @@
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import polars as pl
+
+from .cache import DEFAULT_CACHE_DIR, ResponseCache
+from .fetch import get_all_events
+from .candidates import TitleIndex, ratio_pairs
+from .matching import match_titles, normalize_titles, score_pairs
+from .metrics import METRICS, log
+from .plan import prune_events
+from .pricing import (KALSHI_IDS, KALSHI_LABEL, OPPORTUNITY_SCHEMA, POLYMARKET_IDS, POLYMARKET_LABEL,
+                      join_outcome_pairs, price_opportunities)
+
+# Order book ids carried with every opportunity, for execution
+IDS = [f'k_{name}' for name in KALSHI_IDS] + [f'p_{name}' for name in POLYMARKET_IDS]
+
+# Events are consolidated by (title, subtitle) on Kalshi and by title on Polymarket
+EVENT_KEYS = {
+    'kalshi': ['title', 'subtitle'],
+    'polymarket': ['title'],
+}
+
+MATCH_SCHEMA = {'k_key': pl.UInt32, 'p_key': pl.UInt32, 'event_similarity': pl.Float32}
+
+
+class KeyTable:
+    """
+    Resident interning table of one venue's event keys (title, plus the
+    subtitle on Kalshi). Each key maps to a UInt32 id for as long as it is
+    listed, so the scanner's index, match and opportunity frames hold
+    fixed-width ids instead of title strings. Ids are handed out in order and
+    never reused, so a stale id can never alias a newer event.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = {}
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, names) -> pl.Series:
+        """ Ids of `names`, assigning new ones to names not seen before. """
+        ids = []
+        for name in names:
+            i = self.ids.get(name)
+            if i is None:
+                i = self.ids[name] = self.next_id
+                self.names[i] = name
+                self.next_id += 1
+            ids.append(i)
+        return pl.Series('key', ids, dtype=pl.UInt32)
+
+    def release(self, ids):
+        """ Forget the keys behind delisted `ids`. """
+        for i in ids:
+            self.ids.pop(self.names.pop(i, None), None)
+
+
+def index_events(events: pl.DataFrame, venue: str, keys: KeyTable) -> pl.DataFrame:
+    """
+    Key, row index and a fingerprint of the quotes and close date of every event.
+
+    The key is the event's id in `keys`, which stays the same across polls for
+    as long as its title (and Kalshi subtitle) do.
+    """
+    if events.is_empty():
+        return pl.DataFrame(schema={'key': pl.UInt32, 'title': pl.Utf8, 'subtitle': pl.Utf8, 'row': pl.UInt32,
+                                    'endDate': pl.Datetime('us'), 'fingerprint': pl.UInt64})
+    indexed = events.select(
+        pl.concat_str(EVENT_KEYS[venue], separator='\x1f', ignore_nulls=True).alias('name'),
+        'title',
+        'subtitle',
+        pl.int_range(pl.len(), dtype=pl.UInt32).alias('row'),
+        'endDate',
+        pl.struct('outcomes', 'endDate').hash().alias('fingerprint'),
+    ).unique('name', keep='first', maintain_order=True)
+    return indexed.drop('name').insert_column(0, keys.intern(indexed['name']))
+
+
+def diff_events(previous: pl.DataFrame, current: pl.DataFrame):
+    """ Keys that appeared, disappeared, or whose quotes / close date moved since the previous poll. """
+    added = current.join(previous, on='key', how='anti')['key']
+    removed = previous.join(current, on='key', how='anti')['key']
+    repriced = (
+        current.join(previous, on='key', suffix='_previous')
+        .filter(pl.col('fingerprint') != pl.col('fingerprint_previous'))['key']
+    )
+    return added, removed, repriced
+
+
+class Scanner:
+    """
+    Resident arbitrage scanner that keeps matched event pairs and their priced
+    opportunities between polls.
+
+    Each cycle only scores titles that are new since the last poll (a title edit
+    shows up as one key removed and one added) and only re-prices the pairs with
+    an event whose quotes or close date moved, so steady-state work scales with
+    the number of changes rather than with the size of both universes.
+
+    With a match_cache.MatchStore the title and outcome decisions also survive
+    restarts, so the first cycle of a new process only scores unseen titles.
+
+    With `candidates`, both venues' titles are kept in candidates.TitleIndex
+    instances updated as events are listed and delisted, and each new title is
+    only scored against its top `candidates` partners from the other venue.
+
+    With an `executor` (execution.ExecutionEngine, already started), run()
+    submits every new opportunity to it as soon as it is found.
+
+    With a `history` (history.SnapshotStore), run() appends both venues'
+    frames to it on every poll, for backtesting.
+    """
+
+    def __init__(self, similarity_threshold: int = 75, min_profit: float = 2.0, max_days_left: int = 5,
+                 stake: float = 100, store=None, processes: int = 1, candidates: int = None, executor=None,
+                 history=None):
+        self.similarity_threshold = similarity_threshold
+        self.min_profit = min_profit
+        self.max_days_left = max_days_left
+        self.stake = stake
+        self.store = store
+        self.processes = processes
+        self.candidates = candidates
+        self.executor = executor
+        self.history = history
+        self.titles = {venue: TitleIndex() for venue in EVENT_KEYS}
+
+        self.keys = {venue: KeyTable() for venue in EVENT_KEYS}
+        self.index = {venue: index_events(pl.DataFrame(), venue, self.keys[venue]) for venue in EVENT_KEYS}
+        self.matches = pl.DataFrame(schema=MATCH_SCHEMA)
+        self.opportunities = pl.DataFrame(schema={'k_key': pl.UInt32, 'p_key': pl.UInt32,
+                                                  **{name: pl.Utf8 for name in IDS}, **OPPORTUNITY_SCHEMA})
+        self.reported = set()
+
+    def _match_new_titles(self, kalshi_index, poly_index, kalshi_added, poly_added) -> pl.DataFrame:
+        """ Score new Kalshi titles against every Polymarket title and old Kalshi titles against new Polymarket ones. """
+        new_kalshi = kalshi_index.filter(pl.col('key').is_in(kalshi_added.implode()))
+        old_kalshi = kalshi_index.filter(~pl.col('key').is_in(kalshi_added.implode()))
+        new_poly = poly_index.filter(pl.col('key').is_in(poly_added.implode()))
+
+        found = []
+        for kalshi_side, poly_side in ((new_kalshi, poly_index), (old_kalshi, new_poly)):
+            k_idx, p_idx, scores = match_titles(kalshi_side['title'].to_list(), poly_side['title'].to_list(),
+                                                self.similarity_threshold, processes=self.processes)
+            if len(k_idx):
+                found.append(pl.DataFrame({
+                    'k_key': kalshi_side['key'].gather(k_idx),
+                    'p_key': poly_side['key'].gather(p_idx),
+                    'event_similarity': pl.Series(scores, dtype=pl.Float32),
+                }))
+        return pl.concat(found) if found else pl.DataFrame(schema=MATCH_SCHEMA)
+
+    def _match_indexed(self, kalshi_index, poly_index, kalshi_added, kalshi_removed, poly_added, poly_removed):
+        """
+        Bring both title indexes in line with this poll and score each new title
+        against its top candidates from the other venue. Returns (matches, pairs scored).
+        """
+        def listed(index, added):
+            return index.filter(pl.col('key').is_in(added.implode())).select('key', 'title', 'subtitle').iter_rows()
+
+        for venue, removed in (('kalshi', kalshi_removed), ('polymarket', poly_removed)):
+            for key in removed:
+                self.titles[venue].remove(key)
+        for key, title, subtitle in listed(poly_index, poly_added):
+            self.titles['polymarket'].add(key, title, subtitle)
+
+        # New Polymarket titles are looked up before the new Kalshi ones are indexed, so no pair is found twice
+        pairs = [(partner, key) for key, title, subtitle in listed(poly_index, poly_added)
+                 for partner, _ in self.titles['kalshi'].search(title, self.candidates, subtitle)]
+        for key, title, subtitle in listed(kalshi_index, kalshi_added):
+            self.titles['kalshi'].add(key, title, subtitle)
+            pairs.extend((key, partner)
+                         for partner, _ in self.titles['polymarket'].search(title, self.candidates, subtitle))
+        if not pairs:
+            return pl.DataFrame(schema=MATCH_SCHEMA), 0
+
+        candidates = (
+            pl.DataFrame(pairs, schema={'k_key': pl.UInt32, 'p_key': pl.UInt32}, orient='row')
+            .join(kalshi_index.select(pl.col('key').alias('k_key'), pl.col('title').alias('k_title')), on='k_key')
+            .join(poly_index.select(pl.col('key').alias('p_key'), pl.col('title').alias('p_title')), on='p_key')
+        )
+        scores = ratio_pairs(normalize_titles(candidates['k_title']), normalize_titles(candidates['p_title']))
+        matches = (
+            candidates
+            .with_columns(pl.Series('event_similarity', scores, dtype=pl.Float32))
+            .filter(pl.col('event_similarity') >= self.similarity_threshold)
+            .select(list(MATCH_SCHEMA))
+        )
+        METRICS.inc('title_pairs_scored_total', candidates.height)
+        METRICS.inc('title_pairs_kept_total', matches.height)
+        return matches, candidates.height
+
+    def _match_from_store(self, kalshi_index, poly_index) -> pl.DataFrame:
+        """ All matched pairs of the current universe; the store only scores titles it has not seen. """
+        k_idx, p_idx, scores = self.store.match_titles(
+            kalshi_index['title'].to_list(), poly_index['title'].to_list(), self.similarity_threshold,
+            kalshi_index['endDate'].to_list(), poly_index['endDate'].to_list(), processes=self.processes,
+            candidates=self.candidates,
+            subtitles=(kalshi_index['subtitle'].to_list(), poly_index['subtitle'].to_list()),
+        )
+        return pl.DataFrame({
+            'k_key': kalshi_index['key'].gather(k_idx),
+            'p_key': poly_index['key'].gather(p_idx),
+            'event_similarity': pl.Series(scores, dtype=pl.Float32),
+        })
+
+    def update(self, kalshi_events: pl.DataFrame, polymarket_events: pl.DataFrame) -> dict:
+        """ Fold one poll of both venues into the resident state and return what changed. """
+        # Events that can never be priced are never indexed (see plan.py); the date
+        # window moves between polls and is applied when reading opportunities instead
+        kalshi_events = prune_events(kalshi_events, KALSHI_LABEL, self.min_profit, 'kalshi')
+        polymarket_events = prune_events(polymarket_events, POLYMARKET_LABEL, self.min_profit, 'polymarket')
+        kalshi_index = index_events(kalshi_events, 'kalshi', self.keys['kalshi'])
+        poly_index = index_events(polymarket_events, 'polymarket', self.keys['polymarket'])
+        k_added, k_removed, k_repriced = diff_events(self.index['kalshi'], kalshi_index)
+        p_added, p_removed, p_repriced = diff_events(self.index['polymarket'], poly_index)
+        self.keys['kalshi'].release(k_removed)
+        self.keys['polymarket'].release(p_removed)
+
+        # Forget pairs whose event is gone, then score only the titles we have never seen
+        scored = len(k_added) * len(poly_index) + (len(kalshi_index) - len(k_added)) * len(p_added)
+        if self.store is not None:
+            self.matches = self._match_from_store(kalshi_index, poly_index)
+        else:
+            self.matches = self.matches.filter(
+                ~pl.col('k_key').is_in(k_removed.implode()) & ~pl.col('p_key').is_in(p_removed.implode())
+            )
+            if self.candidates:
+                new_matches, scored = self._match_indexed(kalshi_index, poly_index, k_added, k_removed,
+                                                          p_added, p_removed)
+            else:
+                new_matches = self._match_new_titles(kalshi_index, poly_index, k_added, p_added)
+            self.matches = pl.concat([self.matches, new_matches])
+
+        # Re-price every pair that is new or has a side whose quotes moved
+        k_dirty = pl.concat([k_added, k_repriced]).implode()
+        p_dirty = pl.concat([p_added, p_repriced]).implode()
+        dirty = self.matches.filter(pl.col('k_key').is_in(k_dirty) | pl.col('p_key').is_in(p_dirty))
+        self.opportunities = self.opportunities.filter(
+            ~pl.col('k_key').is_in(k_removed.implode()) & ~pl.col('p_key').is_in(p_removed.implode())
+            & ~pl.col('k_key').is_in(k_dirty) & ~pl.col('p_key').is_in(p_dirty)
+        )
+        if not dirty.is_empty():
+            self.opportunities = pl.concat([self.opportunities, self._price(dirty, kalshi_events, polymarket_events,
+                                                                          kalshi_index, poly_index)])
+
+        self.index = {'kalshi': kalshi_index, 'polymarket': poly_index}
+        return {
+            'kalshi_added': len(k_added), 'kalshi_removed': len(k_removed), 'kalshi_repriced': len(k_repriced),
+            'polymarket_added': len(p_added), 'polymarket_removed': len(p_removed),
+            'polymarket_repriced': len(p_repriced),
+            'titles_scored': scored,
+            'pairs_repriced': len(dirty),
+        }
+
+    def _price(self, dirty, kalshi_events, polymarket_events, kalshi_index, poly_index) -> pl.DataFrame:
+        """ Price the dirty event pairs. The close-date window is applied at read time, not here. """
+        rows = (
+            dirty
+            .join(kalshi_index.select('key', pl.col('row').alias('k_row')), left_on='k_key', right_on='key')
+            .join(poly_index.select('key', pl.col('row').alias('p_row')), left_on='p_key', right_on='key')
+        )
+        pairs = join_outcome_pairs(kalshi_events, polymarket_events, rows['k_row'].to_numpy(),
+                                   rows['p_row'].to_numpy(), rows['event_similarity'].to_numpy(),
+                                   self.similarity_threshold, max_days_left=np.iinfo(np.int32).max,
+                                   scorer=self.store.score_pairs if self.store is not None else score_pairs)
+        keys = rows.select('k_key', 'p_key', pl.col('k_row').alias('k_event'), pl.col('p_row').alias('p_event'))
+        return price_opportunities(pairs.join(keys, on=['k_event', 'p_event']), self.stake, self.min_profit,
+                                   carry=['k_key', 'p_key', *IDS])
+
+    def current_opportunities(self, as_of: datetime = None) -> pl.DataFrame:
+        """ Priced opportunities whose earliest close is within max_days_left as of `as_of` (naive UTC, default now). """
+        now = as_of or datetime.now(timezone.utc).replace(tzinfo=None)
+        return (
+            self.opportunities
+            .with_columns((pl.col('end_date') - now).dt.total_days().alias('time_remaining'))
+            .filter(pl.col('time_remaining') <= self.max_days_left)
+            .sort('arbitrage_percentage', descending=True)
+        )
+
+    def new_opportunities(self) -> pl.DataFrame:
+        """ Current opportunities not reported before, marking them reported. """
+        current = self.current_opportunities()
+        keys = list(zip(current['k_key'], current['p_key'], current['kalshi_outcome'], current['poly_outcome'],
+                        current['direction']))
+        fresh = [key not in self.reported for key in keys]
+        self.reported = set(keys)
+        return current.filter(pl.Series(fresh, dtype=pl.Boolean))
+
+    def run(self, interval: float = 60, cycles: int = None, cache_dir: str = DEFAULT_CACHE_DIR, **fetch_options):
+        """ Poll both venues every `interval` seconds and report opportunities as they appear. """
+        from .arbitrage import report_opportunities
+
+        cache = ResponseCache(cache_dir) if cache_dir else None
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            started = time.monotonic()
+            with METRICS.timer('stage_seconds', stage='fetch'):
+                kalshi_events, polymarket_events = get_all_events(cache=cache, delta=cache is not None,
+                                                                  **fetch_options)
+            if self.history is not None:
+                with METRICS.timer('stage_seconds', stage='history'):
+                    self.history.append({'kalshi': kalshi_events, 'polymarket': polymarket_events})
+            fetched = time.monotonic()
+            with METRICS.timer('stage_seconds', stage='update'):
+                changes = self.update(kalshi_events, polymarket_events)
+            fresh = self.new_opportunities()
+            if self.executor is not None and not fresh.is_empty():
+                self.executor.submit(fresh)
+            report_opportunities(fresh)
+
+            finished = time.monotonic()
+            METRICS.inc('scanner_cycles_total')
+            log.info("Cycle %d: fetch %.2fs, update %.3fs, %d title pairs scored, %d pairs re-priced, "
+                     "%d new opportunities", cycle, fetched - started, finished - fetched, changes['titles_scored'],
+                     changes['pairs_repriced'], len(fresh))
+            cycle += 1
+            if cycles is None or cycle < cycles:
+                time.sleep(max(0.0, interval - (finished - started)))
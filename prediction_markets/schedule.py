@@ -0,0 +1,321 @@
+"""Refresh matched legs at a rate set by how soon they close and how much they move.
+
+Polling every market at one interval spends most requests on books that will
+not close for weeks, while a market closing within the hour gets looked at no
+more often. RefreshScheduler gives each leg its own interval: proportional to
+the time left until its close, shortened by the leg's recent price volatility,
+and clamped to [min_interval, max_interval]. Only the legs that are due are
+fetched, and only the pairs they belong to are re-priced (see
+streaming.PairBook).
+"""
+import asyncio
+import heapq
+import math
+import time
+from datetime import timezone
+
+import numpy as np
+
+from .fetch import CLOB_URL, KALSHI_URL, fetch_order_books, get_all_events, make_client
+from .metrics import METRICS, log
+from .sizing import kalshi_ask_levels, polymarket_ask_levels
+from .streaming import PairBook, opportunity_frame
+
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 900
+# Seconds to close per second of refresh interval: a leg closing within the hour
+# is refreshed every second, one closing tomorrow every 24 seconds
+CLOSE_RATIO = 3600
+# Recent movement, in cents per minute, that halves a leg's interval
+VOLATILITY_SCALE = 1.0
+# Half-life, in seconds, of the volatility estimate
+VOLATILITY_HALFLIFE = 60
+# Most order books fetched in one round
+MAX_BATCH = 200
+# Seconds between re-fetching both venues' events to pick up new and closed markets
+DISCOVER_INTERVAL = 300
+
+
+def refresh_interval(seconds_to_close: float, volatility: float = 0.0, min_interval: float = MIN_INTERVAL,
+                     max_interval: float = MAX_INTERVAL) -> float:
+    """ Seconds until a leg closing in `seconds_to_close` and moving `volatility` cents a minute is due again. """
+    interval = max(seconds_to_close, 0) / CLOSE_RATIO / (1 + volatility / VOLATILITY_SCALE)
+    return min(max(interval, min_interval), max_interval)
+
+
+def top_of_book(venue: str, book: dict):
+    """ (best bid, best ask) in cents from a venue's order book response; NaN for an empty side. """
+    if venue == 'kalshi':
+        asks = [price for price, _ in kalshi_ask_levels(book, 'yes')]
+        bids = [100 - price for price, _ in kalshi_ask_levels(book, 'no')]
+    else:
+        asks = [price for price, _ in polymarket_ask_levels(book)]
+        bids = [float(level['price']) * 100 for level in book.get('bids') or []]
+    return max(bids) if bids else math.nan, min(asks) if asks else math.nan
+
+
+class RefreshScheduler:
+    """
+    When each leg is next due, as a heap of (due, key).
+
+    A leg is re-pushed every time it is rescheduled and stale heap entries are
+    skipped when popped, so rescheduling never searches the heap. Times are
+    time.time() seconds; a leg whose close has passed is dropped.
+    """
+
+    def __init__(self, min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                 halflife: float = VOLATILITY_HALFLIFE):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.halflife = halflife
+        self.heap = []
+        self.next = {}
+        self.closes = {}
+        self.volatility = {}
+        self.last = {}
+
+    def __len__(self):
+        return len(self.next)
+
+    def interval(self, key, now: float) -> float:
+        return refresh_interval(self.closes[key] - now, self.volatility.get(key, 0.0), self.min_interval,
+                                self.max_interval)
+
+    def _push(self, key, due: float):
+        self.next[key] = due
+        heapq.heappush(self.heap, (due, key))
+
+    def add(self, key, closes: float, price: float = None, now: float = None):
+        """ Track a leg closing at `closes`; a leg already tracked keeps its schedule and volatility. """
+        now = time.time() if now is None else now
+        self.closes[key] = closes
+        if key in self.next:
+            return
+        if price is not None and not math.isnan(price):
+            self.last[key] = (float(price), now)
+        self._push(key, now + self.interval(key, now))
+
+    def remove(self, key):
+        # Its heap entry is skipped once popped
+        self.next.pop(key, None)
+        self.closes.pop(key, None)
+        self.volatility.pop(key, None)
+        self.last.pop(key, None)
+
+    def due(self, now: float, limit: int = None):
+        """ Pop the legs due by `now`, most overdue first. """
+        keys = []
+        while self.heap and self.heap[0][0] <= now and (limit is None or len(keys) < limit):
+            due, key = heapq.heappop(self.heap)
+            if self.next.get(key) != due:
+                continue
+            if self.closes[key] <= now:
+                self.remove(key)
+                continue
+            del self.next[key]
+            keys.append(key)
+        return keys
+
+    def next_due(self):
+        """ The earliest time a tracked leg is due, or None. """
+        while self.heap and self.next.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def observe(self, key, price: float, now: float) -> float:
+        """
+        Fold a fresh price into the leg's volatility (an exponentially weighted
+        average of cents moved per minute) and schedule its next refresh.
+        Returns the new interval; a missing price just reschedules.
+        """
+        if key not in self.closes:
+            return None
+        if price is not None and not math.isnan(price):
+            price = float(price)
+            if key in self.last:
+                last_price, seen = self.last[key]
+                elapsed = max(now - seen, 1e-3)
+                weight = 1 - 0.5 ** (elapsed / self.halflife)
+                rate = abs(price - last_price) / elapsed * 60
+                volatility = self.volatility.get(key, 0.0)
+                self.volatility[key] = volatility + weight * (rate - volatility)
+            self.last[key] = (price, now)
+        interval = self.interval(key, now)
+        self._push(key, now + interval)
+        return interval
+
+
+def leg_closes(book: PairBook) -> dict:
+    """ {(venue, leg id): epoch seconds of the earliest close among the pairs it belongs to} for a PairBook. """
+    closes = {}
+    for venue in ('kalshi', 'polymarket'):
+        for leg in book.legs(venue):
+            end = min(book.rows[pair][6] for pair in book.pairs_of[book.slots[leg]].tolist())
+            closes[(venue, leg)] = end.replace(tzinfo=timezone.utc).timestamp()
+    return closes
+
+
+def _identity(book: PairBook, key) -> tuple:
+    pair, direction = key
+    return book.rows[pair][:4] + (direction,)
+
+
+def carry_over(old: PairBook, new: PairBook):
+    """
+    Price every pair of a freshly matched `new` book and return the opportunities
+    that were not already open in `old`, so rediscovery only reports what changed.
+    Without `old`, every open opportunity is returned.
+    """
+    if old is not None:
+        # Legs both books share keep their refreshed quotes rather than the snapshot's
+        for key, slot in new.slots.items():
+            if isinstance(key, str) and key in old.slots:
+                new.bid[slot] = old.bid[old.slots[key]]
+                new.ask[slot] = old.ask[old.slots[key]]
+    found = new.reprice(np.arange(len(new.rows)))
+    if old is None:
+        return found
+    seen = {_identity(old, key) for key in old.open}
+    fresh = {_identity(new, key) for key in new.open} - seen
+    return [opp for opp in found
+            if (opp['kalshi_title'], opp['poly_title'], opp['kalshi_outcome'], opp['poly_outcome'],
+                opp['direction']) in fresh]
+
+
+async def refresh_books(book: PairBook, scheduler: RefreshScheduler, report, duration: float = None,
+                        discover=None, discover_interval: float = DISCOVER_INTERVAL, max_batch: int = MAX_BATCH,
+                        kalshi_url: str = KALSHI_URL, clob_url: str = CLOB_URL, record: str = None,
+                        replay: str = None):
+    """
+    Fetch the order books of the legs as they fall due, re-price the pairs they
+    belong to and pass what opened to `report`. With `discover` (a blocking
+    callable returning a new PairBook, or None), both venues are re-matched every
+    discover_interval seconds in a worker thread. Returns the last book.
+    """
+    deadline = time.time() + duration if duration is not None else math.inf
+    rediscover = time.time() + discover_interval if discover else math.inf
+    pending = None
+    async with make_client(record=record, replay=replay) as client:
+        while time.time() < deadline:
+            now = time.time()
+            if pending is None and now >= rediscover:
+                pending = asyncio.create_task(asyncio.to_thread(discover))
+            if pending is not None and pending.done():
+                try:
+                    fresh = pending.result()
+                except Exception as e:
+                    # Keep refreshing the current book; the next rediscovery may succeed
+                    METRICS.inc('refresh_errors_total', stage='discover')
+                    log.warning('Rediscovery failed, keeping the current %d pairs: %r', len(book.rows), e)
+                    fresh = None
+                pending, rediscover = None, time.time() + discover_interval
+                if fresh is not None:
+                    found = carry_over(book, fresh)
+                    book = fresh
+                    closes = leg_closes(book)
+                    for key in set(scheduler.closes) - set(closes):
+                        scheduler.remove(key)
+                    for key, closes_at in closes.items():
+                        scheduler.add(key, closes_at, book.ask[book.slots[key[1]]], now)
+                    if found:
+                        report(found)
+
+            keys = scheduler.due(now, max_batch)
+            if not keys:
+                wake = min(scheduler.next_due() or math.inf, rediscover, deadline)
+                await asyncio.sleep(min(max(wake - time.time(), 0), scheduler.min_interval))
+                continue
+
+            try:
+                kalshi_books, polymarket_books = await fetch_order_books(
+                    [leg for venue, leg in keys if venue == 'kalshi'],
+                    [leg for venue, leg in keys if venue == 'polymarket'],
+                    kalshi_url, clob_url, client)
+            except Exception as e:
+                # Put the round's legs back on their schedule rather than ending the loop
+                METRICS.inc('refresh_errors_total', stage='books')
+                log.warning('Order book refresh of %d legs failed: %r', len(keys), e)
+                kalshi_books, polymarket_books = {}, {}
+            now = time.time()
+            found = []
+            for venue, leg in keys:
+                raw = (kalshi_books if venue == 'kalshi' else polymarket_books).get(leg)
+                ask = None
+                if raw is not None:
+                    bid, ask = top_of_book(venue, raw)
+                    found.extend(book.update(leg, bid, ask))
+                interval = scheduler.observe((venue, leg), ask, now)
+                if interval is not None:
+                    METRICS.observe('refresh_interval_seconds', interval, venue=venue)
+                METRICS.inc('refreshes_total', venue=venue)
+            if found:
+                report(found)
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+    return book
+
+
+def schedule_arbitrage(similarity_threshold: float = 75, min_profit: float = 2.0, max_days_left: int = 5,
+                       stake: float = 100, cache_dir: str = None, match_cache: str = None, duration: float = None,
+                       min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                       discover_interval: float = DISCOVER_INTERVAL, max_batch: int = MAX_BATCH,
+                       clob_url: str = CLOB_URL, processes: int = 1, candidates: int = None, executor=None,
+                       **fetch_options):
+    """
+    Match both venues from a snapshot, then keep every matched leg's order book
+    fresh at its own rate (see RefreshScheduler) and report each opportunity
+    the moment a refresh opens it.
+
+    Events are re-fetched and re-matched every `discover_interval` seconds.
+    `processes` and `candidates` go to matching.match_titles. With an `executor`
+    (execution.ExecutionEngine, already started) every opportunity is also
+    submitted for execution before it is printed. Extra keyword arguments go
+    to fetch_all_events.
+    """
+    from .arbitrage import match_outcome_pairs, report_opportunities
+    from .cache import ResponseCache
+
+    cache = ResponseCache(cache_dir) if cache_dir else None
+
+    def discover():
+        kalshi_events, polymarket_events = get_all_events(cache=cache, delta=cache is not None, **fetch_options)
+        if kalshi_events.is_empty() or polymarket_events.is_empty():
+            log.warning("No events found in one or both datasets.")
+            return None
+        # No min_profit: a leg without a quote in the snapshot may have one by its first refresh
+        pairs = match_outcome_pairs(kalshi_events, polymarket_events, similarity_threshold, max_days_left,
+                                    match_cache, processes, candidates)
+        book = PairBook(pairs, stake, min_profit)
+        log.info("Scheduling %d matched outcome pairs (%d Kalshi markets, %d Polymarket tokens)",
+                 pairs.height, len(book.legs('kalshi')), len(book.legs('polymarket')))
+        if executor is not None:
+            executor.prepare([(venue, leg) for venue in ('kalshi', 'polymarket') for leg in book.legs(venue)])
+        return book
+
+    def report(found):
+        if executor is not None:
+            executor.submit(found)
+        report_opportunities(opportunity_frame(found))
+
+    book = discover()
+    if book is None:
+        return None
+    scheduler = RefreshScheduler(min_interval, max_interval)
+    now = time.time()
+    for key, closes in leg_closes(book).items():
+        scheduler.add(key, closes, book.ask[book.slots[key[1]]], now)
+    found = carry_over(None, book)
+    if found:
+        report(found)
+    intervals = [scheduler.interval(key, now) for key in scheduler.closes]
+    if intervals:
+        log.info("Refresh intervals: %.2f s to %.0f s (median %.1f s)", min(intervals), max(intervals),
+                 float(np.median(intervals)))
+
+    try:
+        asyncio.run(refresh_books(book, scheduler, report, duration, discover, discover_interval, max_batch,
+                                  fetch_options.get('kalshi_url', KALSHI_URL), clob_url, fetch_options.get('record'),
+                                  fetch_options.get('replay')))
+    except KeyboardInterrupt:
+        pass
+    return scheduler
@@ -0,0 +1,81 @@
+"""Title matching sharded across a process pool.
+
+The Kalshi titles are split into shards, each scored against every Polymarket
+title by a worker process. The normalized Polymarket titles are written once to
+a shared memory block (UTF-8 bytes plus an offsets array) that every worker
+maps at startup, so they are never pickled per task; only the shards and the
+surviving (kalshi, poly, score) triples cross process boundaries.
+
+Workers are spawned rather than forked, so this works the same on every
+platform and never forks a process that holds Polars' or httpx's threads.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Polymarket titles of the worker process, mapped from shared memory by _attach
+_titles = None
+
+# Shards per worker, so one slow shard does not leave the other workers idle
+SHARDS_PER_PROCESS = 4
+
+
+def share_titles(titles) -> shared_memory.SharedMemory:
+    """ Copy `titles` into a new shared memory block: len(titles) + 1 int64 offsets, then the UTF-8 text. """
+    encoded = [title.encode() for title in titles]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    header = offsets.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(1, header + int(offsets[-1])))
+    block.buf[:header] = offsets.tobytes()
+    block.buf[header:header + int(offsets[-1])] = b''.join(encoded)
+    return block
+
+
+def read_titles(block: shared_memory.SharedMemory, count: int):
+    """ The `count` titles stored in `block` by share_titles. """
+    header = 8 * (count + 1)
+    offsets = np.frombuffer(block.buf[:header], dtype=np.int64).tolist()
+    text = bytes(block.buf[header:header + offsets[-1]])
+    return [text[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+
+def _attach(name: str, count: int):
+    """ Worker initializer: map the shared titles once for every shard this worker scores. """
+    global _titles
+    # Pool workers share the parent's resource tracker, so attaching does not make them owners of the block
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        _titles = read_titles(block, count)
+    finally:
+        block.close()
+
+
+def _score_shard(start: int, kalshi, similarity_threshold: float, block_cells: int):
+    from .matching import score_blocks
+
+    kalshi_idx, poly_idx, scores = score_blocks(kalshi, _titles, similarity_threshold, 1, block_cells)
+    return kalshi_idx + start, poly_idx, scores
+
+
+def match_sharded(kalshi, poly, similarity_threshold: float, processes: int, block_cells: int = 1 << 24):
+    """
+    matching.score_blocks over `processes` worker processes, for already
+    normalized titles. Results come back in the same (kalshi, poly) order as a
+    single-process run.
+    """
+    block = share_titles(poly)
+    try:
+        size = max(1, -(-len(kalshi) // (processes * SHARDS_PER_PROCESS)))
+        starts = range(0, len(kalshi), size)
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_attach, initargs=(block.name, len(poly))) as pool:
+            parts = list(pool.map(_score_shard, starts, [kalshi[start:start + size] for start in starts],
+                                  repeat(similarity_threshold), repeat(block_cells)))
+    finally:
+        block.close()
+        block.unlink()
+    return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
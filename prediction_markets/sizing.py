@@ -0,0 +1,248 @@
+"""Depth-aware sizing of hedged outcome pairs.
+
+A hedge buys the same number of contracts on both legs, so it pays 100 cents
+per contract whichever way the event resolves. Walking both ask ladders
+together gives its cost at every size: profit grows while the two legs'
+marginal prices sum to under 100 cents and shrinks after. Every pair is walked
+at once as Polars columns, so sizing a whole scan costs one pass.
+
+Prices are in cents and sizes in contracts; stakes and profits come out in dollars.
+"""
+import math
+
+import polars as pl
+
+LEGS = pl.Enum(['yes', 'no'])
+LEVEL_SCHEMA = {'pair': pl.UInt32, 'leg': LEGS, 'price': pl.Float64, 'size': pl.Float64}
+
+SIZING_SCHEMA = {
+    'pair': pl.UInt32,
+    'contracts': pl.Float64,
+    'yes_fill': pl.Float64,
+    'no_fill': pl.Float64,
+    'yes_stake': pl.Float64,
+    'no_stake': pl.Float64,
+    'stake': pl.Float64,
+    'profit': pl.Float64,
+    'arbitrage_percentage': pl.Float64,
+}
+
+
+def kalshi_ask_levels(orderbook: dict, side: str):
+    """
+    (price, size) ask ladder for buying `side` ('yes' / 'no') of a Kalshi market.
+
+    Kalshi's order book only lists bids; buying YES means hitting a NO bid at
+    100 - its price, and the other way round.
+    """
+    book = orderbook.get('orderbook') or {}
+    other = 'no' if side == 'yes' else 'yes'
+    return [(100 - price, count) for price, count in book.get(other) or []]
+
+
+def polymarket_ask_levels(book: dict):
+    """ (price, size) ask ladder of a Polymarket CLOB token, prices converted to cents. """
+    return [(float(level['price']) * 100, float(level['size'])) for level in book.get('asks') or []]
+
+
+def levels_frame(ladders) -> pl.DataFrame:
+    """ LEVEL_SCHEMA frame from (yes ladder, no ladder) per pair, in pair order. """
+    rows = [(pair, leg, price, size)
+            for pair, sides in enumerate(ladders)
+            for leg, ladder in zip(('yes', 'no'), sides)
+            for price, size in ladder]
+    return pl.DataFrame(rows, schema=LEVEL_SCHEMA, orient='row')
+
+
+def profit_curve(levels: pl.DataFrame) -> pl.DataFrame:
+    """
+    Cost and profit of each pair's hedge at every size where either ladder steps.
+
+    Each row ends a segment over which both legs fill at a constant price
+    (`yes_price` / `no_price`, the marginal prices); `yes_cost`, `no_cost`, `cost`
+    and `profit` are cumulative, in cents. Sizes stop at the shallower ladder.
+    """
+    ladders = (
+        levels
+        .filter((pl.col('size') > 0) & (pl.col('price') > 0) & (pl.col('price') < 100))
+        .sort('pair', 'leg', 'price')
+        .with_columns(pl.col('size').cum_sum().over('pair', 'leg').alias('depth'))
+    )
+    capacity = (
+        ladders
+        .group_by('pair', 'leg')
+        .agg(pl.col('depth').max())
+        .group_by('pair')
+        .agg(pl.col('depth').min().alias('capacity'), pl.len().alias('legs'))
+        .filter(pl.col('legs') == 2)
+    )
+    steps = (
+        ladders
+        .select('pair', pl.col('depth').alias('contracts'))
+        .join(capacity, on='pair')
+        .filter(pl.col('contracts') <= pl.col('capacity'))
+        .select('pair', 'contracts')
+        .unique()
+        .sort('pair', 'contracts')
+    )
+
+    def ladder(leg):
+        return (
+            ladders
+            .filter(pl.col('leg') == leg)
+            .select('pair', 'depth', pl.col('price').alias(f'{leg}_price'))
+            .sort('pair', 'depth')
+        )
+
+    # A segment ending at `contracts` fills from the first level deep enough to cover it.
+    # Both sides are sorted by (pair, key), so each pair's keys are ascending as the join needs
+    return (
+        steps
+        .join_asof(ladder('yes'), left_on='contracts', right_on='depth', by='pair', strategy='forward',
+                   check_sortedness=False)
+        .drop('depth')
+        .join_asof(ladder('no'), left_on='contracts', right_on='depth', by='pair', strategy='forward',
+                   check_sortedness=False)
+        .drop('depth')
+        .sort('pair', 'contracts')
+        .with_columns(
+            (pl.col('contracts') - pl.col('contracts').shift(1, fill_value=0).over('pair')).alias('width'),
+        )
+        .with_columns(
+            (pl.col('width') * pl.col('yes_price')).cum_sum().over('pair').alias('yes_cost'),
+            (pl.col('width') * pl.col('no_price')).cum_sum().over('pair').alias('no_cost'),
+        )
+        .with_columns((pl.col('yes_cost') + pl.col('no_cost')).alias('cost'))
+        .with_columns((100 * pl.col('contracts') - pl.col('cost')).alias('profit'))
+        .drop('width')
+    )
+
+
+def size_pairs(levels: pl.DataFrame, min_profit: float = 2.0, max_stake: float = None,
+               whole_contracts: bool = True) -> pl.DataFrame:
+    """
+    The largest hedge per pair whose profit stays at or above `min_profit`
+    dollars and whose total cost stays within `max_stake` dollars.
+
+    Within a segment cost and profit are linear, so the size is solved exactly
+    (then floored to whole contracts, as Kalshi only trades those). Pairs with no
+    such size are left out. Returns SIZING_SCHEMA.
+    """
+    return size_curve(profit_curve(levels), min_profit, max_stake, whole_contracts)
+
+
+def size_curve(curve: pl.DataFrame, min_profit: float = 2.0, max_stake: float = None,
+               whole_contracts: bool = True) -> pl.DataFrame:
+    """ size_pairs over an already computed profit_curve. """
+    if curve.is_empty():
+        return pl.DataFrame(schema=SIZING_SCHEMA)
+
+    floor = 100 * min_profit
+    budget = math.inf if max_stake is None else 100 * max_stake
+    start = {name: pl.col(name).shift(1, fill_value=0).over('pair') for name in ('contracts', 'yes_cost', 'no_cost')}
+    marginal = pl.col('yes_price') + pl.col('no_price')
+    start_cost = start['yes_cost'] + start['no_cost']
+    start_profit = 100 * start['contracts'] - start_cost
+
+    # Furthest point in each segment that keeps profit >= floor and cost <= budget
+    end = pl.min_horizontal(
+        pl.col('contracts'),
+        pl.when(marginal > 100).then(start['contracts'] + (start_profit - floor) / (marginal - 100))
+        .otherwise(pl.col('contracts')),
+        start['contracts'] + (budget - start_cost) / marginal,
+    )
+    if whole_contracts:
+        end = end.floor()
+    sized = (
+        curve
+        .with_columns(
+            end.alias('size'),
+            start['contracts'].alias('start'),
+            start['yes_cost'].alias('start_yes_cost'),
+            start['no_cost'].alias('start_no_cost'),
+        )
+        .with_columns(
+            (pl.col('start_yes_cost') + (pl.col('size') - pl.col('start')) * pl.col('yes_price')).alias('yes_cost'),
+            (pl.col('start_no_cost') + (pl.col('size') - pl.col('start')) * pl.col('no_price')).alias('no_cost'),
+        )
+        .with_columns((100 * pl.col('size') - pl.col('yes_cost') - pl.col('no_cost')).alias('profit'))
+        .filter(
+            (pl.col('size') > 0)
+            & (pl.col('size') >= pl.col('start'))
+            & (pl.col('profit') >= floor - 1e-9)
+            & (pl.col('yes_cost') + pl.col('no_cost') <= budget + 1e-9)
+        )
+    )
+    return (
+        sized
+        .sort('pair', 'size')
+        .group_by('pair', maintain_order=True)
+        .last()
+        .select(
+            'pair',
+            pl.col('size').alias('contracts'),
+            (pl.col('yes_cost') / pl.col('size')).alias('yes_fill'),
+            (pl.col('no_cost') / pl.col('size')).alias('no_fill'),
+            (pl.col('yes_cost') / 100).alias('yes_stake'),
+            (pl.col('no_cost') / 100).alias('no_stake'),
+            ((pl.col('yes_cost') + pl.col('no_cost')) / 100).alias('stake'),
+            (pl.col('profit') / 100).alias('profit'),
+        )
+        .with_columns((pl.col('profit') / pl.col('stake') * 100).alias('arbitrage_percentage'))
+        .cast(SIZING_SCHEMA)
+    )
+
+
+def opportunity_ladders(opportunities: pl.DataFrame, kalshi_books: dict, polymarket_books: dict):
+    """
+    (yes ladder, no ladder) for every opportunity row, from the venue order books
+    of its legs. Rows need the k_ticker / p_yes_token / p_no_token ids.
+    """
+    ladders = []
+    for direction, ticker, yes_token, no_token in opportunities.select(
+            'direction', 'k_ticker', 'p_yes_token', 'p_no_token').iter_rows():
+        kalshi_book = kalshi_books.get(ticker) or {}
+        if direction == 'kalshi_yes':
+            ladders.append((kalshi_ask_levels(kalshi_book, 'yes'),
+                            polymarket_ask_levels(polymarket_books.get(no_token) or {})))
+        else:
+            ladders.append((polymarket_ask_levels(polymarket_books.get(yes_token) or {}),
+                            kalshi_ask_levels(kalshi_book, 'no')))
+    return ladders
+
+
+def size_opportunities(opportunities: pl.DataFrame, kalshi_books: dict, polymarket_books: dict,
+                       min_profit: float = 2.0, max_stake: float = None) -> pl.DataFrame:
+    """
+    Re-size priced opportunities against order book depth.
+
+    The quoted asks, stakes, payouts and profit are replaced by the blended fills
+    of the largest hedge that still clears `min_profit` within `max_stake`, and a
+    `contracts` column is added. Opportunities that cannot are dropped.
+
+    `profit_curve` lists the hedge's (contracts, stake, profit) in dollars at
+    every size where either ladder steps, up to the shallower ladder's depth, so
+    the trade-off between size and edge is visible beyond the chosen size.
+    """
+    curve = profit_curve(levels_frame(opportunity_ladders(opportunities, kalshi_books, polymarket_books)))
+    sized = size_curve(curve, min_profit, max_stake)
+    points = curve.group_by('pair').agg(
+        pl.struct('contracts', (pl.col('cost') / 100).alias('stake'), (pl.col('profit') / 100).alias('profit'))
+        .alias('profit_curve')
+    )
+    columns = opportunities.columns
+    return (
+        opportunities
+        .with_row_index('pair')
+        .drop('yes_ask', 'no_ask', 'yes_stake', 'no_stake', 'yes_payout', 'no_payout', 'profit', 'arbitrage_percentage')
+        .join(sized, on='pair')
+        .join(points, on='pair')
+        .with_columns(
+            pl.col('yes_fill').alias('yes_ask'),
+            pl.col('no_fill').alias('no_ask'),
+            pl.col('contracts').alias('yes_payout'),
+            pl.col('contracts').alias('no_payout'),
+        )
+        .select(*columns, 'contracts', 'profit_curve')
+        .sort('profit', descending=True)
+    )
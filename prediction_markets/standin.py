@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """
+    Serves canned Kalshi feed / Polymarket events payloads the way the real APIs
+    page and order them, with ETags so conditional requests can be exercised.
+    """
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real venues
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        server = self.server
+
+        with server.lock:
+            server.requests.append((url.path, query))
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+        if fail:
+            self.send_json(429, {'error': 'rate limited'}, {'Retry-After': '0'})
+            return
+
+        if url.path == '/v1/users/feed':
+            if not server.kalshi_page_size:
+                self.send_json(200, {'feed': server.kalshi_feed})
+                return
+            start = int(query.get('cursor') or 0)
+            end = start + server.kalshi_page_size
+            self.send_json(200, {'feed': server.kalshi_feed[start:end],
+                                 'cursor': str(end) if end < len(server.kalshi_feed) else None})
+        elif url.path.startswith('/trade-api/v2/markets/') and url.path.endswith('/orderbook'):
+            ticker = url.path.split('/')[-2]
+            if ticker in server.kalshi_books:
+                self.send_json(200, {'orderbook': server.kalshi_books[ticker]})
+            else:
+                self.send_json(404, {'error': 'market not found'})
+        elif url.path == '/book':
+            token = query.get('token_id')
+            if token in server.polymarket_books:
+                self.send_json(200, {'asset_id': token, **server.polymarket_books[token]})
+            else:
+                self.send_json(404, {'error': 'No orderbook exists for the requested token id'})
+        elif url.path == '/events':
+            offset = int(query.get('offset', 0))
+            limit = int(query.get('limit', 1000))
+            events = server.polymarket_events
+            if query.get('order'):
+                events = sorted(events, key=lambda event: event.get(query['order']) or '',
+                                reverse=query.get('ascending') == 'false')
+            self.send_json(200, events[offset:offset + limit])
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+
+def start_standin(kalshi_feed=(), polymarket_events=(), failures: int = 0, kalshi_page_size: int = None,
+                  kalshi_books: dict = None, polymarket_books: dict = None, host: str = '127.0.0.1', port: int = 0):
+    """
+    Start a stand-in venue server on a background thread and return it with its base URL.
+
+    `failures` makes the first N requests answer 429 so retry handling can be exercised.
+    With `kalshi_page_size`, the Kalshi feed is served in pages linked by a cursor.
+    `kalshi_books` ({ticker: {'yes': [[price, count]], 'no': ...}}) and
+    `polymarket_books` ({token: {'bids': [...], 'asks': [...]}}) back the order
+    book endpoints; the same base URL then stands in for Polymarket's CLOB too.
+    Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.kalshi_feed = list(kalshi_feed)
+    server.polymarket_events = list(polymarket_events)
+    server.failures = failures
+    server.kalshi_page_size = kalshi_page_size
+    server.kalshi_books = kalshi_books or {}
+    server.polymarket_books = polymarket_books or {}
+    server.requests = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+class ExchangeHandler(StandinHandler):
+    """
+    A simulated exchange taking Kalshi and Polymarket orders: each one is
+    answered after the venue's configured latency and filled (or not) as its
+    config says, immediate-or-cancel style. GETs (session warm-up) just answer {}.
+    """
+
+    # Headers and body go out as separate writes; with Nagle on, the body would wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_json(200, {})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        server = self.server
+        if self.path == '/trade-api/v2/portfolio/orders':
+            venue, count = 'kalshi', int(body.get('count') or 0)
+        elif self.path == '/order':
+            venue, count = 'polymarket', float((body.get('order') or {}).get('size') or 0)
+        else:
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        config = server.config[venue]
+        with server.lock:
+            delay = config['latency'] + server.rng.uniform(0, config['jitter'])
+            rejected = server.rng.random() < config['reject_rate']
+            missed = server.rng.random() < config['miss_rate']
+            order_id = f'{venue}-{len(server.orders)}'
+            filled = 0 if missed else math.floor(count * config['fill'])
+            server.orders.append((venue, body, filled))
+        time.sleep(delay)
+        if rejected:
+            self.send_json(400, {'error': 'order rejected'})
+        elif venue == 'kalshi':
+            price = body.get('yes_price') or body.get('no_price')
+            self.send_json(201, {'order': {
+                'order_id': order_id, 'client_order_id': body.get('client_order_id'), 'ticker': body.get('ticker'),
+                'status': 'executed' if filled else 'canceled', 'fill_count': filled, 'remaining_count': 0,
+                'side': body.get('side'), 'action': body.get('action'), f"{body.get('side')}_price": price,
+            }})
+        else:
+            order = body.get('order') or {}
+            notional = round(filled * float(order.get('price') or 0), 6)
+            # BUY makes USDC and takes shares; SELL the other way round
+            making, taking = (notional, filled) if order.get('side') == 'BUY' else (filled, notional)
+            self.send_json(200, {'success': True, 'orderID': order_id, 'status': 'matched' if filled else 'unmatched',
+                                 'makingAmount': str(making), 'takingAmount': str(taking), 'errorMsg': ''})
+
+
+EXCHANGE_DEFAULTS = {'latency': 0.0, 'jitter': 0.0, 'fill': 1.0, 'miss_rate': 0.0, 'reject_rate': 0.0}
+
+
+def start_exchange_standin(seed: int = 0, venues: dict = None, host: str = '127.0.0.1', port: int = 0,
+                           **behaviour):
+    """
+    Start a simulated exchange for both venues' order endpoints and return it with its base URL.
+
+    `behaviour` sets, for every venue: `latency` and `jitter` (seconds added to
+    each answer), `fill` (share of each order filled), `miss_rate` (chance an
+    order fills nothing) and `reject_rate` (chance it is refused with a 400).
+    `venues` overrides them per venue, e.g. {'polymarket': {'fill': 0.5}};
+    server.config can also be changed while it runs. Orders are kept in
+    server.orders as (venue, body, contracts filled). Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer((host, port), ExchangeHandler)
+    server.daemon_threads = True
+    server.config = {venue: {**EXCHANGE_DEFAULTS, **behaviour, **(venues or {}).get(venue, {})}
+                     for venue in ('kalshi', 'polymarket')}
+    server.rng = random.Random(seed)
+    server.orders = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+# Websocket paths of each venue's stream, as in streaming.KALSHI_WS_URL / POLYMARKET_WS_URL
+STREAM_PATHS = {'/trade-api/ws/v2': 'kalshi', '/ws/market': 'polymarket'}
+
+
+class StreamStandin:
+    """ Handle on a running websocket stand-in: what clients subscribed with, and shutdown(). """
+
+    def __init__(self, loop, server):
+        self.loop = loop
+        self.server = server
+        self.subscriptions = []
+
+    def shutdown(self):
+        async def stop():
+            self.server.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def start_stream_standin(streams: dict, realtime: bool = False, host: str = '127.0.0.1', port: int = 0):
+    """
+    Start a websocket stand-in for the venues' order book streams and return it with its base URL.
+
+    `streams` maps a venue to its recorded [(seconds, raw message)] (see
+    streaming.load_stream). Each connection waits for its subscription, replays
+    the venue's messages (spaced as recorded if `realtime`, otherwise back to
+    back) and closes. Connect to base URL + the venue's path in STREAM_PATHS.
+    """
+    from websockets.asyncio.server import serve
+    from websockets.exceptions import ConnectionClosed
+
+    loop = asyncio.new_event_loop()
+    standin = None
+
+    async def replay(ws):
+        venue = STREAM_PATHS.get(ws.request.path)
+        if venue is None:
+            await ws.close(1008, 'unknown stream')
+            return
+        try:
+            standin.subscriptions.append((venue, json.loads(await ws.recv())))
+            previous = 0.0
+            for at, message in streams.get(venue, []):
+                if realtime:
+                    await asyncio.sleep(max(0.0, at - previous))
+                    previous = at
+                await ws.send(message)
+        except ConnectionClosed:
+            return  # the client went away mid-replay
+        await ws.close()
+
+    async def start():
+        return await serve(replay, host, port, max_size=None)
+
+    server = loop.run_until_complete(start())
+    standin = StreamStandin(loop, server)
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return standin, f'ws://{host}:{server.sockets[0].getsockname()[1]}'
@@ -0,0 +1,383 @@
+"""Stream venue order books and re-price matched outcome pairs on every quote.
+
+A snapshot scan decides which outcome pairs match; after that, prices come from
+the venues' websocket channels instead of polling. PairBook keeps the top of
+book of every leg in flat arrays and, on each quote, re-prices only the pairs
+that leg belongs to, so an opportunity is reported as soon as the quote that
+opened it arrives.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+import polars as pl
+
+from .metrics import METRICS, log
+from .pricing import OPPORTUNITY_SCHEMA
+
+KALSHI_WS_URL = 'wss://api.elections.kalshi.com/trade-api/ws/v2'
+POLYMARKET_WS_URL = 'wss://ws-subscriptions-clob.polymarket.com/ws/market'
+
+# Polymarket drops market-channel connections that stay silent for longer than this
+POLYMARKET_HEARTBEAT = 10
+
+
+def _connect():
+    try:
+        from websockets.asyncio.client import connect
+    except ImportError:
+        raise RuntimeError("Streaming needs the websockets package: pip install 'prediction-markets[stream]'") from None
+    return connect
+
+
+def _cents(price):
+    return None if price in (None, '') else float(price) * 100
+
+
+def kalshi_subscription(tickers) -> dict:
+    return {'id': 1, 'cmd': 'subscribe', 'params': {'channels': ['ticker'], 'market_tickers': list(tickers)}}
+
+
+def polymarket_subscription(tokens) -> dict:
+    return {'assets_ids': list(tokens), 'type': 'market'}
+
+
+def kalshi_quotes(message: dict):
+    """ (ticker, yes_bid, yes_ask) updates in a Kalshi ticker message, in cents; None leaves a side unchanged. """
+    if message.get('type') not in ('ticker', 'ticker_v2'):
+        return []
+    msg = message.get('msg') or {}
+    if not msg.get('market_ticker'):
+        return []
+    return [(msg['market_ticker'], msg.get('yes_bid'), msg.get('yes_ask'))]
+
+
+def polymarket_quotes(message: dict):
+    """ (token, best_bid, best_ask) updates in a Polymarket market-channel message, in cents. """
+    event = message.get('event_type')
+    if event == 'book':
+        bids = [float(level['price']) for level in message.get('bids') or []]
+        asks = [float(level['price']) for level in message.get('asks') or []]
+        # An empty side means nothing to buy at any price
+        return [(message['asset_id'], max(bids) * 100 if bids else math.nan, min(asks) * 100 if asks else math.nan)]
+    if event == 'price_change':
+        return [(change['asset_id'], _cents(change.get('best_bid')), _cents(change.get('best_ask')))
+                for change in message.get('price_changes') or [] if change.get('asset_id')]
+    if event == 'best_bid_ask':
+        return [(message['asset_id'], _cents(message.get('best_bid')), _cents(message.get('best_ask')))]
+    return []
+
+
+# Each entry: default url, subscription message, quote parser, heartbeat interval
+VENUES = {
+    'kalshi': (KALSHI_WS_URL, kalshi_subscription, kalshi_quotes, None),
+    'polymarket': (POLYMARKET_WS_URL, polymarket_subscription, polymarket_quotes, POLYMARKET_HEARTBEAT),
+}
+
+
+class PairBook:
+    """
+    Top of book for every leg of the matched outcome pairs, in cents.
+
+    A Kalshi leg is a market ticker quoted on its YES side, so buying NO costs
+    100 - yes_bid. A Polymarket leg is a CLOB token with its own book, so the YES
+    and NO tokens of a market are separate legs. Books start from the snapshot
+    prices the pairs were matched with.
+    """
+
+    def __init__(self, pairs: pl.DataFrame, stake: float = 100, min_profit: float = 2.0):
+        self.stake = stake
+        self.min_profit = min_profit
+        self.rows = pairs.select(
+            'k_title', 'p_title', 'k_label', 'p_label', 'event_similarity', 'outcome_similarity', 'end_date',
+            'k_ticker', 'p_yes_token', 'p_no_token',
+        ).rows()
+        self.slots = {}
+
+        def slots(column, venue):
+            # A leg without an id never gets quotes, but still has a slot for its snapshot price
+            return np.array([self.slots.setdefault(key if key else (venue, i), len(self.slots))
+                             for i, key in enumerate(pairs[column].to_list())], dtype=np.int64)
+
+        self.kalshi = slots('k_ticker', 'kalshi')
+        self.poly_yes = slots('p_yes_token', 'polymarket_yes')
+        self.poly_no = slots('p_no_token', 'polymarket_no')
+
+        self.bid = np.full(len(self.slots), math.nan)
+        self.ask = np.full(len(self.slots), math.nan)
+        k_yes_ask = pairs['k_yes_ask'].to_numpy()
+        p_yes_ask = pairs['p_yes_ask'].to_numpy()
+        self.ask[self.kalshi] = k_yes_ask
+        self.bid[self.kalshi] = k_yes_ask
+        self.ask[self.poly_yes] = p_yes_ask
+        self.ask[self.poly_no] = 100 - p_yes_ask
+
+        members = {}
+        for legs in (self.kalshi, self.poly_yes, self.poly_no):
+            for pair, slot in enumerate(legs):
+                members.setdefault(int(slot), []).append(pair)
+        self.pairs_of = {slot: np.unique(rows) for slot, rows in members.items()}
+        self.open = {}
+
+    def legs(self, venue: str):
+        """ Ids of the legs a venue has to be subscribed to. """
+        if venue == 'kalshi':
+            sides = [self.kalshi]
+        else:
+            sides = [self.poly_yes, self.poly_no]
+        ids = {slot: key for key, slot in self.slots.items() if isinstance(key, str)}
+        return sorted({ids[slot] for side in sides for slot in side.tolist() if slot in ids})
+
+    def update(self, key: str, bid: float = None, ask: float = None):
+        """ Apply one quote and return the opportunities it opened or changed. """
+        slot = self.slots.get(key)
+        if slot is None:
+            return []
+        if bid is not None:
+            self.bid[slot] = bid
+        if ask is not None:
+            self.ask[slot] = ask
+        return self.reprice(self.pairs_of[slot])
+
+    def reprice(self, pairs: np.ndarray):
+        """ Price both hedge directions of `pairs` from the current books, like pricing.price_opportunities. """
+        found = []
+        for direction, yes_ask, no_ask in (
+            ('kalshi_yes', self.ask[self.kalshi[pairs]], self.ask[self.poly_no[pairs]]),
+            ('polymarket_yes', self.ask[self.poly_yes[pairs]], 100 - self.bid[self.kalshi[pairs]]),
+        ):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                profit = self.stake * 100 / (yes_ask + no_ask) - self.stake
+            # NaN (no quote) compares False, so missing legs never price as profitable
+            profitable = (yes_ask > 0) & (no_ask > 0) & (profit >= self.min_profit)
+            for pair, ok, yes, no, gain in zip(pairs.tolist(), profitable, yes_ask, no_ask, profit):
+                key = (pair, direction)
+                if not ok:
+                    self.open.pop(key, None)
+                elif self.open.get(key) != gain:
+                    self.open[key] = gain
+                    found.append(self._opportunity(pair, direction, float(yes), float(no)))
+        return found
+
+    def _opportunity(self, pair: int, direction: str, yes_ask: float, no_ask: float) -> dict:
+        (kalshi_title, poly_title, kalshi_outcome, poly_outcome, event_similarity, outcome_similarity, end_date,
+         k_ticker, p_yes_token, p_no_token) = self.rows[pair]
+        yes_stake = self.stake / (1 + no_ask / yes_ask)
+        no_stake = self.stake - yes_stake
+        yes_payout = yes_stake / (yes_ask / 100)
+        no_payout = no_stake / (no_ask / 100)
+        profit = min(yes_payout, no_payout) - self.stake
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return {
+            'kalshi_title': kalshi_title,
+            'poly_title': poly_title,
+            'kalshi_outcome': kalshi_outcome,
+            'poly_outcome': poly_outcome,
+            'event_similarity': event_similarity,
+            'outcome_similarity': outcome_similarity,
+            'direction': direction,
+            'yes_ask': yes_ask,
+            'no_ask': no_ask,
+            'yes_stake': yes_stake,
+            'no_stake': no_stake,
+            'yes_payout': yes_payout,
+            'no_payout': no_payout,
+            'profit': profit,
+            'arbitrage_percentage': profit / self.stake * 100,
+            'end_date': end_date,
+            'time_remaining': (end_date - now).days,
+            # Order book ids, for execution; opportunity_frame leaves them out
+            'k_ticker': k_ticker,
+            'p_yes_token': p_yes_token,
+            'p_no_token': p_no_token,
+        }
+
+
+def opportunity_frame(opportunities) -> pl.DataFrame:
+    """ Streamed opportunities as a frame with the same columns as price_opportunities. """
+    return pl.DataFrame(opportunities, schema=OPPORTUNITY_SCHEMA)
+
+
+class StreamRecorder:
+    """ Appends every received message to a JSON-lines file that start_stream_standin can replay. """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w')
+        self.started = time.monotonic()
+
+    def write(self, venue: str, message: str):
+        self.file.write(json.dumps({'venue': venue, 'at': time.monotonic() - self.started, 'message': message}) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def load_stream(path: str) -> dict:
+    """ {venue: [(seconds since start, raw message)]} from a StreamRecorder file. """
+    streams = {}
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            streams.setdefault(entry['venue'], []).append((entry['at'], entry['message']))
+    return streams
+
+
+class Streamer:
+    """
+    Feeds venue websocket messages into a PairBook and hands every opportunity
+    they open to `on_opportunities`, timing each message from receipt to detection.
+    """
+
+    def __init__(self, book: PairBook, on_opportunities=None, record: str = None):
+        self.book = book
+        self.on_opportunities = on_opportunities
+        self.recorder = StreamRecorder(record) if record else None
+        self.messages = 0
+        self.latencies = deque(maxlen=100_000)
+
+    def handle(self, venue: str, raw, received: float = None):
+        """ Apply one raw message and return the opportunities it opened or changed. """
+        received = received or time.perf_counter()
+        if self.recorder:
+            self.recorder.write(venue, raw)
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return []  # heartbeats ('PONG') and other non-JSON frames
+        parse = VENUES[venue][2]
+        found = []
+        for entry in message if isinstance(message, list) else [message]:
+            for key, bid, ask in parse(entry):
+                found.extend(self.book.update(key, bid, ask))
+        self.messages += 1
+        latency = time.perf_counter() - received
+        self.latencies.append(latency * 1000)
+        METRICS.inc('stream_messages_total', venue=venue)
+        METRICS.observe('stream_detection_seconds', latency, venue=venue)
+        if found:
+            METRICS.inc('opportunities_found_total', len(found))
+        if found and self.on_opportunities:
+            self.on_opportunities(found)
+        return found
+
+    async def _heartbeat(self, ws, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await ws.send('PING')
+
+    async def stream(self, venue: str, url: str = None, headers=None, reconnect: bool = True,
+                     retries: int = 5, backoff: float = 0.5):
+        """
+        Subscribe to `venue`'s legs and apply its messages until cancelled.
+
+        `headers` (a dict, or a callable returning one per connection) are sent
+        with the handshake; Kalshi only streams to authenticated connections.
+        Without `reconnect`, a connection the server closes ends the stream.
+        """
+        from websockets.exceptions import WebSocketException
+
+        connect = _connect()
+        default_url, subscription, _, heartbeat = VENUES[venue]
+        legs = self.book.legs(venue)
+        if not legs:
+            return
+        attempt = 0
+        while True:
+            try:
+                async with connect(url or default_url, additional_headers=headers() if callable(headers) else headers,
+                                   max_size=None) as ws:
+                    await ws.send(json.dumps(subscription(legs)))
+                    attempt = 0
+                    pinger = asyncio.create_task(self._heartbeat(ws, heartbeat)) if heartbeat else None
+                    try:
+                        async for raw in ws:
+                            self.handle(venue, raw, time.perf_counter())
+                    finally:
+                        if pinger:
+                            pinger.cancel()
+                if not reconnect:
+                    return
+            except (OSError, WebSocketException) as e:
+                if attempt == retries:
+                    raise
+                METRICS.inc('stream_reconnects_total', venue=venue)
+                log.warning('%s stream: %r, reconnecting (attempt %d of %d)', venue, e, attempt + 1, retries)
+                await asyncio.sleep(backoff * 2 ** attempt)
+                attempt += 1
+
+    async def run(self, duration: float = None, venues=('kalshi', 'polymarket'), urls: dict = None,
+                  headers: dict = None, reconnect: bool = True):
+        """ Stream `venues` concurrently for `duration` seconds, or until every stream ends. """
+        urls = urls or {}
+        headers = headers or {}
+        tasks = [asyncio.create_task(self.stream(venue, urls.get(venue), headers.get(venue), reconnect))
+                 for venue in venues]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=duration, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.recorder:
+                self.recorder.close()
+
+    def latency_summary(self) -> str:
+        if not self.latencies:
+            return f"{self.messages} messages"
+        latencies = np.fromiter(self.latencies, dtype=np.float64)
+        return (f"{self.messages} messages, detection latency p50 {np.percentile(latencies, 50):.3f} ms, "
+                f"p99 {np.percentile(latencies, 99):.3f} ms, max {latencies.max():.3f} ms")
+
+
+def stream_arbitrage(similarity_threshold: float = 75, min_profit: float = 2.0, max_days_left: int = 5,
+                     stake: float = 100, cache_dir: str = None, match_cache: str = None, duration: float = None,
+                     venues=('kalshi', 'polymarket'), urls: dict = None, headers: dict = None,
+                     record_stream: str = None, processes: int = 1, candidates: int = None, executor=None,
+                     **fetch_options):
+    """
+    Match both venues from one snapshot, then stream their order books and
+    report each opportunity the moment a quote opens it.
+
+    `urls` / `headers` map a venue to its websocket URL / handshake headers;
+    `record_stream` saves every message for start_stream_standin; `processes`
+    and `candidates` go to matching.match_titles. With an `executor`
+    (execution.ExecutionEngine, already started) every opportunity is also
+    submitted for execution before it is printed. Extra keyword arguments go to fetch_all_events.
+    """
+    from .arbitrage import match_outcome_pairs, report_opportunities
+    from .cache import ResponseCache
+    from .fetch import get_all_events
+
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    kalshi_events, polymarket_events = get_all_events(cache=cache, delta=cache is not None, **fetch_options)
+    if kalshi_events.is_empty() or polymarket_events.is_empty():
+        log.warning("No events found in one or both datasets.")
+        return None
+
+    pairs = match_outcome_pairs(kalshi_events, polymarket_events, similarity_threshold, max_days_left, match_cache,
+                                processes, candidates)
+    book = PairBook(pairs, stake, min_profit)
+    log.info("Streaming %d matched outcome pairs (%d Kalshi markets, %d Polymarket tokens)",
+             pairs.height, len(book.legs('kalshi')), len(book.legs('polymarket')))
+
+    if executor is not None:
+        executor.prepare([(venue, leg) for venue in ('kalshi', 'polymarket') for leg in book.legs(venue)])
+
+    def report(found):
+        if executor is not None:
+            executor.submit(found)
+        report_opportunities(opportunity_frame(found))
+
+    streamer = Streamer(book, report, record_stream)
+    try:
+        asyncio.run(streamer.run(duration, venues, urls, headers))
+    except KeyboardInterrupt:
+        pass
+    log.info('%s', streamer.latency_summary())
+    return streamer
@@ -0,0 +1,212 @@
+"""Synthetic Kalshi feeds and Polymarket events shaped like the live APIs.
+
+Used by the benchmarks and for offline runs against the stand-in server. A
+share of the Polymarket events mirror a Kalshi event under a reworded title,
+some with drifted prices, so matching and pricing have real work to do.
+"""
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+# Roughly the live universe: Kalshi's feed and Polymarket events above our liquidity/volume floor
+KALSHI_EVENTS = 1200
+POLYMARKET_EVENTS = 1500
+MIRRORED = 0.3
+DRIFT = 0.1
+
+SUBJECTS = ['the Fed', 'Bitcoin', 'Ethereum', 'the S&P 500', 'Trump', 'Harris', 'the Lakers', 'the Celtics',
+            'the Chiefs', 'the Eagles', 'Taylor Swift', 'OpenAI', 'Tesla', 'Apple', 'Nvidia', 'the Senate',
+            'the House', 'California', 'Texas', 'New York City', 'the ECB', 'China', 'Ukraine', 'SpaceX']
+VERBS = ['cut rates', 'close above', 'win', 'announce', 'pass', 'reach', 'hit', 'lose', 'sign', 'launch',
+         'report', 'exceed', 'approve', 'beat', 'drop below', 'release']
+OBJECTS = ['the election', 'the championship', 'a new model', 'the budget bill', '$100k', 'the playoffs',
+           'record highs', 'the merger', 'a ceasefire', 'the tariff deal', 'Q3 earnings', 'the primary',
+           'a shutdown', 'the final', 'Super Bowl LX', 'the debate']
+LABELS = ['Yes', 'Above 25 bps', '25 bps', '50 bps', 'No change', 'Republicans', 'Democrats', 'Over 4.5',
+          'Under 4.5', 'Before June', 'After June', 'Between 3% and 4%', 'More than 5', 'Fewer than 5']
+SYLLABLES = ['ka', 'lo', 'ver', 'min', 'dra', 'tel', 'sor', 'ben', 'qui', 'zan', 'mor', 'pet', 'rus', 'hal', 'ion']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _name(rng: random.Random) -> str:
+    return ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title()
+
+
+def _title(rng: random.Random) -> str:
+    # A made-up proper noun keeps unrelated titles from looking alike, as real ones rarely do
+    return (f"Will {rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} in {_name(rng)} "
+            f"by {rng.choice(MONTHS)} {rng.randint(1, 28)}?")
+
+
+def _reword(rng: random.Random, text: str) -> str:
+    """ The kind of drift seen between venues: casing, punctuation, a dropped leading word. """
+    if rng.random() < 0.3:
+        text = text.rstrip('?')
+    if rng.random() < 0.2 and text.startswith('Will '):
+        text = text[5:]
+    if rng.random() < 0.3:
+        text = text.lower()
+    return text
+
+
+def generate(scale: float = 1.0, seed: int = 0, now: datetime = None, min_markets: int = 1, max_markets: int = 8):
+    """
+    Return (kalshi_feed, polymarket_events) at `scale` times the live universe size.
+
+    Events close within the next 30 days and carry between `min_markets` and
+    `max_markets` outcomes. A few Polymarket markets have no groupItemTitle or
+    an empty price list, like the live API.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc).replace(microsecond=0)
+    kalshi_events = max(1, round(KALSHI_EVENTS * scale))
+    polymarket_events = max(1, round(POLYMARKET_EVENTS * scale))
+
+    kalshi_feed = []
+    for i in range(kalshi_events):
+        close = now + timedelta(minutes=rng.randint(60, 30 * 24 * 60))
+        labels = rng.sample(LABELS, rng.randint(min_markets, min(max_markets, len(LABELS))))
+        kalshi_feed.append({
+            'event_title': _title(rng),
+            'event_subtitle': f"Before {close:%b %d}",
+            'markets': [{
+                'ticker': f'KXSYN-{i}-{n}',
+                'yes_subtitle': label,
+                'yes_ask': rng.randint(1, 99),
+                'close_ts': _iso(close),
+                'open_ts': _iso(now - timedelta(days=rng.randint(1, 90))),
+            } for n, label in enumerate(labels)],
+        })
+
+    events = []
+    for i in range(polymarket_events):
+        if rng.random() < MIRRORED:
+            source = rng.choice(kalshi_feed)
+            title = _reword(rng, source['event_title'])
+            end = source['markets'][0]['close_ts']
+            # Mostly the same price as Kalshi; the occasional drift is what opens an arbitrage
+            outcomes = []
+            for market in source['markets']:
+                drift = rng.randint(-8, 8) if rng.random() < DRIFT else 0
+                outcomes.append((_reword(rng, market['yes_subtitle']),
+                                 min(0.99, max(0.01, (market['yes_ask'] + drift) / 100))))
+        else:
+            title = _title(rng)
+            end = _iso(now + timedelta(minutes=rng.randint(60, 30 * 24 * 60)))
+            outcomes = [(label, rng.randint(1, 99) / 100)
+                        for label in rng.sample(LABELS, rng.randint(min_markets, min(max_markets, len(LABELS))))]
+
+        markets = []
+        for label, price in outcomes:
+            market = {
+                'question': f'{title} {label}',
+                'outcomes': '["Yes", "No"]',
+                'outcomePrices': json.dumps([f'{price:.3f}', f'{1 - price:.3f}']),
+                'groupItemTitle': label,
+                'clobTokenIds': json.dumps([str(rng.getrandbits(254)), str(rng.getrandbits(254))]),
+            }
+            roll = rng.random()
+            if roll < 0.03:
+                del market['groupItemTitle']
+            elif roll < 0.04:
+                market['outcomePrices'] = '[]'
+            markets.append(market)
+
+        events.append({
+            'title': title,
+            'description': f'This market resolves Yes if {title.rstrip("?")}.',
+            'startDate': _iso(now - timedelta(days=rng.randint(1, 90))),
+            'endDate': end,
+            'updatedAt': _iso(now - timedelta(seconds=polymarket_events - i)),
+            'markets': markets,
+        })
+    return kalshi_feed, events
+
+
+def payloads(scale: float = 1.0, seed: int = 0, **options):
+    """ (Kalshi feed body, Polymarket /events body) as the venues would send them in a single page. """
+    kalshi_feed, polymarket_events = generate(scale, seed, **options)
+    return json.dumps({'feed': kalshi_feed, 'cursor': None}).encode(), json.dumps(polymarket_events).encode()
+
+
+def market_count(kalshi_feed, polymarket_events) -> int:
+    return sum(len(event['markets']) for event in kalshi_feed) + sum(len(event['markets']) for event in polymarket_events)
+
+
+def quote_stream(kalshi_feed, polymarket_events, messages: int = 1000, seed: int = 0, interval: float = 0.001):
+    """
+    {venue: [(seconds, raw message)]} of order book updates for the generated
+    markets, in the venues' websocket formats, replayable by start_stream_standin.
+    """
+    rng = random.Random(seed)
+    tickers = [market['ticker'] for event in kalshi_feed for market in event['markets']]
+    tokens = [token for event in polymarket_events for market in event['markets']
+              for token in json.loads(market.get('clobTokenIds') or '[]')]
+    streams = {'kalshi': [], 'polymarket': []}
+    for n in range(messages):
+        at = n * interval
+        bid = rng.randint(1, 97)
+        ask = bid + rng.randint(1, 3)
+        if rng.random() < 0.5 and tickers:
+            streams['kalshi'].append((at, json.dumps({'type': 'ticker', 'sid': 1, 'msg': {
+                'market_ticker': rng.choice(tickers), 'yes_bid': bid, 'yes_ask': ask, 'ts': int(at)}})))
+        elif rng.random() < 0.2:
+            streams['polymarket'].append((at, json.dumps([{
+                'event_type': 'book', 'asset_id': rng.choice(tokens),
+                'bids': [{'price': f'{bid / 100:.2f}', 'size': '100'}, {'price': f'{(bid - 1) / 100:.2f}', 'size': '50'}],
+                'asks': [{'price': f'{ask / 100:.2f}', 'size': '100'}, {'price': f'{(ask + 1) / 100:.2f}', 'size': '50'}],
+            }])))
+        else:
+            streams['polymarket'].append((at, json.dumps({'event_type': 'price_change', 'price_changes': [{
+                'asset_id': rng.choice(tokens), 'price': f'{ask / 100:.2f}', 'size': '10', 'side': 'SELL',
+                'best_bid': f'{bid / 100:.2f}', 'best_ask': f'{ask / 100:.2f}'}]})))
+    return streams
+
+
+def order_books(kalshi_feed, polymarket_events, levels: int = 5, seed: int = 0):
+    """
+    ({ticker: Kalshi book}, {token: Polymarket book}) for the generated markets,
+    in the shape start_standin serves them. The best asks match the snapshot
+    prices; each deeper level is a cent or two worse.
+    """
+    rng = random.Random(seed)
+
+    def ladder(best, step):
+        prices, price = [], best
+        for _ in range(levels):
+            if not 0 < price < 100:
+                break
+            prices.append(price)
+            price += step * rng.randint(1, 2)
+        return [(price, rng.choice([10, 25, 50, 100, 250])) for price in prices]
+
+    kalshi_books = {}
+    for event in kalshi_feed:
+        for market in event['markets']:
+            # Kalshi lists bids only, ascending; buying YES at yes_ask hits the best NO bid
+            no_bids = ladder(100 - market['yes_ask'], -1)
+            yes_bids = ladder(market['yes_ask'] - rng.randint(1, 2), -1)
+            kalshi_books[market['ticker']] = {'yes': [list(level) for level in reversed(yes_bids)],
+                                              'no': [list(level) for level in reversed(no_bids)]}
+
+    polymarket_books = {}
+    for event in polymarket_events:
+        for market in event['markets']:
+            prices = json.loads(market['outcomePrices'])
+            tokens = json.loads(market.get('clobTokenIds') or '[]')
+            if not prices or len(tokens) != 2:
+                continue
+            yes = round(float(prices[0]) * 100)
+            for token, best in zip(tokens, (yes, 100 - yes)):
+                asks = ladder(best, 1)
+                bids = ladder(best - rng.randint(1, 2), -1)
+                polymarket_books[token] = {
+                    'bids': [{'price': f'{price / 100:.2f}', 'size': str(size)} for price, size in reversed(bids)],
+                    'asks': [{'price': f'{price / 100:.2f}', 'size': str(size)} for price, size in reversed(asks)],
+                }
+    return kalshi_books, polymarket_books
@@ -0,0 +1,142 @@
+"""Venue adapters: one description per venue of how to fetch and read it.
+
+Every venue already follows the same contract (pages of normalized event
+frames with `title`, `subtitle`, `outcomes`, `startDate` and `endDate`, see
+ingest.py); an adapter adds what differs, i.e. where the pages come from, the
+outcome field holding the label and the ids its order books go by. Adding a
+venue means writing its page generator and normalizer and registering it here.
+
+fetch_venues pulls any set of registered venues concurrently over one pooled
+client and returns their frames by name.
+"""
+import asyncio
+from dataclasses import dataclass
+
+import polars as pl
+
+from .fetch import (KALSHI_URL, POLYMARKET_URL, kalshi_pages, make_client, merge_frames, merge_streams,
+                    polymarket_pages)
+
+
+@dataclass(frozen=True)
+class Venue:
+    """
+    How to fetch and read one venue.
+
+    `pages(client, url, cache)` is an async generator of fetch.Page; `label`,
+    `yes_id` and `no_id` name fields of the outcome struct (the ids may be the
+    same field, e.g. a Kalshi ticker trades both sides). `replay_options` go
+    to `pages` when replaying a capture, which only holds the pages the
+    recording asked for.
+    """
+    name: str
+    url: str
+    pages: object
+    label: str
+    yes_id: str = None
+    no_id: str = None
+    merge_keys: tuple = ('title',)
+    replay_options: tuple = ()
+
+
+OUTCOME_SCHEMA = {
+    'venue': pl.Utf8,
+    'event': pl.UInt32,
+    'title': pl.Utf8,
+    'endDate': pl.Datetime('us'),
+    'label': pl.Utf8,
+    'yes_ask': pl.Float64,
+    'no_ask': pl.Float64,
+    'yes_id': pl.Utf8,
+    'no_id': pl.Utf8,
+}
+
+VENUES = {}
+
+
+def register_venue(venue: Venue):
+    """ Make `venue` available to fetch_venues under its name, replacing any venue of that name. """
+    VENUES[venue.name] = venue
+    return venue
+
+
+register_venue(Venue('kalshi', KALSHI_URL, kalshi_pages, 'yes_subtitle', 'ticker', 'ticker', ('title', 'subtitle')))
+register_venue(Venue('polymarket', POLYMARKET_URL, polymarket_pages, 'option', 'yes_token', 'no_token',
+                     replay_options=(('concurrency', 1),)))
+
+
+def get_venue(name: str) -> Venue:
+    try:
+        return VENUES[name]
+    except KeyError:
+        raise ValueError(f"Unknown venue {name!r}; registered venues: {', '.join(sorted(VENUES))}") from None
+
+
+def venue_outcomes(events: pl.DataFrame, venue: Venue) -> pl.DataFrame:
+    """
+    One row per outcome of a venue frame, in the same shape for every venue:
+    venue, event (row in `events`), title, endDate, label, yes_ask and no_ask in
+    cents, and the yes / no order book ids (null where the venue has none).
+    """
+    fields = {field.name for field in events.schema['outcomes'].inner.fields} if 'outcomes' in events.columns else set()
+
+    def field(name):
+        return pl.col(name).cast(pl.Utf8) if name in fields else pl.lit(None, dtype=pl.Utf8)
+
+    if events.is_empty():
+        return pl.DataFrame(schema=OUTCOME_SCHEMA)
+    return (
+        events
+        .select(pl.int_range(pl.len(), dtype=pl.UInt32).alias('event'), 'title', 'endDate', 'outcomes')
+        .explode('outcomes', empty_as_null=True)
+        .drop_nulls('outcomes')
+        .unnest('outcomes')
+        .select(
+            pl.lit(venue.name).alias('venue'),
+            'event',
+            'title',
+            'endDate',
+            pl.col(venue.label).alias('label'),
+            pl.col('yes_ask').cast(pl.Float64),
+            (100 - pl.col('yes_ask').cast(pl.Float64)).alias('no_ask'),
+            field(venue.yes_id).alias('yes_id'),
+            field(venue.no_id).alias('no_id'),
+        )
+        .filter(pl.col('label').is_not_null() & (pl.col('label') != ''))
+        .cast(OUTCOME_SCHEMA)
+    )
+
+
+async def fetch_venues(venues=('kalshi', 'polymarket'), urls: dict = None, client=None, cache=None,
+                       record: str = None, replay: str = None) -> dict:
+    """
+    Fetch and normalize every named venue concurrently, returning {name: events frame}.
+
+    `urls` overrides a venue's base URL (e.g. a stand-in); `cache`, `record`
+    and `replay` work as in fetch.fetch_all_events.
+    """
+    venues = [get_venue(name) for name in venues]
+    urls = urls or {}
+
+    async def tagged(venue):
+        options = dict(venue.replay_options) if replay else {}
+        async for page in venue.pages(client, urls.get(venue.name) or venue.url, cache, **options):
+            yield venue.name, page
+
+    own_client = client is None
+    client = client or make_client(record=record, replay=replay)
+    pages = {venue.name: [] for venue in venues}
+    try:
+        async for name, page in merge_streams(*[tagged(venue) for venue in venues]):
+            pages[name].append((page.offset, page.frame))
+    finally:
+        if own_client:
+            await client.aclose()
+    return {venue.name: merge_frames([frame for _, frame in sorted(pages[venue.name], key=lambda page: page[0])],
+                                     list(venue.merge_keys))
+            for venue in venues}
+
+
+def get_venues(venues=('kalshi', 'polymarket'), **options) -> dict:
+    """ Blocking wrapper around fetch_venues. """
+    return asyncio.run(fetch_venues(venues, **options))
@@ -0,0 +1,53 @@
+"""Shared fixtures: a small synthetic universe served by the local stand-in venue."""
+import json
+import socket
+from datetime import datetime, timezone
+
+import pytest
+
+from prediction_markets import fetch, ingest, synthetic
+from prediction_markets.standin import start_standin
+
+# About 60 Kalshi and 75 Polymarket events, a few hundred outcomes each side
+SCALE = 0.05
+
+
+@pytest.fixture(scope='session')
+def now():
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+@pytest.fixture(scope='session')
+def universe(now):
+    """ (kalshi_feed, polymarket_events) as the venues' APIs return them. """
+    return synthetic.generate(SCALE, seed=1, now=now)
+
+
+@pytest.fixture(scope='session')
+def frames(universe):
+    """ The universe as normalized (kalshi_events, polymarket_events) frames, as fetch_all_events returns them. """
+    kalshi_feed, polymarket_events = universe
+    kalshi = ingest.kalshi_frame(json.dumps({'feed': kalshi_feed}).encode())[0]
+    polymarket = ingest.polymarket_frame(json.dumps(polymarket_events).encode())[0]
+    return (fetch.merge_frames([kalshi], fetch.MERGE_KEYS['kalshi']),
+            fetch.merge_frames([polymarket], fetch.MERGE_KEYS['polymarket']))
+
+
+@pytest.fixture
+def standin(universe):
+    """ Base URL of a stand-in serving both venues' events and order books. """
+    kalshi_feed, polymarket_events = universe
+    kalshi_books, polymarket_books = synthetic.order_books(kalshi_feed, polymarket_events)
+    server, url = start_standin(kalshi_feed, polymarket_events, kalshi_books=kalshi_books,
+                                polymarket_books=polymarket_books)
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture
+def unreachable():
+    """ A base URL nothing listens on, so every request to it fails to connect. """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
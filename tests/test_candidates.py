@@ -0,0 +1,80 @@
+import pytest
+
+from prediction_markets import candidates
+from prediction_markets.candidates import TitleIndex, match_candidates
+from prediction_markets.matching import match_titles, normalize_titles
+
+TITLES = {
+    'fed': ('Will the Fed cut rates in March?', 'Decision on Mar 19'),
+    'nba': ('Lakers vs Celtics', 'Game 7'),
+    'btc': ('Bitcoin above 100k by June?', ''),
+    'sb': ('Who wins the Super Bowl?', 'Super Bowl LX'),
+}
+
+
+def _contents(index):
+    """ Features of every key, postings and counts by feature string, whatever order they were interned in. """
+    names = {i: feature for feature, i in index.ids.items()}
+    features = {key: {names[i] for i in ids.tolist()} for key, ids in index.features.items()}
+    postings = {names[i]: keys for i, keys in index.postings.items() if keys}
+    counts = {names[i]: df for i, df in enumerate(index.df) if df}
+    return features, postings, counts
+
+
+def test_incremental_updates_match_a_rebuilt_index():
+    index = TitleIndex((key, *item) for key, item in TITLES.items())
+    index.remove('nba')
+    index.remove('unknown')
+    index.add('fed', 'Will the Fed hold rates in March?', 'Decision on Mar 19')
+    index.add('eth', 'Ethereum above 5k by June?', 'Crypto')
+    current = {key: item for key, item in TITLES.items() if key != 'nba'}
+    current['fed'] = ('Will the Fed hold rates in March?', 'Decision on Mar 19')
+    current['eth'] = ('Ethereum above 5k by June?', 'Crypto')
+
+    rebuilt = TitleIndex((key, *item) for key, item in current.items())
+    assert _contents(index) == _contents(rebuilt)
+    # Equal scores come back in no particular order
+    for title, subtitle in current.values():
+        assert dict(index.search(title, 10, subtitle)) == pytest.approx(dict(rebuilt.search(title, 10, subtitle)))
+
+
+def test_sync_only_indexes_new_keys(monkeypatch):
+    index = TitleIndex()
+    index.sync(TITLES)
+    added = []
+    add = TitleIndex.add
+    monkeypatch.setattr(TitleIndex, 'add', lambda self, key, *args: added.append(key) or add(self, key, *args))
+    index.sync({**{key: TITLES[key] for key in ('fed', 'btc')}, 'eth': ('Ethereum above 5k by June?', '')})
+    assert added == ['eth']
+    assert set(index.features) == {'fed', 'btc', 'eth'}
+
+
+def test_subtitles_tell_look_alike_titles_apart():
+    index = TitleIndex([('a', 'Game winner', 'Lakers at Celtics'), ('b', 'Game winner', 'Knicks at Heat')])
+    assert index.search('Game winner', 1, 'Celtics vs Lakers')[0][0] == 'a'
+    assert index.search('Game winner', 1, 'Heat vs Knicks')[0][0] == 'b'
+
+
+def test_match_candidates_reuses_the_resident_index(frames, monkeypatch):
+    kalshi_titles, poly_titles = frames[0]['title'].to_list(), frames[1]['title'].to_list()
+    kalshi, poly = normalize_titles(kalshi_titles), normalize_titles(poly_titles)
+    monkeypatch.setattr(candidates, 'RESIDENT', TitleIndex())
+    first = match_candidates(kalshi, poly, 80)
+    indexed = []
+    add = TitleIndex.add
+    monkeypatch.setattr(TitleIndex, 'add', lambda self, key, *args: indexed.append(key) or add(self, key, *args))
+    second = match_candidates(kalshi, poly[1:] + ['a title nobody else has'], 80)
+    assert indexed == [('a title nobody else has', '')]
+    assert len(candidates.RESIDENT) == len(set(poly[1:])) + 1
+    # Same pairs as the first call, minus those of the dropped title and shifted by one position
+    assert [(k, p - 1) for k, p in zip(*first[:2]) if p > 0] == list(zip(*second[:2]))
+
+
+def test_candidates_find_every_near_identical_pair(frames):
+    kalshi_titles, poly_titles = frames[0]['title'].to_list(), frames[1]['title'].to_list()
+    subtitles = (frames[0]['subtitle'].to_list(), frames[1]['subtitle'].to_list())
+    full = set(zip(*match_titles(kalshi_titles, poly_titles, 95)[:2]))
+    found = set(zip(*match_titles(kalshi_titles, poly_titles, 95, candidates=10, subtitles=subtitles,
+                                  index=TitleIndex())[:2]))
+    assert full
+    assert found == full
@@ -0,0 +1,50 @@
+import polars as pl
+
+from prediction_markets.arbitrage import find_arbitrage
+from prediction_markets.canonical import CanonicalIndex, find_venue_arbitrage
+
+OPTIONS = {'similarity_threshold': 80, 'min_profit': 1.0, 'max_days_left': 30}
+
+
+def _hedges(url, **options):
+    return find_venue_arbitrage(urls={'kalshi': url, 'polymarket': url}, **OPTIONS, **options)[0]
+
+
+def _pairs(hedges: pl.DataFrame) -> set:
+    """ (kalshi title, polymarket title, kalshi outcome, polymarket outcome) of each hedge. """
+    found = set()
+    for row in hedges.iter_rows(named=True):
+        if row['yes_venue'] == 'kalshi':
+            found.add((row['yes_title'], row['no_title'], row['yes_outcome'], row['no_outcome']))
+        else:
+            found.add((row['no_title'], row['yes_title'], row['no_outcome'], row['yes_outcome']))
+    return found
+
+
+def test_canonical_index_finds_strong_pairwise_matches(standin, capsys):
+    pairwise = find_arbitrage(**OPTIONS, kalshi_url=standin, polymarket_url=standin)
+    strong = {
+        row for row in pairwise.filter(pl.col('event_similarity') >= 95)
+        .select('kalshi_title', 'poly_title', 'kalshi_outcome', 'poly_outcome').iter_rows()
+        if row[2].lower().strip() == row[3].lower().strip()
+    }
+    assert strong
+    assert strong <= _pairs(_hedges(standin))
+
+
+def test_record_replay_and_cache_give_the_same_hedges(standin, tmp_path, capsys):
+    recorded = _hedges(standin, record=str(tmp_path / 'capture'))
+    replayed = _hedges(standin, replay=str(tmp_path / 'capture'))
+    _hedges(standin, cache_dir=str(tmp_path / 'cache'))
+    cached = _hedges(standin, cache_dir=str(tmp_path / 'cache'))
+    assert recorded.height > 0
+    for other in (replayed, cached):
+        assert other.drop('time_remaining').equals(recorded.drop('time_remaining'))
+
+
+def test_same_venue_near_duplicates_share_one_event():
+    index = CanonicalIndex(80)
+    ids = index.assign(['Will the Fed cut rates in March?', 'Lakers vs Celtics', 'Will the Fed cut rates in March'])
+    assert ids[0] == ids[2] != ids[1]
+    assert len(index) == 2
+    assert index.assign(['Fed cut rates in March?', 'Who wins the Super Bowl?']).tolist() == [ids[0], 2]
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+
+from prediction_markets.execution import ExecutionEngine, KalshiGateway, Order, PolymarketGateway, default_gateways
+from prediction_markets.metrics import METRICS
+from prediction_markets.standin import start_exchange_standin
+
+OPPORTUNITY = {'direction': 'kalshi_yes', 'k_ticker': 'KX-1', 'p_no_token': 'token-no', 'p_yes_token': 'token-yes',
+               'yes_ask': 40.2, 'no_ask': 55.6, 'yes_payout': 10, 'no_payout': 10}
+
+
+@pytest.fixture
+def exchange():
+    server, url = start_exchange_standin()
+    yield url
+    server.shutdown()
+
+
+@pytest.mark.parametrize('action, price, expected', [
+    ('buy', 42.3, '0.43'), ('buy', 42.0, '0.42'), ('sell', 42.7, '0.42'), ('buy', 0.2, '0.01'), ('sell', 99.9, '0.99'),
+])
+def test_polymarket_limits_round_against_us(action, price, expected):
+    order = Order('polymarket', 'token', 'yes', action, price, 3, 'id')
+    assert json.loads(PolymarketGateway('http://exchange').payload(order))['order']['price'] == expected
+
+
+def test_kalshi_limits_round_against_us():
+    body = json.loads(KalshiGateway('http://exchange').payload(Order('kalshi', 'KX', 'yes', 'buy', 42.3, 3, 'id')))
+    assert body['yes_price'] == 43
+
+
+def _run(engine: ExecutionEngine, opportunity: dict):
+    async def main():
+        try:
+            return await engine.execute(opportunity)
+        finally:
+            for client in engine.clients.values():
+                await client.aclose()
+    return asyncio.run(main())
+
+
+def test_both_legs_fill_on_the_exchange(exchange):
+    engine = ExecutionEngine(default_gateways(exchange))
+    engine.clients = {venue: httpx.AsyncClient() for venue in engine.gateways}
+    execution = _run(engine, OPPORTUNITY)
+    assert execution.status == 'filled'
+    assert execution.hedged == 10
+    assert not execution.unwinds
+
+
+def test_unreadable_reply_rejects_the_leg_and_unwinds_the_other(exchange):
+    engine = ExecutionEngine(default_gateways(exchange))
+    garbled = httpx.MockTransport(lambda request: httpx.Response(200, content=b'<html>upstream error</html>'))
+    engine.clients = {'kalshi': httpx.AsyncClient(), 'polymarket': httpx.AsyncClient(transport=garbled)}
+    execution = _run(engine, OPPORTUNITY)
+    polymarket_leg = next(fill for fill in execution.legs if fill.order.venue == 'polymarket')
+    assert polymarket_leg.error and polymarket_leg.filled == 0
+    assert execution.status == 'missed'
+    assert [(fill.order.venue, fill.order.action) for fill in execution.unwinds] == [('kalshi', 'sell')]
+
+
+def test_submit_before_start_raises():
+    engine = ExecutionEngine(default_gateways('http://exchange'))
+    with pytest.raises(RuntimeError, match='engine not started'):
+        engine.submit([OPPORTUNITY])
+
+
+def test_a_failed_execution_is_logged_and_counted(exchange, monkeypatch, caplog):
+    async def broken(opportunity, detected_ns=None):
+        raise KeyError('k_ticker')
+
+    METRICS.reset()
+    engine = ExecutionEngine(default_gateways(exchange))
+    monkeypatch.setattr(engine, 'execute', broken)
+    with caplog.at_level(logging.ERROR, logger='prediction_markets'), engine:
+        engine.submit([OPPORTUNITY, OPPORTUNITY])
+    counters = {c['name']: c['value'] for c in METRICS.snapshot()['counters']}
+    assert counters['execution_failures_total'] == 2
+    assert caplog.text.count("Execution failed: KeyError('k_ticker')") == 2
@@ -0,0 +1,108 @@
+import httpx
+
+from prediction_markets.cache import ResponseCache
+from prediction_markets.fetch import _retry_delay, get_all_events, get_order_books
+from prediction_markets.ingest import latest_iso
+from prediction_markets.standin import start_standin
+
+
+def kalshi_feed(n):
+    return [{'event_title': f'Kalshi event {i}', 'event_subtitle': '', 'markets': [
+        {'yes_subtitle': 'Yes', 'yes_ask': 40 + i % 20, 'close_ts': '2030-01-01T00:00:00Z',
+         'open_ts': '2024-01-01T00:00:00Z'}]} for i in range(n)]
+
+
+def polymarket_events(n):
+    return [{'title': f'Polymarket event {i}', 'endDate': '2030-01-01T00:00:00Z', 'markets': [
+        {'groupItemTitle': 'Yes', 'outcomePrices': f'["0.{40 + i % 20}", "0.{60 - i % 20}"]'}]} for i in range(n)]
+
+
+def test_every_page_arrives_through_rate_limits():
+    server, url = start_standin(kalshi_feed(3), polymarket_events(11), failures=3)
+    try:
+        kalshi, polymarket = get_all_events(kalshi_url=url, polymarket_url=url, page_size=2, concurrency=3)
+    finally:
+        server.shutdown()
+    assert sorted(kalshi['title']) == sorted(f'Kalshi event {i}' for i in range(3))
+    assert sorted(polymarket['title']) == sorted(f'Polymarket event {i}' for i in range(11))
+    # One Kalshi page, six Polymarket pages and the three rate-limited attempts
+    assert len(server.requests) >= 1 + 6 + 3
+
+
+def test_record_then_replay_gives_the_same_frames(standin, frames, tmp_path):
+    urls = {'kalshi_url': standin, 'polymarket_url': standin}
+    recorded = get_all_events(record=str(tmp_path), **urls)
+    replayed = get_all_events(replay=str(tmp_path), **urls)
+    for a, b, expected in zip(recorded, replayed, frames):
+        assert a.height > 0
+        assert a.equals(b)
+        assert a.sort('title', 'endDate').equals(expected.sort('title', 'endDate'))
+
+
+def _sorted(frames):
+    return tuple(frame.sort('title') for frame in frames)
+
+
+def test_cached_polls_match_a_fresh_fetch(tmp_path):
+    server, url = start_standin(kalshi_feed(3), polymarket_events(11))
+    options = {'kalshi_url': url, 'polymarket_url': url, 'page_size': 4}
+    try:
+        fresh = _sorted(get_all_events(**options))
+        cache = ResponseCache(str(tmp_path))
+        for _ in range(2):
+            assert all(a.equals(b) for a, b in zip(_sorted(get_all_events(cache=cache, **options)), fresh))
+
+        # A 304 whose body went missing or corrupt is asked again unconditionally
+        bodies = sorted(tmp_path.glob('*.body.gz'))
+        bodies[0].unlink()
+        bodies[1].write_bytes(b'not gzip')
+        assert all(a.equals(b) for a, b in zip(_sorted(get_all_events(cache=cache, **options)), fresh))
+        assert all(cache.read_body(path.name.split('.')[0]) is not None for path in bodies[:2])
+    finally:
+        server.shutdown()
+
+
+def test_delta_polls_match_a_full_fetch(tmp_path):
+    events = polymarket_events(11)
+    for i, event in enumerate(events):
+        event['updatedAt'] = f'2026-01-01T00:00:{i:02d}Z'
+    server, url = start_standin(kalshi_feed(3), events)
+    options = {'kalshi_url': url, 'polymarket_url': url, 'page_size': 4}
+    cache = ResponseCache(str(tmp_path))
+    try:
+        for _ in range(2):
+            get_all_events(cache=cache, delta=True, **options)
+        events[3]['updatedAt'] = '2026-01-01T00:01:00Z'
+        events[3]['markets'][0]['groupItemTitle'] = 'No'
+        get_all_events(cache=cache, delta=True, **options)
+        # Later within the watermark's second, though it sorts first as text
+        events[4]['updatedAt'] = '2026-01-01T00:01:00.5Z'
+        events[4]['markets'][0]['groupItemTitle'] = 'No'
+        _, polymarket = get_all_events(cache=cache, delta=True, **options)
+        _, expected = get_all_events(**options)
+    finally:
+        server.shutdown()
+    assert polymarket.select('title', 'outcomes').sort('title').equals(expected.select('title', 'outcomes').sort('title'))
+    relabelled = [row['title'] for row in polymarket.iter_rows(named=True) if row['outcomes'][0]['option'] == 'No']
+    assert sorted(relabelled) == ['Polymarket event 3', 'Polymarket event 4']
+
+
+def test_latest_iso_orders_fractional_seconds():
+    assert latest_iso(['2026-01-01T00:00:40Z', '2026-01-01T00:00:40.5Z', 'bad', '']) == '2026-01-01T00:00:40.5Z'
+    assert latest_iso([]) == ''
+
+
+def test_retry_after_is_capped_at_the_longest_backoff():
+    rate_limited = httpx.Response(429, headers={'Retry-After': '3600'})
+    assert _retry_delay(rate_limited, 0, 0.5, 4) == 0.5 * 2 ** 4
+    assert _retry_delay(httpx.Response(429, headers={'Retry-After': '2'}), 0, 0.5, 4) == 2
+    assert 0 <= _retry_delay(httpx.Response(503), 1, 0.5, 4) <= 1
+
+
+def test_order_books_from_an_unreachable_host_map_to_none(standin, unreachable, universe):
+    kalshi_feed, _ = universe
+    ticker = kalshi_feed[0]['markets'][0]['ticker']
+    kalshi_books, polymarket_books = get_order_books([ticker], ['some-token'], kalshi_url=standin,
+                                                     clob_url=unreachable)
+    assert kalshi_books[ticker] is not None
+    assert polymarket_books == {'some-token': None}
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+import pytest
+
+from prediction_markets import ingest, synthetic
+from prediction_markets.history import SnapshotStore, backtest, scan_snapshots, snapshot_times
+from prediction_markets.matching import match_titles
+from prediction_markets.pricing import join_outcome_pairs, price_opportunities
+
+START = datetime(2026, 10, 17, 23, 0)
+POLLS = 12
+RUN_KEYS = ['kalshi_title', 'poly_title', 'kalshi_outcome', 'poly_outcome', 'direction']
+
+
+def _jitter(frame: pl.DataFrame, rng) -> pl.DataFrame:
+    """ `frame` with a fifth of its outcomes' YES asks moved by up to two cents. """
+    outcomes = frame.with_row_index('row').explode('outcomes', empty_as_null=True).unnest('outcomes')
+    moves = rng.integers(-2, 3, outcomes.height) * (rng.random(outcomes.height) < 0.2)
+    outcomes = outcomes.with_columns((pl.col('yes_ask') + moves).clip(1, 99).cast(outcomes.schema['yes_ask']))
+    outcomes = outcomes.with_columns((100 - pl.col('yes_ask')).alias('no_ask'))
+    fields = [field.name for field in frame.schema['outcomes'].inner.fields]
+    return (
+        outcomes
+        .group_by('row', maintain_order=True)
+        .agg(pl.col('title', 'subtitle', 'startDate', 'endDate').first(), pl.struct(fields).alias('outcomes'))
+        .select(frame.columns)
+        .cast(frame.schema)
+    )
+
+
+@pytest.fixture(scope='module')
+def history(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('history'))
+    kalshi_body, polymarket_body = synthetic.payloads(0.2, 0, now=START)
+    kalshi, polymarket = ingest.kalshi_frame(kalshi_body)[0], ingest.polymarket_frame(polymarket_body)[0]
+    rng = np.random.default_rng(0)
+    store = SnapshotStore(directory)
+    for poll in range(POLLS):
+        if poll:
+            polymarket = _jitter(polymarket, rng)
+        store.append({'kalshi': kalshi, 'polymarket': polymarket}, START + timedelta(minutes=poll))
+    return directory
+
+
+def test_every_poll_is_stored(history):
+    assert snapshot_times(history) == [START + timedelta(minutes=poll) for poll in range(POLLS)]
+
+
+def test_parallel_backtest_matches_serial(history):
+    options = {'similarity_threshold': (75, 85), 'min_profit': (0.5, 2), 'max_days_left': (5, 30)}
+    _, serial = backtest(history, processes=1, **options)
+    _, parallel = backtest(history, processes=3, **options)
+    assert serial.height > 0
+    assert parallel.sort(parallel.columns).equals(serial.sort(serial.columns))
+
+
+def test_replayed_opportunities_match_a_fresh_scan(history):
+    at = START + timedelta(minutes=POLLS // 2)
+    kalshi, polymarket = [
+        scan_snapshots(history, venue, at, at).filter(pl.col('endDate') >= pl.col('snapshot')).collect().drop('snapshot')
+        for venue in ('kalshi', 'polymarket')
+    ]
+    pairs = join_outcome_pairs(kalshi, polymarket, *match_titles(kalshi['title'].to_list(),
+                                                                 polymarket['title'].to_list(), 75),
+                               75, max_days_left=10 ** 9)
+    fresh = (
+        price_opportunities(pairs, 100, 0.5)
+        .filter((pl.col('end_date') - at).dt.total_days() <= 5)
+        .select(*RUN_KEYS)
+        .with_columns(pl.col('direction').cast(pl.Utf8))
+    )
+
+    _, runs = backtest(history, processes=1, similarity_threshold=75, min_profit=0.5, max_days_left=5)
+    replayed = runs.filter((pl.col('first_seen') <= at) & (pl.col('last_seen') >= at)).select(*RUN_KEYS)
+    assert fresh.height > 0
+    assert set(replayed.iter_rows()) == set(fresh.iter_rows())
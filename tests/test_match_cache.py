@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+
+from prediction_markets import match_cache
+from prediction_markets.match_cache import MatchStore
+from prediction_markets.matching import match_titles
+
+WORDS = 'will the fed cut rates eagles chiefs win super bowl election senate house lakers celtics bitcoin'.split()
+
+
+def _titles(rng, n):
+    return [' '.join(rng.choices(WORDS, k=5)) for _ in range(n)]
+
+
+def _assert_same(store, kalshi, poly, threshold=60):
+    expected = match_titles(kalshi, poly, threshold)
+    for a, b in zip(store.match_titles(kalshi, poly, threshold), expected):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_store_matches_a_direct_scan_as_the_universe_changes(tmp_path):
+    rng = random.Random(3)
+    kalshi, poly = _titles(rng, 120), _titles(rng, 80)
+    for sweep_interval in (3600, 0):
+        store = MatchStore(str(tmp_path / f'{sweep_interval}.sqlite'), sweep_interval=sweep_interval)
+        for _ in range(6):
+            # Titles drop out, come back and get listed for the first time
+            _assert_same(store, rng.sample(kalshi, 90) + _titles(rng, 5), rng.sample(poly, 60) + _titles(rng, 5))
+        _assert_same(store, kalshi, poly)
+
+
+def test_unchanged_and_reopened_universes_score_nothing(tmp_path, monkeypatch):
+    rng = random.Random(4)
+    kalshi, poly = _titles(rng, 50), _titles(rng, 40)
+    path = str(tmp_path / 'matches.sqlite')
+    MatchStore(path).match_titles(kalshi, poly, 60)
+
+    scored = []
+    monkeypatch.setattr(match_cache, 'match_titles', lambda k, p, *args, **kwargs: (
+        scored.append(len(k) * len(p)) or match_titles(k, p, *args, **kwargs)))
+    store = MatchStore(path)
+    # Half of each side drops out between sweeps; nothing is forgotten or re-scored when it returns
+    for k, p in ((kalshi, poly), (kalshi[:25], poly[:20]), (kalshi, poly)):
+        _assert_same(store, k, p)
+    assert sum(scored) == 0
+
+    _assert_same(store, kalshi + ['bitcoin above 100k'], poly)
+    assert sum(scored) == len(poly)
+
+
+def test_candidate_matching_through_the_store_finds_near_identical_pairs(tmp_path, frames):
+    kalshi, poly = frames[0]['title'].to_list(), frames[1]['title'].to_list()
+    expected = set(zip(*match_titles(kalshi, poly, 95)[:2]))
+    store = MatchStore(str(tmp_path / 'matches.sqlite'))
+    # The Polymarket half listed second is scored by the pass that searches the resident Kalshi index
+    half = len(poly) // 2
+    store.match_titles(kalshi, poly[:half], 95, candidates=10)
+    found = set(zip(*store.match_titles(kalshi, poly, 95, candidates=10)[:2]))
+    assert expected
+    assert found == expected
+    assert len(store._indexes['kalshi']) == len(set(kalshi))
+
+
+def test_sweeps_drop_unlisted_titles_and_expired_outcomes(tmp_path):
+    rng = random.Random(5)
+    kalshi, poly = _titles(rng, 30), _titles(rng, 30)
+    store = MatchStore(str(tmp_path / 'matches.sqlite'), sweep_interval=0)
+    store.match_titles(kalshi, poly, 60)
+    store.match_titles(kalshi[:10], poly, 60)
+    assert len(store._registry('kalshi', 60.0)) == 10
+    assert store.db.execute('SELECT COUNT(*) FROM titles WHERE venue = ?', ('kalshi',)).fetchone()[0] == 10
+
+    store.score_pairs(['Yes', 'No'], ['yes', 'Nope'])
+    assert store._outcomes.height == 2
+    store.evict_expired(now=store._outcomes['scored_at'].max() + store.outcome_max_age + 1)
+    assert store._outcomes.height == 0
+    assert store.db.execute('SELECT COUNT(*) FROM outcome_scores').fetchone()[0] == 0
@@ -0,0 +1,86 @@
+import numpy as np
+import polars as pl
+from rapidfuzz import fuzz
+
+from prediction_markets.arbitrage import match_outcome_pairs
+from prediction_markets.matching import match_titles, normalize_titles, score_pairs
+from prediction_markets.plan import closing_within, match_near
+from prediction_markets.pricing import join_outcome_pairs, price_opportunities
+from prediction_markets.sharding import read_titles, share_titles
+
+KALSHI = ['Will the Fed cut rates in March?', 'Lakers vs Celtics', '  BITCOIN above 100k by June? ', None]
+POLY = ['Fed cuts rates in March?', 'Celtics vs Lakers', 'Bitcoin above $100k by June?', 'Who wins the Super Bowl?']
+
+
+def test_match_titles_keeps_every_pair_at_or_above_the_threshold():
+    kalshi, poly = normalize_titles(KALSHI), normalize_titles(POLY)
+    expected = [(i, j, fuzz.ratio(k, p)) for i, k in enumerate(kalshi) for j, p in enumerate(poly)
+                if fuzz.ratio(k, p) >= 60]
+    k_idx, p_idx, scores = match_titles(KALSHI, POLY, 60)
+    assert expected
+    assert list(zip(k_idx.tolist(), p_idx.tolist())) == [(i, j) for i, j, _ in expected]
+    np.testing.assert_allclose(scores, [score for _, _, score in expected], rtol=1e-6)
+
+
+def test_empty_sides_match_nothing():
+    for k_idx, p_idx, scores in (match_titles([], POLY), match_titles(KALSHI, [])):
+        assert len(k_idx) == len(p_idx) == len(scores) == 0
+    assert len(score_pairs([], [])) == 0
+
+
+def test_score_pairs_scores_each_pair_in_place():
+    scores = score_pairs(KALSHI, POLY)
+    expected = [fuzz.ratio(k, p) for k, p in zip(normalize_titles(KALSHI), normalize_titles(POLY))]
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+
+
+def test_sharded_matching_matches_a_single_process(frames):
+    kalshi_titles, poly_titles = frames[0]['title'].to_list(), frames[1]['title'].to_list()
+    single = match_titles(kalshi_titles, poly_titles, 80)
+    sharded = match_titles(kalshi_titles, poly_titles, 80, processes=2, min_cells=0)
+    assert len(single[0]) > 0
+    for a, b in zip(single, sharded):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_shared_titles_round_trip():
+    titles = ['fed cuts rates', '', 'é ü 🙂', 'x' * 1000]
+    block = share_titles(titles)
+    try:
+        assert read_titles(block, len(titles)) == titles
+    finally:
+        block.close()
+        block.unlink()
+
+
+def test_pruned_matching_matches_all_pairs(frames):
+    kalshi, polymarket = frames
+    kalshi_titles, poly_titles = kalshi['title'].to_list(), polymarket['title'].to_list()
+    for max_days_left in (2, 10, 30):
+        all_pairs = join_outcome_pairs(kalshi, polymarket, *match_titles(kalshi_titles, poly_titles, 70), 70,
+                                       max_days_left)
+        expected = price_opportunities(all_pairs, 100, 0.5)
+        pruned = price_opportunities(match_outcome_pairs(kalshi, polymarket, 70, max_days_left, min_profit=0.5),
+                                     100, 0.5)
+        columns = [name for name in expected.columns if name != 'time_remaining']
+        assert expected.height > 0
+        assert pruned.select(columns).sort(pl.all()).equals(expected.select(columns).sort(pl.all()))
+
+
+def test_pruned_candidate_matching_keeps_the_window(frames):
+    kalshi, polymarket = frames
+    k_idx, p_idx, _ = match_titles(kalshi['title'].to_list(), polymarket['title'].to_list(), 95)
+    near = closing_within(kalshi, 10)[k_idx] | closing_within(polymarket, 10)[p_idx]
+    expected = set(zip(k_idx[near].tolist(), p_idx[near].tolist()))
+    found = set(zip(*[a.tolist() for a in match_near(kalshi, polymarket, 95, 10, candidates=10)[:2]]))
+    assert expected
+    assert found == expected
+
+
+def test_match_store_gives_the_same_pairs(frames, tmp_path):
+    kalshi, polymarket = frames
+    direct = match_outcome_pairs(kalshi, polymarket, 80, 30)
+    store = str(tmp_path / 'matches.sqlite')
+    for _ in range(2):
+        stored = match_outcome_pairs(kalshi, polymarket, 80, 30, match_cache=store)
+        assert stored.sort(pl.all()).equals(direct.sort(pl.all()))
@@ -0,0 +1,82 @@
+import json
+
+import httpx
+import pytest
+
+from prediction_markets.arbitrage import find_arbitrage
+from prediction_markets.metrics import METRICS, Metrics, MetricsDumper, serve_metrics
+
+
+def _registry():
+    metrics = Metrics()
+    metrics.inc('fetch_requests_total', venue='kalshi', status=200)
+    metrics.inc('fetch_requests_total', 2, venue='kalshi', status=200)
+    metrics.inc('fetch_requests_total', venue='polymarket', status='error')
+    metrics.observe('stage_seconds', 0.5, stage='match')
+    metrics.observe('stage_seconds', 1.5, stage='match')
+    return metrics
+
+
+def test_counters_and_summaries_accumulate_per_label_set():
+    snapshot = _registry().snapshot()
+    assert snapshot['counters'] == [
+        {'name': 'fetch_requests_total', 'labels': {'status': '200', 'venue': 'kalshi'}, 'value': 3},
+        {'name': 'fetch_requests_total', 'labels': {'status': 'error', 'venue': 'polymarket'}, 'value': 1},
+    ]
+    assert snapshot['summaries'] == [
+        {'name': 'stage_seconds', 'labels': {'stage': 'match'}, 'count': 2, 'sum': 2.0, 'max': 1.5}]
+
+
+def test_timer_observes_a_block_that_raises():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.timer('stage_seconds', stage='price'):
+            raise ValueError
+    assert metrics.snapshot()['summaries'][0]['count'] == 1
+
+
+def test_prometheus_exposition():
+    metrics = _registry()
+    metrics.inc('title_pairs_kept_total', venue='say "hi"\n')
+    assert metrics.render_prometheus() == (
+        '# TYPE prediction_markets_fetch_requests_total counter\n'
+        'prediction_markets_fetch_requests_total{status="200",venue="kalshi"} 3\n'
+        'prediction_markets_fetch_requests_total{status="error",venue="polymarket"} 1\n'
+        '# TYPE prediction_markets_title_pairs_kept_total counter\n'
+        'prediction_markets_title_pairs_kept_total{venue="say \\"hi\\"\\n"} 1\n'
+        '# TYPE prediction_markets_stage_seconds summary\n'
+        'prediction_markets_stage_seconds_count{stage="match"} 2\n'
+        'prediction_markets_stage_seconds_sum{stage="match"} 2.000000\n'
+        '# TYPE prediction_markets_stage_seconds_max gauge\n'
+        'prediction_markets_stage_seconds_max{stage="match"} 1.500000\n'
+    )
+
+
+def test_metrics_are_served_and_dumped(tmp_path):
+    metrics = _registry()
+    server = serve_metrics(0, metrics=metrics)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        assert httpx.get(f'{url}/metrics').text == metrics.render_prometheus()
+        assert httpx.get(f'{url}/metrics.json').json()['counters'] == metrics.snapshot()['counters']
+        assert httpx.get(f'{url}/other').status_code == 404
+    finally:
+        server.shutdown()
+
+    path = str(tmp_path / 'metrics.json')
+    MetricsDumper(path, interval=60, metrics=metrics).stop()
+    with open(path) as f:
+        assert json.load(f)['summaries'] == metrics.snapshot()['summaries']
+
+
+def test_a_scan_records_every_stage(standin, capsys):
+    METRICS.reset()
+    find_arbitrage(80, 1.0, 30, 100, kalshi_url=standin, polymarket_url=standin)
+    snapshot = METRICS.snapshot()
+    counters = {(c['name'], c['labels'].get('venue')) for c in snapshot['counters'] if c['value'] > 0}
+    assert {('fetch_requests_total', 'kalshi'), ('fetch_requests_total', 'polymarket'),
+            ('transform_rows_total', 'kalshi'), ('transform_rows_total', 'polymarket'),
+            ('title_pairs_scored_total', None), ('title_pairs_kept_total', None),
+            ('opportunities_found_total', None)} <= counters
+    stages = {s['labels']['stage'] for s in snapshot['summaries'] if s['name'] == 'stage_seconds'}
+    assert {'fetch', 'match', 'price'} <= stages
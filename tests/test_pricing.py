@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import polars as pl
+import pytest
+
+from prediction_markets.pricing import join_outcome_pairs, price_opportunities
+
+NOW = datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _events(label, rows):
+    return pl.DataFrame(
+        [{'title': title, 'endDate': end, 'outcomes': [{label: name, 'yes_ask': ask} for name, ask in outcomes]}
+         for title, end, outcomes in rows],
+        schema={'title': pl.Utf8, 'endDate': pl.Datetime('us'),
+                'outcomes': pl.List(pl.Struct({label: pl.Utf8, 'yes_ask': pl.Int64}))},
+    )
+
+
+def _pairs(max_days_left=5):
+    soon, later = NOW + timedelta(days=3, hours=1), NOW + timedelta(days=10, hours=1)
+    kalshi = _events('yes_subtitle', [
+        ('Fed rate cut', soon, [('March', 40), ('June', 70)]),
+        ('Eagles win', later, [('Eagles', 40)]),
+        ('Undated', None, [('Yes', 10)]),
+    ])
+    polymarket = _events('option', [
+        ('Fed rate cut', soon + timedelta(days=1), [('March', 70), ('June', 40)]),
+        ('Eagles win', later, [('Eagles', 70)]),
+        ('Undated', soon, [('Yes', 10)]),
+    ])
+    # Each event is matched to the one with the same title
+    return join_outcome_pairs(kalshi, polymarket, [0, 1, 2], [0, 1, 2], [100.0, 100.0, 100.0], 75, max_days_left)
+
+
+def test_both_directions_are_priced_from_their_own_legs():
+    opportunities = price_opportunities(_pairs(), stake=100, min_profit=1).sort('kalshi_outcome')
+    assert opportunities.select('kalshi_outcome', 'direction', 'yes_ask', 'no_ask').rows() == [
+        ('June', 'polymarket_yes', 40.0, 30.0),
+        ('March', 'kalshi_yes', 40.0, 30.0),
+    ]
+    # 40 + 30 cents buys a dollar either way
+    assert opportunities['profit'].to_list() == pytest.approx([100 * 100 / 70 - 100] * 2)
+    assert opportunities['yes_stake'].to_list() == pytest.approx([100 * 40 / 70] * 2)
+    assert opportunities['yes_payout'].to_list() == pytest.approx(opportunities['no_payout'].to_list())
+
+
+def test_losing_directions_are_dropped():
+    assert price_opportunities(_pairs(), stake=100, min_profit=50).is_empty()
+
+
+def test_time_remaining_counts_whole_days_to_the_earlier_close():
+    pairs = _pairs()
+    assert pairs['k_title'].unique().to_list() == ['Fed rate cut']
+    assert pairs['time_remaining'].unique().to_list() == [3]
+    assert set(_pairs(max_days_left=10)['k_title']) == {'Fed rate cut', 'Eagles win'}
@@ -0,0 +1,92 @@
+import random
+from datetime import datetime, timedelta
+
+import polars as pl
+
+from prediction_markets import scanner
+from prediction_markets.matching import match_titles
+from prediction_markets.pricing import join_outcome_pairs, price_opportunities
+from prediction_markets.scanner import Scanner
+
+WORDS = ('will the fed cut rates eagles chiefs win super bowl election trump senate house nba finals lakers '
+         'celtics bitcoin above price march april').split()
+NOW = datetime.now()
+
+
+def _events(rng, n, label):
+    return pl.DataFrame([{
+        'title': ' '.join(rng.choices(WORDS, k=7)),
+        'subtitle': '',
+        'outcomes': [{label: rng.choice(WORDS), 'yes_ask': float(rng.randint(1, 99))} for _ in range(3)],
+        'endDate': NOW + timedelta(days=rng.randint(0, 10), hours=1),
+    } for _ in range(n)])
+
+
+def _full_scan(kalshi, polymarket):
+    k_idx, p_idx, scores = match_titles(kalshi['title'].to_list(), polymarket['title'].to_list(), 60)
+    return price_opportunities(join_outcome_pairs(kalshi, polymarket, k_idx, p_idx, scores, 60, 5), 100, 1.0)
+
+
+def _same(scan, kalshi, polymarket):
+    columns = [name for name in scan.current_opportunities().columns if name not in ('k_key', 'p_key', *scanner.IDS)]
+    assert scan.current_opportunities().select(columns).sort(pl.all()).equals(
+        _full_scan(kalshi, polymarket).select(columns).sort(pl.all()))
+
+
+def test_scanner_only_scores_and_prices_what_changed(monkeypatch):
+    rng = random.Random(1)
+    kalshi, polymarket = _events(rng, 300, 'yes_subtitle'), _events(rng, 100, 'option')
+    scan = Scanner(60, 1.0, 5, 100)
+    scan.update(kalshi, polymarket)
+    assert not scan.current_opportunities().is_empty()
+    _same(scan, kalshi, polymarket)
+
+    scored = []
+    monkeypatch.setattr(scanner, 'match_titles', lambda k, p, *args, **kwargs: (
+        scored.append((len(k), len(p))) or match_titles(k, p, *args, **kwargs)))
+
+    # Re-quote five Polymarket events, edit one title, delist another and list one new Kalshi title
+    rows = polymarket.to_dicts()
+    for row in rows[:5]:
+        row['outcomes'][0]['yes_ask'] = 2.0
+    rows[10]['title'] += ' edited'
+    polymarket = pl.DataFrame(rows[:-1], schema=polymarket.schema)
+    kalshi = pl.concat([kalshi, kalshi.head(1).with_columns(pl.col('title') + ' new')])
+    changes = scan.update(kalshi, polymarket)
+
+    assert (changes['kalshi_added'], changes['polymarket_added'], changes['polymarket_removed'],
+            changes['polymarket_repriced']) == (1, 1, 2, 5)
+    # The new Kalshi title against every Polymarket title, the old ones only against the edited title
+    assert scored == [(1, 99), (300, 1)]
+    _same(scan, kalshi, polymarket)
+
+    scored.clear()
+    assert scan.update(kalshi, polymarket)['pairs_repriced'] == 0
+    assert scored == [(0, 99), (301, 0)]
+
+
+def test_opportunities_are_reported_once():
+    rng = random.Random(2)
+    kalshi, polymarket = _events(rng, 300, 'yes_subtitle'), _events(rng, 100, 'option')
+    scan = Scanner(60, 1.0, 5, 100)
+    scan.update(kalshi, polymarket)
+    assert len(scan.new_opportunities()) == scan.current_opportunities().height > 0
+    assert scan.new_opportunities().is_empty()
+
+
+def test_event_keys_are_interned_ids():
+    rng = random.Random(3)
+    kalshi, polymarket = _events(rng, 50, 'yes_subtitle'), _events(rng, 20, 'option')
+    scan = Scanner(60, 1.0, 5, 100)
+    scan.update(kalshi, polymarket)
+    first = scan.index['polymarket'].select('title', 'key')
+    assert scan.matches.schema['k_key'] == scan.index['kalshi'].schema['key'] == pl.UInt32
+    assert len(scan.keys['polymarket']) == first.height
+
+    # Listed events keep their ids; a delisted one's key is forgotten and a new one gets a fresh id
+    scan.update(kalshi, pl.concat([polymarket[1:], polymarket.head(1).with_columns(pl.col('title') + ' new')]))
+    second = scan.index['polymarket'].select('title', 'key')
+    assert second.head(first.height - 1).equals(first[1:])
+    assert second['key'][-1] == first.height
+    assert len(scan.keys['polymarket']) == first.height
+    assert polymarket['title'][0] not in scan.keys['polymarket'].ids
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+
+from prediction_markets import schedule, synthetic
+from prediction_markets.arbitrage import match_outcome_pairs
+from prediction_markets.schedule import RefreshScheduler, leg_closes, refresh_books, refresh_interval
+from prediction_markets.standin import start_standin
+from prediction_markets.streaming import PairBook
+
+
+def test_refresh_interval_follows_time_to_close_and_volatility():
+    assert refresh_interval(60) == 0.25
+    assert refresh_interval(3600) == 1.0
+    assert refresh_interval(86400) == 24.0
+    assert refresh_interval(100 * 86400) == 900
+    assert refresh_interval(86400, volatility=1.0) == 12.0
+
+
+def test_scheduler_pops_due_legs_in_order_and_drops_closed_ones():
+    scheduler = RefreshScheduler()
+    scheduler.add('soon', closes=3600, now=0)
+    scheduler.add('later', closes=86400, now=0)
+    scheduler.add('closed', closes=0.5, now=0)
+    assert scheduler.due(0.9) == []
+    assert scheduler.due(1.0) == ['soon']
+    assert 'closed' not in scheduler.closes
+    assert scheduler.due(100) == ['later']
+    # A moving price shortens the next interval
+    scheduler.observe('soon', 40, 1.0)
+    assert scheduler.observe('soon', 50, 2.0) < 1.0
+
+
+def _scheduled(frames, min_interval=0.05, max_interval=0.1):
+    book = PairBook(match_outcome_pairs(*frames, 80, 30), min_profit=1.0)
+    scheduler = RefreshScheduler(min_interval, max_interval)
+    for key, closes in leg_closes(book).items():
+        scheduler.add(key, closes)
+    return book, scheduler
+
+
+def test_refresh_reports_an_opportunity_a_book_opens(universe, frames):
+    kalshi_feed, polymarket_events = universe
+    kalshi_books, polymarket_books = synthetic.order_books(kalshi_feed, polymarket_events)
+    book, scheduler = _scheduled(frames)
+    ticker, no_token = book.rows[0][7], book.rows[0][9]
+    # YES at 5 cents on Kalshi, NO at 50 on Polymarket
+    kalshi_books[ticker]['no'] = [[95, 100]]
+    polymarket_books[no_token]['asks'] = [{'price': '0.50', 'size': '100'}]
+    server, url = start_standin(kalshi_feed, polymarket_events, kalshi_books=kalshi_books,
+                                polymarket_books=polymarket_books)
+    found = []
+    try:
+        asyncio.run(refresh_books(book, scheduler, found.extend, duration=1, kalshi_url=url, clob_url=url))
+    finally:
+        server.shutdown()
+    assert any(opp['k_ticker'] == ticker and opp['direction'] == 'kalshi_yes' and opp['yes_ask'] == 5
+               for opp in found)
+
+
+def test_failed_rounds_keep_the_book_and_legs(frames, monkeypatch):
+    book, scheduler = _scheduled(frames)
+    legs = len(scheduler)
+
+    async def unreachable(*args, **kwargs):
+        raise httpx.PoolTimeout('no connection available')
+
+    def discover():
+        raise RuntimeError('venue down')
+
+    monkeypatch.setattr(schedule, 'fetch_order_books', unreachable)
+    last = asyncio.run(refresh_books(book, scheduler, print, duration=0.5, discover=discover, discover_interval=0.1))
+    assert last is book
+    assert len(scheduler) == legs
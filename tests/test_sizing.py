@@ -0,0 +1,101 @@
+import random
+import warnings
+
+import polars as pl
+import pytest
+
+from prediction_markets.arbitrage import find_arbitrage
+from prediction_markets.sizing import levels_frame, size_opportunities, size_pairs
+
+
+def _fill_cost(ladder, contracts):
+    """ Cost in cents of buying `contracts` by walking `ladder` level by level, or None past its depth. """
+    cost, left = 0, contracts
+    for price, size in sorted(ladder):
+        take = min(left, size)
+        cost += take * price
+        left -= take
+        if left <= 1e-12:
+            return cost
+    return None
+
+
+def _brute_force(yes, no, min_profit, max_stake):
+    """ (contracts, profit) of the largest whole hedge clearing min_profit within max_stake, or None. """
+    yes = [level for level in yes if 0 < level[0] < 100]
+    no = [level for level in no if 0 < level[0] < 100]
+    best = None
+    for contracts in range(1, 3000):
+        yes_cost, no_cost = _fill_cost(yes, contracts), _fill_cost(no, contracts)
+        if yes_cost is None or no_cost is None:
+            break
+        profit = 100 * contracts - yes_cost - no_cost
+        if profit >= 100 * min_profit - 1e-9 and yes_cost + no_cost <= 100 * max_stake + 1e-9:
+            best = (contracts, profit / 100)
+    return best
+
+
+def test_size_pairs_matches_a_brute_force_ladder_walk():
+    rng = random.Random(3)
+    ladders = []
+    for _ in range(300):
+        yes_best = rng.randint(20, 70)
+        no_best = rng.randint(100 - yes_best - 10, 100 - yes_best + 3)
+        yes = [(yes_best + k * rng.randint(0, 3), rng.choice([5, 10.5, 50, 200])) for k in range(rng.randint(0, 8))]
+        no = [(no_best + k * rng.randint(0, 3), rng.choice([5, 20, 75.25, 300])) for k in range(rng.randint(0, 8))]
+        ladders.append((yes, no))
+
+    sized = {row['pair']: (row['contracts'], row['profit'])
+             for row in size_pairs(levels_frame(ladders), 2.0, 500).iter_rows(named=True)}
+    for pair, (yes, no) in enumerate(ladders):
+        expected = _brute_force(yes, no, 2.0, 500)
+        if expected is None:
+            assert pair not in sized
+        else:
+            assert sized[pair][0] == expected[0]
+            assert abs(sized[pair][1] - expected[1]) < 1e-6
+
+
+def test_size_pairs_does_not_warn():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
+        size_pairs(levels_frame([([(40, 10), (42, 5)], [(50, 3), (55, 20)]), ([(10, 5)], [(20, 5)])]))
+
+
+def _scan(url, clob_url, depth):
+    return find_arbitrage(80, 1.0, 30, 100, depth=depth, kalshi_url=url, polymarket_url=url, clob_url=clob_url)
+
+
+def test_depth_scan_sizes_against_the_order_books(standin, capsys):
+    quoted = _scan(standin, standin, depth=False)
+    sized = _scan(standin, standin, depth=True)
+    assert sized.height > 0
+    assert set(sized['kalshi_title']) <= set(quoted['kalshi_title'])
+    assert (sized['contracts'] > 0).all()
+    assert (sized['profit'] >= 1.0 - 1e-9).all()
+
+
+def test_depth_scan_survives_an_unreachable_book_host(standin, unreachable, capsys):
+    # Every Polymarket book fails to connect: those opportunities lose their sizing, the scan still completes
+    sized = _scan(standin, unreachable, depth=True)
+    assert isinstance(sized, pl.DataFrame)
+    assert sized.is_empty()
+
+
+
+def test_sized_opportunities_carry_their_profit_curve():
+    opportunity = pl.DataFrame({
+        'direction': ['kalshi_yes'], 'k_ticker': ['K'], 'p_yes_token': ['Y'], 'p_no_token': ['N'],
+        **{name: [0.0] for name in ('yes_ask', 'no_ask', 'yes_stake', 'no_stake', 'yes_payout', 'no_payout',
+                                    'profit', 'arbitrage_percentage')},
+    })
+    # YES asks 40 x 10 then 45 x 20 (Kalshi NO bids at 100 - price); NO asks 50 x 15 then 52 x 100
+    kalshi_books = {'K': {'orderbook': {'no': [[60, 10], [55, 20]]}}}
+    polymarket_books = {'N': {'asks': [{'price': '0.50', 'size': '15'}, {'price': '0.52', 'size': '100'}]}}
+    sized = size_opportunities(opportunity, kalshi_books, polymarket_books, min_profit=1.0, max_stake=100)
+    assert sized['contracts'].to_list() == [30]
+    assert sized['profit'].to_list() == pytest.approx([1.70])
+    curve = sized['profit_curve'][0].to_list()
+    assert [point['contracts'] for point in curve] == [10, 15, 30]
+    assert [point['stake'] for point in curve] == pytest.approx([9.00, 13.75, 28.30])
+    assert [point['profit'] for point in curve] == pytest.approx([1.00, 1.25, 1.70])
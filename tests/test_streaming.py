@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+import pytest
+
+from prediction_markets.pricing import price_opportunities
+from prediction_markets.streaming import PairBook
+
+END = datetime.now() + timedelta(days=2, hours=1)
+
+
+def _pairs():
+    # The first two pairs share a Kalshi market; the third has its own legs
+    return pl.DataFrame({
+        'k_title': ['Fed decision', 'Fed decision', 'Super Bowl'],
+        'p_title': ['Fed decision?', 'Fed decision?', 'Super Bowl winner'],
+        'k_label': ['Cut', 'Cut', 'Eagles'],
+        'p_label': ['Cut', '25 bp cut', 'Eagles'],
+        'event_similarity': pl.Series([90.0, 90.0, 85.0], dtype=pl.Float32),
+        'outcome_similarity': pl.Series([100.0, 80.0, 100.0], dtype=pl.Float32),
+        'end_date': [END] * 3,
+        'k_ticker': ['K-FED', 'K-FED', 'K-SB'],
+        'p_yes_token': ['P-CUT-Y', 'P-25-Y', 'P-SB-Y'],
+        'p_no_token': ['P-CUT-N', 'P-25-N', 'P-SB-N'],
+        'k_yes_ask': [50.0, 50.0, 30.0],
+        'p_yes_ask': [50.0, 50.0, 75.0],
+        'time_remaining': [2] * 3,
+    })
+
+
+def _priced(opportunities):
+    return sorted((o['kalshi_outcome'], o['poly_outcome'], o['direction'], round(o['profit'], 6)) for o in opportunities)
+
+
+def test_snapshot_prices_match_the_batch_engine():
+    pairs = _pairs()
+    book = PairBook(pairs, stake=100, min_profit=1)
+    found = book.reprice(np.arange(pairs.height))
+    assert _priced(found) == _priced(price_opportunities(pairs, 100, 1).iter_rows(named=True))
+    assert [(o['kalshi_outcome'], o['direction']) for o in found] == [('Eagles', 'kalshi_yes')]
+
+
+def test_a_quote_reprices_only_the_pairs_on_its_leg():
+    book = PairBook(_pairs(), stake=100, min_profit=1)
+    book.reprice(np.arange(3))
+    assert sorted(book.legs('kalshi')) == ['K-FED', 'K-SB']
+    assert len(book.legs('polymarket')) == 6
+
+    # A cheap NO on the 25 bp market opens Kalshi YES at 50 + 40 on that pair alone
+    found = book.update('P-25-N', ask=40)
+    assert [(o['poly_outcome'], o['direction'], o['yes_ask'], o['no_ask']) for o in found] == [
+        ('25 bp cut', 'kalshi_yes', 50.0, 40.0)]
+    assert found[0]['profit'] == pytest.approx(100 * 100 / 90 - 100)
+    # The same quote again changes nothing, and a quote on an unknown leg is ignored
+    assert book.update('P-25-N', ask=40) == []
+    assert book.update('P-UNKNOWN', ask=1) == []
+
+    # A Kalshi bid prices Polymarket YES on both pairs of its market (NO costs 100 - bid)
+    found = book.update('K-FED', bid=60)
+    assert sorted((o['poly_outcome'], o['direction'], o['no_ask']) for o in found) == [
+        ('25 bp cut', 'polymarket_yes', 40.0), ('Cut', 'polymarket_yes', 40.0)]
+    assert ((1, 'kalshi_yes') in book.open) and ((0, 'polymarket_yes') in book.open)
+
+    # Once the ask moves back, the opportunity closes
+    assert book.update('P-25-N', ask=52) == []
+    assert (1, 'kalshi_yes') not in book.open